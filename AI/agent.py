@@ -1,6 +1,7 @@
 from AI.enums import Strategy
 from AI.randomagent import RandomAgent
 from AI.minimaxagent import MinimaxAgent
+from AI.mctsagent import MCTSAgent
 
 
 def Agent(strategy, *args, **kwargs):
@@ -11,4 +12,5 @@ def Agent(strategy, *args, **kwargs):
     return {
         Strategy.RANDOM: RandomAgent,
         Strategy.MATRIX: MinimaxAgent,
+        Strategy.MCTS: MCTSAgent,
     }[strategy](*args, **kwargs)
@@ -1,14 +1,50 @@
+import random
 from abc import ABCMeta, abstractmethod
 
+from AI.matrixtree import action_key
+from battle.rolloutstats import RolloutStats
+from _logging import log
+
 class BaseAgent(object):
     __metaclass__ = ABCMeta
 
-    def __init__(self):
+    def __init__(self, pool=None, collect_stats=False):
+        """
+        pool: an AI.workerpool.WorkerPool to run rollouts/searches in, owned by the caller
+        collect_stats: keep a battle.rolloutstats.RolloutStats of each decision in self.stats
+        """
         self.my_player = None
+        self.pool = pool
+        self.stats = RolloutStats() if collect_stats else None
 
     def set_my_player(self, player):
         self.my_player = player
 
     @abstractmethod
-    def select_action(self, battlefield, moves, switches, can_mega):
-        pass
+    def select_action(self, battlefield, moves, switches, can_mega, time_budget=None):
+        """
+        Return (action, mega): one of moves or switches, and whether to mega-evolve.
+        time_budget: seconds that the decision may take, or None for no limit
+        """
+
+    def sample_action(self, strategy, moves, switches):
+        """
+        Draw an action from strategy (a list of (action, probability) pairs of the root node), and
+        return the matching choice from moves or switches. If there is no strategy (e.g. the root's
+        value came from the transposition table) or nothing matches, choose randomly.
+        """
+        choices = {action_key(action): action for action in moves + switches}
+        if strategy:
+            r = random.random() * sum(p for _, p in strategy)
+            for action, p in strategy:
+                if p > 0:
+                    chosen = action
+                    r -= p
+                    if r < 0:
+                        break
+            choice = choices.get(action_key(chosen))
+            if choice is not None:
+                return choice
+
+        log.i('No action to choose from the strategy; choosing randomly')
+        return random.choice(moves or switches)
@@ -0,0 +1,158 @@
+"""
+Determinization of the foe's hidden information.
+
+BattleRoller.fill_in_unrevealed fills in each unknown foe attribute with its single most probable
+value, so every rollout plays against the same guess. A DeterminizationSampler instead draws
+complete foe teams that are each consistent with what has been revealed:
+
+- a revealed foe's unknown moves/ability/item are taken together from one of its rbstats sets
+  that contains all of its known attributes, drawn in proportion to how often the set was
+  generated
+- an unrevealed foe is a species drawn in proportion to how often it was generated (excluding
+  species already on the foe's team, and a second mega stone), at one of its levels, with one of
+  its sets
+
+Each draw bisects a table of cumulative counts, built the first time it is needed (per species and
+set of known attributes) and cached, so that sampling K teams is cheap enough to redo every turn.
+"""
+from bisect import bisect
+
+from battle.abilities import abilitydex
+from battle.battlepokemon import BattlePokemon
+from battle.items import itemdex
+from battle.moves import movedex
+from bot.foeside import UNREVEALED
+from showdowndata import pokedex
+from showdowndata.rbstats import rbstats, rbstats_key
+from _logging import log
+
+EXCLUDED = frozenset(pokemon for pokemon in pokedex if
+                     (pokemon.endswith('mega') or
+                      pokemon.endswith('megax') or
+                      pokemon.endswith('megay') or
+                      pokemon.endswith('primal') or
+                      pokemon == 'ditto' or
+                      pokemon == 'zoroark') and not
+                     pokemon.lower() == 'yanmega')
+
+
+class DeterminizationSampler(object):
+    max_tries = 20 # draws of an unrevealed foe's species before allowing a duplicate species
+
+    def __init__(self, stats=rbstats):
+        self.rbstats = stats
+        self._tables = {}
+        self._species = None
+
+    def sample(self, battlefield, foe_player, k, rng):
+        """ Return k clones of battlefield, each with foe_player's team determinized """
+        return [self.determinize(battlefield.clone(), foe_player, rng) for _ in xrange(k)]
+
+    def determinize(self, battlefield, foe_player, rng):
+        """ Fill in foe_player's team in battlefield (in place) with a draw; return battlefield """
+        foe_side = battlefield.sides[foe_player]
+        team = foe_side.team
+        revealed = [foe for foe in team if foe.name != UNREVEALED]
+        has_mega = any(foe.item is not None and foe.item.is_mega_stone for foe in revealed)
+        species = {foe.base_species for foe in revealed}
+
+        for i, foe in enumerate(team):
+            if foe.name == UNREVEALED:
+                foe = team[i] = self.draw_foe(foe_side, species, not has_mega, rng)
+                has_mega = has_mega or foe.item.is_mega_stone
+                species.add(foe.base_species)
+            elif not foe.is_fainted():
+                self.fill_in_foe(foe, rng)
+        return battlefield
+
+    def fill_in_foe(self, foe, rng):
+        attrs, all_known = foe.known_attrs()
+        if all_known:
+            return
+        rb_index = rbstats_key(foe)
+        table = self.set_table(rb_index, attrs)
+        if table is None:
+            log.d('No set of %s has %s; drawing from all of its sets', rb_index, attrs)
+            table = self.set_table(rb_index, ())
+            if table is None:
+                return
+        apply_set(foe, _draw(table, rng))
+
+    def draw_foe(self, foe_side, exclude, allow_mega, rng):
+        """ Return a new BattlePokemon for an unrevealed foe, whose species is not in exclude """
+        table = self.species_table()
+        for _ in xrange(self.max_tries):
+            name = _draw(table, rng)
+            if name not in exclude:
+                break
+        sets = (self.set_table(name, (), allow_mega) or self.set_table(name, ()))
+        attrset = _draw(sets, rng)
+        level = _draw(self.level_table(name), rng)
+        return BattlePokemon(pokedex[name], level, [movedex[move] for move in attrset[:-2]],
+                             abilitydex[attrset[-2]], itemdex[attrset[-1]], side=foe_side)
+
+    def set_table(self, rb_index, known_attrs, allow_mega=True):
+        """
+        Return the cumulative table of rb_index's sets that contain all of known_attrs (and no mega
+        stone, unless allow_mega), or None if there are none
+        """
+        key = ('sets', rb_index, frozenset(known_attrs), allow_mega)
+        if key not in self._tables:
+            try:
+                sets = self.rbstats[rb_index]['sets']
+            except KeyError:
+                sets = {}
+            self._tables[key] = _cumulative(
+                (attrset, count) for attrset, count in sets.iteritems()
+                if all(attr in attrset for attr in known_attrs) and
+                (allow_mega or not itemdex[attrset[-1]].is_mega_stone))
+        return self._tables[key]
+
+    def level_table(self, name):
+        key = ('level', name)
+        if key not in self._tables:
+            self._tables[key] = _cumulative(self.rbstats[name]['level'].iteritems())
+        return self._tables[key]
+
+    def species_table(self):
+        if self._species is None:
+            self._species = _cumulative(
+                (name, stats['number']) for name, stats in self.rbstats.counter.iteritems()
+                if name in pokedex and name not in EXCLUDED and stats['sets'])
+        return self._species
+
+def apply_set(foe, attrset):
+    """ Give foe the moves/ability/item of attrset (moves..., ability, item) that it lacks """
+    if foe.item == itemdex['_unrevealed_']:
+        item = itemdex[attrset[-1]]
+        foe.item = item
+        if foe.is_active:
+            foe.set_effect(item())
+
+    if foe.ability == abilitydex['_unrevealed_']:
+        ability = abilitydex[attrset[-2]]
+        foe.base_ability = foe.ability = ability
+        if foe.is_active:
+            foe.set_effect(ability())
+
+    for name in attrset[:-2]:
+        if len(foe.moves) >= 4:
+            break
+        move = movedex[name]
+        if move not in foe.moves:
+            foe.moves[move] = move.max_pp
+
+def _cumulative(weighted):
+    """ Return (values, cumulative weights) for (value, weight) pairs, or None if there are none """
+    values, cumulative = [], []
+    total = 0
+    for value, weight in sorted(weighted):
+        if weight > 0:
+            total += weight
+            values.append(value)
+            cumulative.append(total)
+    return (values, cumulative) if values else None
+
+def _draw(table, rng):
+    values, cumulative = table
+    return values[bisect(cumulative, rng.random() * cumulative[-1])]
@@ -3,6 +3,16 @@ from misc.enum import BaseEnum
 class Strategy(BaseEnum):
     RANDOM = ()
     MATRIX = ()
+    MCTS = ()
+
+class Selection(BaseEnum): # how MCTSAgent's players choose their actions at each node
+    DUCT = ()
+    EXP3 = ()
+    REGRET_MATCHING = ()
+
+class Parallelism(BaseEnum): # how an agent's search is spread over worker processes
+    ROOT = ()
+    LEAF = ()
 
 class BattleState(BaseEnum):
     NEW_BATTLE = ()
@@ -0,0 +1,62 @@
+"""
+Static evaluation of a BattleField, for rollouts that are cut off before the battle ends (see
+BattleRoller.max_turns).
+
+An evaluator scores a battlefield from player 0's point of view: evaluate(battlefield) returns an
+estimate in [0, 1] of player 0's probability of winning, so that it can stand in for the result of
+a finished battle (1 if player 0 won, 0 if player 1 won).
+"""
+from battle.enums import Status
+from bot.foeside import UNREVEALED
+
+
+class MaterialEvaluator(object):
+    """
+    Compares what each side has left: its pokemon's average fraction of HP, the fraction of its
+    pokemon that haven't fainted, and the burden of the major statuses on the pokemon that are
+    left (unrevealed foes count as healthy). Each side's material is a weighted sum of these; the
+    score is 0.5 plus half of player 0's lead, where a lead of 1 means that player 1 has nothing
+    left and player 0 is untouched.
+    """
+    STATUS_BURDEN = {
+        None: 0,
+        Status.BRN: 0.5,
+        Status.FRZ: 1,
+        Status.PAR: 0.5,
+        Status.PSN: 0.25,
+        Status.SLP: 0.75,
+        Status.TOX: 0.5,
+    }
+
+    def __init__(self, hp_weight=0.5, pokemon_weight=0.4, status_weight=0.1):
+        self.hp_weight = hp_weight
+        self.pokemon_weight = pokemon_weight
+        self.status_weight = status_weight
+
+    def __repr__(self):
+        return '<MaterialEvaluator: hp=%s, pokemon=%s, status=%s>' % (
+            self.hp_weight, self.pokemon_weight, self.status_weight)
+
+    def evaluate(self, battlefield):
+        lead = self.material(battlefield.sides[0]) - self.material(battlefield.sides[1])
+        total = self.hp_weight + self.pokemon_weight + self.status_weight
+        return 0.5 + 0.5 * lead / total
+
+    def material(self, side):
+        """ Return side's material, between 0 (all fainted) and the sum of the weights """
+        hp = burden = 0.0
+        remaining = 0
+        for pokemon in side.team:
+            if pokemon.name == UNREVEALED:
+                hp += 1
+            elif pokemon.is_fainted():
+                continue
+            else:
+                hp += float(pokemon.hp) / pokemon.max_hp
+                burden += self.STATUS_BURDEN[pokemon.status]
+            remaining += 1
+
+        size = float(len(side.team))
+        return (self.hp_weight * hp / size +
+                self.pokemon_weight * remaining / size +
+                self.status_weight * (remaining - burden) / size)
@@ -1,10 +1,20 @@
-from bisect import insort
-from copy import deepcopy
+
+import time
 
 from AI.actions import MoveAction, SwitchAction
 from AI.enums import BattleState
+from AI.evaluator import MaterialEvaluator
+from AI.nash import NashSolver
 from battle.battleengine import Battle
+from battle.damagetable import DamageTable
+from battle.enums import Decision
+from battle.rng import BattleRNG
 from bot.foeside import UNREVEALED
+from _logging import log
+
+SOLVER = NashSolver()
+EVALUATOR = MaterialEvaluator()
+DAMAGE_TABLE = DamageTable()
 
 
 class Breakpoint(Exception):
@@ -19,23 +29,52 @@ class BreakMustSwitch(Breakpoint):
     def __init__(self, side_index):
         self.side_index = side_index
 
+    def __reduce__(self): # so that it can be sent to a worker process
+        return self.__class__, (self.side_index,)
+
 class BreakPostFaintSwitch(Breakpoint):
     state = BattleState.POST_FAINT_SWITCH
 
     def __init__(self, side_index):
         self.side_index = side_index
 
+    def __reduce__(self): # so that it can be sent to a worker process
+        return self.__class__, (self.side_index,)
+
 class BreakDoublePostFaintSwitch(Breakpoint):
     state = BattleState.DOUBLE_POST_FAINT_SWITCH
 
-class BreakChanceAccuracy(Breakpoint):
-    state = BattleState.CHANCE_ACCURACY
+class BreakChance(Breakpoint):
+    """
+    A random event with two outcomes, True (with the given probability) and False. outcomes are
+    those of the chance events already passed since the actions being run started.
+    """
+    def __init__(self, probability, outcomes):
+        self.probability = probability
+        self.outcomes = outcomes
 
-class BreakChanceSecondary(Breakpoint):
-    state = BattleState.CHANCE_SECONDARY
+class BreakChanceAccuracy(BreakChance):
+    state = BattleState.CHANCE_ACCURACY # True: the move hits
+
+class BreakChanceSecondary(BreakChance):
+    state = BattleState.CHANCE_SECONDARY # True: the secondary effect applies
+
+
+class SearchTimeout(Exception):
+    """ Raised by BaseMatrixNode.search when its deadline has passed """
 
 
 class BreakpointBattle(Battle):
+    """
+    With model_chance, accuracy checks and secondary effect chances are breakpoints too (see
+    MatrixNodeChance), except for the outcomes already decided in chance_outcomes, which are used
+    in order. Otherwise they are rolled as usual.
+    """
+    model_chance = False
+    chance_outcomes = ()
+    chance_index = 0
+    chance_rng_state = None # the rng's state when the actions that reached a chance event started
+
     def get_instaswitches(self, sides):
         assert any(sides), sides
         if sides[0] is None:
@@ -51,20 +90,42 @@ class BreakpointBattle(Battle):
     def run_must_switch(self, side):
         raise BreakMustSwitch(side.index)
 
-    @staticmethod
-    def get_critical_hit(crit_ratio):
+    def get_critical_hit(self, crit_ratio):
         return crit_ratio >= 3
 
-    @staticmethod
-    def damage_randomizer():
+    def damage_randomizer(self):
         return 100 - 7 # average damage
 
+    def roll_accuracy(self, accuracy):
+        if not self.model_chance:
+            return super(BreakpointBattle, self).roll_accuracy(accuracy)
+        return self.chance_outcome(BreakChanceAccuracy, min(int(accuracy), 100) / 100.0)
+
+    def roll_secondary_effect(self, chance):
+        if not self.model_chance:
+            return super(BreakpointBattle, self).roll_secondary_effect(chance)
+        return self.chance_outcome(BreakChanceSecondary, min(chance, 100) / 100.0)
+
+    def chance_outcome(self, breakpoint, probability):
+        """ Return the next decided outcome, or raise breakpoint if it isn't decided yet """
+        if probability >= 1:
+            return True
+        if probability <= 0:
+            return False
+        index = self.chance_index
+        if index < len(self.chance_outcomes):
+            self.chance_index = index + 1
+            return self.chance_outcomes[index]
+        raise breakpoint(probability, self.chance_outcomes)
+
 
 class MatrixCell(object):
     """
     Representation of potential actions leading to a new state. Once expanded via a call to
     BaseMatrixNode.expand_cell, this holds the
     """
+    __slots__ = ('row_action', 'col_action', 'node', 'win')
+
     def __init__(self, row_action, col_action, node, win):
         self.row_action = row_action
         self.col_action = col_action
@@ -76,15 +137,96 @@ class MatrixCell(object):
             ('node=%s' % self.node) if not self.win else ('win=%s' % self.win))
 
 
+def action_key(action):
+    """ Identify an action by its type and move/switch-in, regardless of its choice index """
+    return (action.action_type,
+            action.move_name if action.action_type == Decision.MOVE else action.incoming_name)
+
+def action_ranks(node):
+    """
+    Return {(player, action key): rank} for the actions of node's strategies, where the actions
+    played with higher probability have lower ranks (all of them below 1)
+    """
+    rank = {}
+    for player in (0, 1):
+        for action, p in node.strategy(player) or ():
+            rank[player, action_key(action)] = -p
+    return rank
+
+def clamp(value, alpha, beta):
+    return min(max(value, alpha), beta)
+
+def is_exact(value, alpha, beta):
+    """ Whether a value returned by a search in the window [alpha, beta] is exact """
+    return (value > alpha or alpha <= 0) and (value < beta or beta >= 1)
+
+def expand_strategy(probabilities, indices, size):
+    """ Return a strategy over `size` actions, from the probabilities of those at indices """
+    strategy = [0.0] * size
+    for i, p in zip(indices, probabilities):
+        if i < size:
+            strategy[i] = p
+    return tuple(strategy)
+
+def dominated_row_bound(lower, upper, rows, cols, a, b):
+    """
+    Return the greatest value of cell (a, b) at which row a is dominated by one of the other rows
+    (given the other columns' bounds), or None if there's no such row.
+    """
+    bound = None
+    upper_a = upper[a]
+    for i in rows:
+        if i != a:
+            lower_i = lower[i]
+            if all(lower_i[j] >= upper_a[j] for j in cols if j != b):
+                if bound is None or lower_i[b] > bound:
+                    bound = lower_i[b]
+    return bound
+
+def dominated_col_bound(lower, upper, rows, cols, a, b):
+    """
+    Return the least value of cell (a, b) at which column b is dominated by one of the other
+    columns (given the other rows' bounds), or None if there's no such column.
+    """
+    bound = None
+    for j in cols:
+        if j != b:
+            if all(upper[i][j] <= lower[i][b] for i in rows if i != a):
+                if bound is None or upper[a][j] < bound:
+                    bound = upper[a][j]
+    return bound
+
+def cell_value(cell):
+    """
+    Return the value of an expanded cell: its node's value (approximating the node if it wasn't
+    evaluated), or 1 or 0 if player 0 or player 1 won.
+    """
+    node = cell.node
+    if node is not None:
+        if node.value is None:
+            node.approximate()
+        return node.value
+    return 1.0 if cell.win == 0 else 0.0
+
+
 class BaseMatrixNode(object):
     """
     Representation of a battle state with its associated possible actions as a one- or
     two-dimensional list of MatrixCells.
+
+    A node's value is player 0's (the row player's) estimated probability of winning from its
+    state, with both players playing their equilibrium strategies below it. row_strategy and
+    col_strategy are each player's probabilities of choosing each row or column of the matrix.
+    While a node is being searched, mark is the battle's mark of its state.
     """
     state = None
     matrix = None
     value = None
+    row_strategy = None
+    col_strategy = None
+    mark = None
     simultaneous = None # True for nodes that require simultaneous decisions from both sides.
+    side_index = None # the deciding player of a single player's decision
 
     def __init__(self, battle, depth, breakpoint=None):
         self.depth = depth
@@ -99,6 +241,14 @@ class BaseMatrixNode(object):
     def populate_matrix(self, battle, depth, breakpoint):
         raise NotImplementedError
 
+    def shape(self):
+        """ Return the number of (rows, columns) of the matrix """
+        return len(self.matrix), len(self.matrix[0])
+
+    def cell(self, a, b):
+        """ Return the cell in row a and column b of the matrix """
+        return self.matrix[a][b]
+
     def evaluate(self, max_depth):
         if self.depth == max_depth:
             return self.approximate()
@@ -109,14 +259,194 @@ class BaseMatrixNode(object):
 
         self.calculate_value()
 
+    def search(self, max_depth, table=None, deadline=None, prune=False, alpha=0.0, beta=1.0):
+        """
+        Evaluate the subtree rooted at this node depth-first, running every cell's actions on this
+        node's battle and rolling it back afterwards (see battle.trail) instead of cloning it.
+        Nodes that require a switch decision are expanded past max_depth, so that only
+        MatrixNodeNewTurn nodes are approximated. Return this node's value.
+
+        With prune, the search is an alpha-beta search in the window [alpha, beta] (see
+        search_cells): cells that can't affect the value are skipped, and the value returned is
+        only exact if it lies within the window; it is clamped to the window, and a value of alpha
+        (or beta) means that the exact value is at most alpha (or at least beta). The window [0, 1]
+        gives the same value as the full search.
+
+        If a TranspositionTable is passed, nodes whose state was already searched at least as deep
+        take their value from the table instead of being expanded, and the exact value of each node
+        searched is stored in it.
+
+        If a deadline (a time.time() value) is passed and it is reached before the search finishes,
+        SearchTimeout is raised; the values of the nodes searched so far are kept (and stored in
+        the table), but not this node's.
+
+        Afterwards, the battle is back in this node's state; the descendant nodes no longer have a
+        battle.
+        """
+        if deadline is not None and time.time() > deadline:
+            raise SearchTimeout
+        depth = max(max_depth - self.depth, 0)
+        key = None if table is None else self.transposition_key()
+        if key is not None:
+            entry = table.lookup(key, depth)
+            if entry is not None:
+                self.value = entry.value
+                return clamp(entry.value, alpha, beta)
+
+        if self.depth >= max_depth and isinstance(self, MatrixNodeNewTurn):
+            self.approximate()
+        else:
+            battle = self.battle
+            mark = self.mark = battle.mark()
+            try:
+                if prune:
+                    self.search_cells(battle, mark, max_depth, table, deadline, alpha, beta)
+                else:
+                    for row in self.matrix:
+                        for cell in row:
+                            self.run_cell(battle, cell)
+                            if cell.node is not None:
+                                cell.node.search(max_depth, table, deadline)
+                                cell.node.battle = None
+                            battle.rollback(mark)
+                    self.calculate_value()
+            except SearchTimeout:
+                battle.rollback(mark)
+                raise
+
+        if key is not None and is_exact(self.value, alpha, beta):
+            table.store(key, self.value, depth)
+        return clamp(self.value, alpha, beta)
+
+    def search_cell(self, battle, mark, cell, max_depth, table, deadline, alpha, beta):
+        """
+        Run cell's actions on battle, search the resulting node (if any) in the window
+        [alpha, beta], and roll the battle back to mark. Return the cell's value, clamped to the
+        window.
+        """
+        self.run_cell(battle, cell)
+        if cell.node is not None:
+            value = cell.node.search(max_depth, table, deadline, True, alpha, beta)
+            cell.node.battle = None
+        else:
+            value = clamp(cell_value(cell), alpha, beta)
+        battle.rollback(mark)
+        return value
+
+    def search_cells(self, battle, mark, max_depth, table, deadline, alpha, beta):
+        """
+        Simultaneous-move alpha-beta (SMAB; Saffidine, Finnsson and Buro, 2012): set this node's
+        value (clamped to [alpha, beta]) without searching the cells whose row or column is
+        provably dominated.
+
+        Each cell has a pessimistic and an optimistic bound on its value: [0, 1] until it is
+        searched, and its exact value afterwards. Before searching a cell, its row's bound is the
+        greatest value at which another row would dominate it (that row's pessimistic value in the
+        cell's column, for a row whose pessimistic values are at least this row's optimistic ones
+        in the other columns), and its column's bound is the least value at which another column
+        would. The cell is searched in the window between the two, and the result shows that its
+        row or column is dominated (so it is removed, along with its remaining cells), or is the
+        cell's exact value. Dominance is only checked against pure strategies, which is weaker than
+        the linear programs of SMAB but much cheaper.
+
+        The window enters the game as an extra row whose cells are all worth alpha and an extra
+        column whose cells are worth beta (the players' alternatives elsewhere in the tree): the
+        value of that game is this node's value clamped to [alpha, beta].
+        """
+        rows, cols = self.shape()
+        lower = [[0.0] * cols for _ in range(rows)]
+        upper = [[1.0] * cols for _ in range(rows)]
+        live_rows = range(rows)
+        live_cols = range(cols)
+        if alpha > 0:
+            lower.append([alpha] * cols)
+            upper.append([alpha] * cols)
+            live_rows.append(rows)
+        if beta < 1:
+            for i in range(len(lower)):
+                bound = alpha if i == rows else beta
+                lower[i].append(bound)
+                upper[i].append(bound)
+            live_cols.append(cols)
+
+        # A row whose values are all at least beta cuts the search off (the node's value is at
+        # least beta), and so does a column whose values are all at most alpha. Only the second
+        # can happen in a window like [alpha, 1], and whole columns are known sooner when the
+        # cells are searched column by column.
+        if alpha > 0 and beta >= 1:
+            order = ((a, b) for b in range(cols) for a in range(rows))
+        else:
+            order = ((a, b) for a in range(rows) for b in range(cols))
+
+        for a, b in order:
+            if a not in live_rows or b not in live_cols:
+                continue
+            row_bound = dominated_row_bound(lower, upper, live_rows, live_cols, a, b)
+            col_bound = dominated_col_bound(lower, upper, live_rows, live_cols, a, b)
+            low = 0.0 if row_bound is None else row_bound
+            high = 1.0 if col_bound is None else col_bound
+            if low > high:
+                low, high = high, low # any result shows the row or column to be dominated
+            elif low == high:
+                low, high = 0.0, 1.0
+
+            value = self.search_cell(battle, mark, self.cell(a, b), max_depth, table, deadline,
+                                     low, high)
+            at_most = value if value < high or high >= 1 else 1.0
+            at_least = value if value > low or low <= 0 else 0.0
+            if row_bound is not None and at_most <= row_bound:
+                live_rows.remove(a)
+            elif col_bound is not None and at_least >= col_bound:
+                live_cols.remove(b)
+            else: # the value is exact
+                lower[a][b] = upper[a][b] = value
+                if beta < 1 and all(lower[a][j] >= beta for j in live_cols):
+                    self.value = beta
+                    return
+                if alpha > 0 and all(upper[i][b] <= alpha for i in live_rows):
+                    self.value = alpha
+                    return
+
+        payoff = tuple(tuple(lower[i][j] for j in live_cols) for i in live_rows)
+        self.value, row_probabilities, col_probabilities = SOLVER.solve(payoff)
+        if is_exact(self.value, alpha, beta):
+            # the extra row and column aren't played in an exact solution
+            self.row_strategy = expand_strategy(row_probabilities, live_rows, rows)
+            self.col_strategy = expand_strategy(col_probabilities, live_cols, cols)
+
+    def transposition_key(self):
+        """
+        Return a key identifying this node's state in a TranspositionTable, or None if the state
+        can't be identified by the battlefield alone (i.e. in the middle of a turn).
+        """
+        battle = self.battle
+        if battle.event_queue or battle.faint_queue:
+            return None
+        battlefield = battle.battlefield
+        return (self.__class__, self.side_index, battlefield.turns,
+                battlefield.zobrist)
+
     def expand_cell(self, cell):
-        child_battle = deepcopy(self.battle)
+        self.run_cell(self.battle.clone(), cell)
+
+    def run_cell(self, battle, cell, outcomes=()):
+        """
+        Run cell's actions on battle, and attach the resulting child node or win to cell. The
+        first chance events on the way have the given outcomes (see BreakpointBattle); the next
+        one, if chance is modelled, is attached as a MatrixNodeChance at this node's depth.
+        """
+        battle.chance_outcomes = outcomes
+        battle.chance_index = 0
+        if battle.model_chance:
+            battle.chance_rng_state = battle.rng.getstate()
         try:
-            self.run_actions(child_battle, row_action=cell.row_action, col_action=cell.col_action)
+            self.run_actions(battle, row_action=cell.row_action, col_action=cell.col_action)
+        except BreakChance as bp:
+            cell.node = new_node(bp.state)(battle, self.depth, bp, self, cell)
         except Breakpoint as bp:
-            cell.node = new_node(bp.state)(child_battle, self.depth+1, bp)
+            cell.node = new_node(bp.state)(battle, self.depth+1, bp)
         else:
-            cell.win = child_battle.win
+            cell.win = battle.win
 
     def run_actions(self, child_battle, row_action, col_action):
         """
@@ -126,8 +456,8 @@ class BaseMatrixNode(object):
 
     def calculate_value(self):
         """
-        Called once all child nodes have been evaluated. Sets this node's value based on the value
-        of its children.
+        Called once all child nodes have been evaluated. Sets this node's value (and strategies)
+        based on the value of its children.
         """
         raise NotImplementedError
 
@@ -136,34 +466,110 @@ class BaseMatrixNode(object):
         Called for a node at the maximum depth. Sets this node's value based on the state of the
         battlefield.
         """
-        assert self.__class__.__name__ == 'MatrixNodeNewTurn' # TODO: something better
-        # TODO: approximate
+        self.value = EVALUATOR.evaluate(self.battle.battlefield)
 
+    def solve_matrix(self):
+        """ Set the value and strategies of a simultaneous node to the equilibrium of its matrix """
+        payoff = tuple(tuple(cell_value(cell) for cell in row) for row in self.matrix)
+        self.value, self.row_strategy, self.col_strategy = SOLVER.solve(payoff)
+
+    def order_matrix(self, previous):
+        """
+        Reorder this node's matrix so that the actions played with the highest probability at
+        previous (a node searched for the same state, e.g. in a shallower iteration of iterative
+        deepening) come first. Actions previous didn't have keep their order, after those it did.
+        """
+        rank = action_ranks(previous)
+        self.matrix[0].sort(key=lambda cell: rank.get(
+            (self.side_index, action_key(cell.row_action or cell.col_action)), 1))
 
-class MatrixNodeNewTurn(BaseMatrixNode):
+    def strategy(self, player):
+        """
+        Return player's (0 for the rows, 1 for the columns) strategy at this node, as a list of
+        (action, probability) pairs, or None if the node's value hasn't been calculated.
+        """
+        if player != self.side_index:
+            return None
+        probabilities = self.row_strategy if player == 0 else self.col_strategy
+        if probabilities is None:
+            return None
+        return zip([cell.row_action or cell.col_action for cell in self.matrix[0]], probabilities)
+
+
+class SimultaneousMatrixNode(BaseMatrixNode):
+    """
+    A node where both players choose an action at once. Its matrix is made lazily: populate_matrix
+    only lists each player's actions, in row_actions and col_actions, and each cell is made the
+    first time it is asked for (see cell). A pruned or interrupted search only makes the cells it
+    reaches, in the order of the actions; matrix makes the rest.
+    """
     simultaneous = True
+    row_actions = ()
+    col_actions = ()
+    cells = None # (row action, col action) -> MatrixCell, so that reordering keeps them
 
     def populate_matrix(self, battle, depth, breakpoint):
-        sides = battle.battlefield.sides
-        row_active = sides[0].active_pokemon
-        col_active = sides[1].active_pokemon
+        """ List each player's actions with set_actions """
+        raise NotImplementedError
+
+    def set_actions(self, row_actions, col_actions):
+        self.row_actions = row_actions
+        self.col_actions = col_actions
+        self.cells = {}
+
+    @property
+    def matrix(self):
+        return [[self.cell(a, b) for b in range(len(self.col_actions))]
+                for a in range(len(self.row_actions))]
+
+    def shape(self):
+        return len(self.row_actions), len(self.col_actions)
+
+    def cell(self, a, b):
+        key = (self.row_actions[a], self.col_actions[b])
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = MatrixCell(key[0], key[1], node=None, win=None)
+        return cell
+
+    def calculate_value(self):
+        self.solve_matrix()
+
+    def order_matrix(self, previous):
+        rank = action_ranks(previous)
+        self.row_actions.sort(key=lambda action: rank.get((0, action_key(action)), 1))
+        self.col_actions.sort(key=lambda action: rank.get((1, action_key(action)), 1))
+
+    def strategy(self, player):
+        probabilities = self.row_strategy if player == 0 else self.col_strategy
+        if probabilities is None:
+            return None
+        return zip(self.col_actions if player else self.row_actions, probabilities)
+
+
+class MatrixNodeNewTurn(SimultaneousMatrixNode):
+    def populate_matrix(self, battle, depth, breakpoint):
+        battlefield = battle.battlefield
+        row_active = battlefield.sides[0].active_pokemon
+        col_active = battlefield.sides[1].active_pokemon
         row_actions = []
         col_actions = []
 
-        for active, actions in ((row_active, row_actions), (col_active, col_actions)):
+        for active, foe, actions in ((row_active, col_active, row_actions),
+                                     (col_active, row_active, col_actions)):
+            # The moves expected to do the most damage come first and the switches last, so that
+            # a pruned search finds the strong actions early and can skip more of the rest
+            damage = DAMAGE_TABLE.expected_damage(active, foe, battlefield)
             # TODO: if depth==0, pass index to action
-            for move in active.get_move_choices():
+            moves = sorted(active.get_move_choices(),
+                           key=lambda move, expected=damage: -expected.get(move, 0))
+            for move in moves:
                 actions.append(MoveAction(move.name, None))
             for teammate in active.get_switch_choices():
                 if teammate.name != UNREVEALED:
                     actions.append(SwitchAction(teammate.name, None))
 
-        self.rows = len(row_actions)
-        self.cols = len(col_actions)
-
-        # create a matrix representing the product of each players' possible actions
-        self.matrix = [[MatrixCell(p0, p1, node=None, win=None)
-                        for p1 in col_actions] for p0 in row_actions]
+        self.set_actions(row_actions, col_actions)
 
     def run_actions(self, battle, row_action, col_action):
         events = []
@@ -178,9 +584,6 @@ class MatrixNodeNewTurn(BaseMatrixNode):
         battle.run_queued_events()
         battle.run_battle()
 
-    def calculate_value(self):
-        pass # TODO
-
 
 def make_switch_event(battle, action, index, check_spe):
     side = battle.battlefield.sides[index]
@@ -193,7 +596,6 @@ class MatrixNodeMustSwitch(BaseMatrixNode):
     Represents a decision node in which a side must perform a mid-turn switch.
     This would be caused by moves like uturn or partingshot, or other effects like redcard.
     """
-    side_index = None
     simultaneous = False
 
     def populate_matrix(self, battle, depth, breakpoint):
@@ -216,13 +618,52 @@ class MatrixNodeMustSwitch(BaseMatrixNode):
         action = row_action or col_action
         event = make_switch_event(battle, action, self.side_index, check_spe=False)
 
-        insort(battle.event_queue, event)
+        battle.event_queue.push(event)
         battle.resolve_faint_queue()
         battle.run_queued_events()
         battle.run_battle()
 
     def calculate_value(self):
-        pass # TODO
+        """ The switching side picks the best switch for itself: no mixing is needed """
+        cells = self.matrix[0]
+        if not cells:
+            self.approximate()
+            return
+        values = [cell_value(cell) for cell in cells]
+        self.value = max(values) if self.side_index == 0 else min(values)
+        best = values.index(self.value)
+        strategy = tuple(float(i == best) for i in range(len(values)))
+        if self.side_index == 0:
+            self.row_strategy = strategy
+        else:
+            self.col_strategy = strategy
+
+    def search_cells(self, battle, mark, max_depth, table, deadline, alpha, beta):
+        """
+        Alpha-beta for a single player's decision: each switch narrows the window for the next, and
+        once one is at least beta (for player 0; at most alpha for player 1) the rest can't matter.
+        """
+        cells = self.matrix[0]
+        if not cells:
+            self.approximate()
+            return
+        window = [alpha, beta]
+        maximize = self.side_index == 0
+        best = None
+        for i, cell in enumerate(cells):
+            value = self.search_cell(battle, mark, cell, max_depth, table, deadline, *window)
+            if best is None or (value > self.value if maximize else value < self.value):
+                best, self.value = i, value
+            if (value >= beta) if maximize else (value <= alpha):
+                break
+            window[not maximize] = value
+
+        if is_exact(self.value, alpha, beta):
+            strategy = tuple(float(i == best) for i in range(len(cells)))
+            if maximize:
+                self.row_strategy = strategy
+            else:
+                self.col_strategy = strategy
 
 
 class MatrixNodePostFaintSwitch(MatrixNodeMustSwitch): # use the same populate_matrix
@@ -237,16 +678,14 @@ class MatrixNodePostFaintSwitch(MatrixNodeMustSwitch): # use the same populate_m
         assert row_action if self.side_index == 0 else col_action
 
         action = row_action or col_action
-        switch_queue = [make_switch_event(battle, action, self.side_index, check_spe=False)]
+        switch_events = [make_switch_event(battle, action, self.side_index, check_spe=False)]
 
-        battle.resolve_switch_queue(switch_queue)
+        battle.resolve_switch_queue(switch_events)
         battle.resolve_faint_queue()
         battle.run_turn()
 
 
-class MatrixNodeDoublePostFaintSwitch(BaseMatrixNode):
-    simultaneous = True
-
+class MatrixNodeDoublePostFaintSwitch(SimultaneousMatrixNode):
     def populate_matrix(self, battle, depth, breakpoint):
         row_side = battle.battlefield.sides[0]
         col_side = battle.battlefield.sides[1]
@@ -263,26 +702,143 @@ class MatrixNodeDoublePostFaintSwitch(BaseMatrixNode):
 
         assert row_actions
         assert col_actions
-        self.rows = len(row_actions)
-        self.cols = len(col_actions)
-
-        self.matrix = [[MatrixCell(p0, p1, node=None, win=None)
-                        for p1 in col_actions] for p0 in row_actions]
+        self.set_actions(row_actions, col_actions)
 
     def run_actions(self, battle, row_action, col_action):
         assert row_action and col_action
 
-        switch_queue = sorted((
-            make_switch_event(battle, row_action, 0, check_spe=False),
-            make_switch_event(battle, col_action, 1, check_spe=False)
-        ))
+        switch_events = (make_switch_event(battle, row_action, 0, check_spe=False),
+                         make_switch_event(battle, col_action, 1, check_spe=False))
 
-        battle.resolve_switch_queue(switch_queue)
+        battle.resolve_switch_queue(switch_events)
         battle.resolve_faint_queue()
         battle.run_turn()
 
+
+class MatrixNodeChance(BaseMatrixNode):
+    """
+    Represents a chance event in the middle of a cell's actions (see BreakChance). The matrix is a
+    single row of two cells with the parent cell's actions, one for each outcome, and the value is
+    their expected value. The battle can't be resumed in the middle of an event, so an outcome's
+    cell is run from the parent's state, by running the parent's cell again with this event's
+    outcome (and those of the events before it) decided.
+    """
+    simultaneous = False
+
+    def __init__(self, battle, depth, breakpoint, parent, cell):
+        self.parent = parent
+        self.row_action = cell.row_action
+        self.col_action = cell.col_action
+        self.outcomes = breakpoint.outcomes
+        self.rng_state = battle.chance_rng_state
+        super(MatrixNodeChance, self).__init__(battle, depth, breakpoint)
+
+    def populate_matrix(self, battle, depth, breakpoint):
+        self.probabilities = (breakpoint.probability, 1.0 - breakpoint.probability)
+        self.matrix = [MatrixCell(self.row_action, self.col_action, None, None)
+                       for _ in self.probabilities],
+
+    def transposition_key(self):
+        return None
+
+    def expand_cell(self, cell):
+        rng = BattleRNG(0)
+        rng.setstate(self.rng_state) # so the parent's cell is run again the same way
+        self.run_cell(self.parent.battle.clone(rng), cell)
+
+    def run_cell(self, battle, cell, outcomes=()):
+        """
+        Run cell's outcome on battle, which must be in the parent's state; the chance events after
+        it have the given outcomes
+        """
+        outcome = cell is self.matrix[0][0]
+        self.parent.run_cell(battle, cell, self.outcomes + (outcome,) + outcomes)
+
     def calculate_value(self):
-        pass # TODO
+        self.value = sum(p * cell_value(cell)
+                         for p, cell in zip(self.probabilities, self.matrix[0]))
+
+    def approximate(self):
+        """ This node's battle is in the middle of an event: approximate each outcome instead """
+        for cell in self.matrix[0]:
+            if cell.node is None and cell.win is None:
+                self.expand_cell(cell)
+        self.calculate_value()
+
+    def search(self, max_depth, table=None, deadline=None, prune=False, alpha=0.0, beta=1.0):
+        """
+        Search each outcome, most probable first, running it from the parent's mark (the parent
+        must be being searched). Outcomes that reach the same state (e.g. a secondary effect that
+        changes nothing) are merged: the state is searched once, and its value used for both.
+
+        With prune, each outcome is searched in the narrowest window in which its value can still
+        move the expected value within [alpha, beta], given the values of the outcomes before it
+        and the bounds of 0 and 1 on those after it (Star1; Ballard, 1983). Once an outcome's value
+        falls outside its window, the expected value is known to be at most alpha (or at least
+        beta), and the rest aren't searched. Without prune, the windows are all [0, 1].
+        """
+        if deadline is not None and time.time() > deadline:
+            raise SearchTimeout
+        battle = self.battle
+        mark = self.parent.mark
+        expected = 0.0  # the sum of probability * value of the outcomes searched so far
+        remaining = 1.0 # the probability of the others
+        searched = {}   # the exact values of the outcomes' states, by transposition key
+        for p, cell in sorted(zip(self.probabilities, self.matrix[0]), key=lambda pc: -pc[0]):
+            low = max(0.0, (alpha - expected - (remaining - p)) / p)
+            high = min(1.0, (beta - expected) / p)
+            battle.rollback(mark)
+            self.run_cell(battle, cell)
+            node = cell.node
+            key = ('win', cell.win) if node is None else node.transposition_key()
+            if key in searched:
+                value = node.value = searched[key]
+            elif node is None:
+                value = cell_value(cell)
+            else:
+                value = node.search(max_depth, table, deadline, prune, low, high)
+                if key is not None and is_exact(value, low, high):
+                    searched[key] = value
+            if node is not None:
+                node.battle = None
+
+            if value <= low and low > 0:
+                self.value = alpha
+                break
+            if value >= high and high < 1:
+                self.value = beta
+                break
+            expected += p * value
+            remaining -= p
+        else:
+            self.value = clamp(expected, alpha, beta)
+        return self.value
+
+
+class MatrixNodeChanceAccuracy(MatrixNodeChance):
+    state = BattleState.CHANCE_ACCURACY
+
+
+class MatrixNodeChanceSecondary(MatrixNodeChance):
+    state = BattleState.CHANCE_SECONDARY
+
+
+def root_breakpoint(battlefield, player, moves):
+    """
+    Return the breakpoint for the decision that player was asked to make on battlefield: a new
+    turn, or a switch if moves is None.
+    """
+    if moves is None: # force-switch
+        if battlefield.sides[player].active_pokemon.is_fainted():
+            if battlefield.sides[not player].active_pokemon.is_fainted():
+                log.i('Requesting switch action for a double-switch-in')
+                return BreakDoublePostFaintSwitch
+            log.i('Requesting switch action for a single switch-in after a faint')
+            return BreakPostFaintSwitch(player)
+        log.i('Requesting switch action after a switch move/item took effect')
+        return BreakMustSwitch(player)
+    log.i('Action requested for turn %d', battlefield.turns)
+    return BreakNewTurn
 
 
 def new_node(state):
@@ -291,7 +847,6 @@ def new_node(state):
         BattleState.MUST_SWITCH: MatrixNodeMustSwitch,
         BattleState.POST_FAINT_SWITCH: MatrixNodePostFaintSwitch,
         BattleState.DOUBLE_POST_FAINT_SWITCH: MatrixNodeDoublePostFaintSwitch,
-        # TODO:
-        # BattleState.CHANCE_ACCURACY: MatrixNodeChanceAccuracy,
-        # BattleState.CHANCE_SECONDARY: MatrixNodeChanceSecondary,
+        BattleState.CHANCE_ACCURACY: MatrixNodeChanceAccuracy,
+        BattleState.CHANCE_SECONDARY: MatrixNodeChanceSecondary,
     }[state]
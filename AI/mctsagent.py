@@ -0,0 +1,646 @@
+"""
+Simultaneous-move Monte Carlo tree search (SM-MCTS; Lanctot et al., 2013, and Tak, Lanctot and
+Winands, 2014).
+
+Each iteration runs a clone of the root battle down the tree. At each node, both players choose
+one of their actions independently (decoupled selection: neither knows the other's choice), and
+the node's decision (a node of AI.matrixtree, which runs the actions on a BreakpointBattle until
+the next decision) runs the pair. The randomness of the battle is sampled, so a pair of actions can
+lead to different states: a node's children are keyed by the pair and by the state reached. The
+first state that isn't in the tree yet is added, and valued by a playout (see
+BattleRoller.rollout_one_battle); the value is then backed up along the path, each player's
+selector crediting the action that player chose.
+
+The selectors (see Selection):
+- DUCT: UCB1 for each player, playing the most visited action in the end
+- EXP3: exponential weights on importance-weighted rewards, playing the average strategy
+- REGRET_MATCHING: actions in proportion to their positive regret, playing the average strategy
+
+The search is anytime: it can be stopped after any iteration, and a time budget stops it at the
+deadline. The tree is kept from one decision to the next, rooted at the node reached by the
+actions seen in between (see MCTSAgent.reuse_root).
+
+With a parallelism, the search runs in a WorkerPool (see AI.parallelsearch): ROOT searches a tree
+per worker and merges their root statistics (the trees aren't kept), and LEAF runs the playouts
+of each batch of selected leaves in the workers.
+"""
+import math
+import time
+from collections import namedtuple
+
+from AI.enums import BattleState, Selection, Parallelism
+from AI.matrixtree import BreakpointBattle, Breakpoint, new_node, action_key
+from AI.parallelsearch import SearchAgent, search_pool, merge_statistics
+from AI.rollout import _rollout_chunk
+from battle.enums import Decision
+from battle.rng import BattleRNG
+from misc import pickling
+from _logging import log
+
+
+def sample(strategy, rng):
+    """ Return the index drawn from strategy, a list of probabilities summing to 1 """
+    r = rng.random()
+    for i, p in enumerate(strategy):
+        r -= p
+        if r < 0:
+            return i
+    return max(i for i, p in enumerate(strategy) if p > 0) # rounding error
+
+
+class DUCTSelector(object):
+    """ Decoupled UCT: UCB1 over one player's actions, ignoring the other's """
+    __slots__ = ('visits', 'totals')
+    exploration = 1.0
+
+    def __init__(self, num_actions):
+        self.visits = [0] * num_actions
+        self.totals = [0.0] * num_actions
+
+    def choose(self, rng):
+        """ Return (the index of the chosen action, the probability it was chosen with) """
+        visits = self.visits
+        unvisited = [a for a, n in enumerate(visits) if n == 0]
+        if unvisited:
+            return rng.choice(unvisited), 1.0
+        c = self.exploration * math.sqrt(math.log(sum(visits)))
+        totals = self.totals
+        scores = [totals[a] / n + c / math.sqrt(n) for a, n in enumerate(visits)]
+        return scores.index(max(scores)), 1.0
+
+    def add_virtual_loss(self, index):
+        """
+        Count a visit to index whose reward isn't known yet (i.e. a loss, until it is removed and
+        the reward added by update), so that the next selections of a batch try other actions (see
+        search_leaf_parallel)
+        """
+        self.visits[index] += 1
+
+    def remove_virtual_loss(self, index):
+        self.visits[index] -= 1
+
+    def update(self, index, reward, probability): #pylint: disable=unused-argument
+        # probability is for the mixed selectors' importance weighting
+        self.visits[index] += 1
+        self.totals[index] += reward
+
+    def weights(self):
+        """ The statistics that strategy is made from, which can be summed over several trees """
+        return list(self.visits)
+
+    @staticmethod
+    def strategy_from(visits):
+        """ Play the most visited action """
+        best = visits.index(max(visits))
+        return [float(a == best) for a in range(len(visits))]
+
+    def strategy(self):
+        return self.strategy_from(self.visits)
+
+
+class MixedSelector(object):
+    """
+    A selector that samples from a mixed strategy, mixed with gamma of uniform exploration. Its
+    final strategy is the average of the strategies it sampled from, less the exploration.
+    """
+    __slots__ = ('average',)
+    gamma = 0.1
+
+    def __init__(self, num_actions):
+        self.average = [0.0] * num_actions
+
+    def current_strategy(self):
+        raise NotImplementedError
+
+    def add_virtual_loss(self, index):
+        pass # sampling already spreads a batch of selections over the actions
+
+    def remove_virtual_loss(self, index):
+        pass
+
+    def choose(self, rng):
+        strategy = self.current_strategy()
+        average = self.average
+        for a, p in enumerate(strategy):
+            average[a] += p
+        index = sample(strategy, rng)
+        return index, strategy[index]
+
+    def weights(self):
+        return list(self.average)
+
+    @classmethod
+    def strategy_from(cls, average):
+        total = sum(average)
+        if not total:
+            return [1.0 / len(average)] * len(average)
+        exploration = cls.gamma / len(average)
+        strategy = [max(0.0, p / total - exploration) for p in average]
+        total = sum(strategy)
+        if not total:
+            return [p / sum(average) for p in average]
+        return [p / total for p in strategy]
+
+    def strategy(self):
+        return self.strategy_from(self.average)
+
+
+class Exp3Selector(MixedSelector):
+    """ Exp3: each action's weight grows exponentially with its importance-weighted reward """
+    __slots__ = ('gains',)
+
+    def __init__(self, num_actions):
+        super(Exp3Selector, self).__init__(num_actions)
+        self.gains = [0.0] * num_actions
+
+    def current_strategy(self):
+        gains = self.gains
+        k = len(gains)
+        eta = self.gamma / k
+        top = max(gains)
+        weights = [math.exp(eta * (gain - top)) for gain in gains]
+        total = sum(weights)
+        return [(1 - self.gamma) * w / total + self.gamma / k for w in weights]
+
+    def update(self, index, reward, probability):
+        self.gains[index] += reward / probability
+
+
+class RegretMatchingSelector(MixedSelector):
+    """
+    Regret matching: each action is played in proportion to its positive regret, i.e. how much
+    better it would have done than the actions played, estimated from the sampled rewards.
+    """
+    __slots__ = ('regrets',)
+
+    def __init__(self, num_actions):
+        super(RegretMatchingSelector, self).__init__(num_actions)
+        self.regrets = [0.0] * num_actions
+
+    def current_strategy(self):
+        positive = [max(regret, 0.0) for regret in self.regrets]
+        k = len(positive)
+        total = sum(positive)
+        if not total:
+            return [1.0 / k] * k
+        return [(1 - self.gamma) * r / total + self.gamma / k for r in positive]
+
+    def update(self, index, reward, probability):
+        regrets = self.regrets
+        for a in range(len(regrets)):
+            regrets[a] -= reward
+        regrets[index] += reward / probability
+
+
+SELECTORS = {
+    Selection.DUCT: DUCTSelector,
+    Selection.EXP3: Exp3Selector,
+    Selection.REGRET_MATCHING: RegretMatchingSelector,
+}
+
+
+class MCTSNode(object):
+    """
+    A decision in the search tree. decision is the AI.matrixtree node that runs a pair of actions
+    (without its cells or battle); row_actions and col_actions are each player's choices, which
+    are [None] for a player that doesn't decide here. children maps each pair of action indices to
+    {state key: child node} for the states it has led to. A node for a finished battle has only
+    win.
+    """
+    __slots__ = ('decision', 'row_actions', 'col_actions', 'selectors', 'children', 'visits',
+                 'win')
+
+    def __init__(self, decision, row_actions, col_actions, selector, win=None):
+        self.decision = decision
+        self.row_actions = row_actions
+        self.col_actions = col_actions
+        self.selectors = ((selector(len(row_actions)), selector(len(col_actions)))
+                          if decision is not None else ())
+        self.children = {}
+        self.visits = 0
+        self.win = win
+
+    def __repr__(self):
+        if self.decision is None:
+            return '<MCTSNode: win=%s>' % self.win
+        return '<MCTSNode: %s, %d visits, %d children>' % (
+            self.decision.__class__.__name__, self.visits,
+            sum(map(len, self.children.values())))
+
+    @classmethod
+    def from_battle(cls, battle, breakpoint, selector):
+        """
+        Return the node for battle, stopped at breakpoint (or finished, if breakpoint is None), or
+        None if there is no decision to make there.
+        """
+        if breakpoint is None:
+            return cls(None, (), (), selector, battle.win)
+        decision = new_node(breakpoint.state)(battle, 0, breakpoint)
+        if decision.simultaneous: # its cells are never made
+            row_actions, col_actions = decision.row_actions, decision.col_actions
+        else:
+            actions = [cell.row_action or cell.col_action for cell in decision.matrix[0]]
+            row_actions, col_actions = (actions, [None]) if decision.side_index == 0 else \
+                                       ([None], actions)
+            decision.matrix = None
+        if not row_actions or not col_actions:
+            return None
+        decision.battle = None
+        return cls(decision, row_actions, col_actions, selector)
+
+    def actions(self, player):
+        return self.col_actions if player else self.row_actions
+
+    def signature(self):
+        """ Identify the decision by its type and the set of actions of each player """
+        if self.decision is None:
+            return self.win
+        return (self.decision.__class__,
+                frozenset(action and action_key(action) for action in self.row_actions),
+                frozenset(action and action_key(action) for action in self.col_actions))
+
+    def strategy(self, player):
+        """ Return player's final strategy at this node, as a list of (action, probability) """
+        if self.decision is None or self.actions(player) == [None]:
+            return None
+        return zip(self.actions(player), self.selectors[player].strategy())
+
+    def statistics(self, player):
+        """
+        Return player's selector's weights at this node, as a list of (action, weight), to merge
+        with those of other trees (see AI.parallelsearch.merge_statistics)
+        """
+        if self.decision is None or self.actions(player) == [None]:
+            return None
+        return zip(self.actions(player), self.selectors[player].weights())
+
+    def subtree(self):
+        """ Yield this node and all of the nodes below it """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            for outcomes in node.children.itervalues():
+                stack.extend(outcomes.itervalues())
+
+
+class NodeArena(object):
+    """
+    Holds the nodes of the tree, up to max_nodes. Once it is full, the tree stops growing (each
+    iteration plays out from the first state that isn't in the tree), until reroot releases the
+    nodes that aren't under the new root.
+    """
+    def __init__(self, max_nodes):
+        self.max_nodes = max_nodes
+        self.nodes = []
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return '<NodeArena: %d/%d nodes>' % (len(self.nodes), self.max_nodes)
+
+    @property
+    def full(self):
+        return len(self.nodes) >= self.max_nodes
+
+    def add(self, node):
+        self.nodes.append(node)
+
+    def reroot(self, root):
+        """ Keep only root and the nodes below it """
+        self.nodes = list(root.subtree())
+
+
+def state_key(battle, breakpoint):
+    """ Identify the state that battle stopped in, among those reached by the same actions """
+    if breakpoint is None:
+        return battle.win
+    return (breakpoint.state, getattr(breakpoint, 'side_index', None),
+            battle.battlefield.zobrist)
+
+def observed_action(before, after, player, actions):
+    """
+    Return the index in actions (an MCTSNode's actions for player on battlefield before) of the
+    action that player was seen to make between battlefields before and after: the move whose pp
+    went down, or else the switch to the pokemon that is now active. Return None if it can't be
+    told.
+    """
+    if actions == [None]:
+        return 0
+    old = before.sides[player].active_pokemon
+    new = after.sides[player].active_pokemon
+    if old is None or new is None:
+        return None
+    same = next((pokemon for pokemon in after.sides[player].team if pokemon.name == old.name),
+                None)
+    if same is not None:
+        used = [move.name for move, pp in same.pp.items() if pp < old.pp.get(move, move.max_pp)]
+        if len(used) == 1:
+            return next((i for i, action in enumerate(actions)
+                         if action.action_type == Decision.MOVE and
+                         action.move_name == used[0]), None)
+    if new.name != old.name:
+        return next((i for i, action in enumerate(actions)
+                     if action.action_type == Decision.SWITCH and
+                     action.incoming_name == new.name), None)
+    return None
+
+
+# the last decision's tree, for MCTSAgent.reuse_root: its root, the root's battlefield, and the
+# index of the action I chose among the root's (or None)
+PastDecision = namedtuple('PastDecision', ['root', 'battlefield', 'mine'])
+
+
+class MCTSAgent(SearchAgent):
+    selection = Selection.DUCT
+    iterations = 500    # per decision, when there is no time budget
+    max_nodes = 50000   # in the tree, which keeps roughly 2KB per node
+    max_outcomes = 8    # states kept under each pair of actions; the rest are played out instead
+    max_turns = 3       # playouts are cut off after this many turns (see BattleRoller)
+    reuse_tree = True
+    parallelism = None  # a Parallelism, to search in worker processes (see AI.parallelsearch)
+    leaves_per_worker = 2 # in each batch of a leaf-parallel search,
+    playouts_per_leaf = 4 # ... whose leaves are valued by their mean over this many playouts
+    root_trees = None     # trees in a root-parallel search; by default, one per worker
+    # the attributes that a root-parallel search's workers copy
+    search_settings = ('selection', 'max_nodes', 'max_outcomes', 'max_turns', 'evaluator',
+                       'greedy')
+
+    def __init__(self, pool=None, collect_stats=False, selection=None, iterations=None,
+                 max_nodes=None, parallelism=None):
+        super(MCTSAgent, self).__init__(pool, collect_stats)
+        if selection is not None:
+            self.selection = selection
+        if parallelism is not None:
+            self.parallelism = parallelism
+        if iterations is not None:
+            self.iterations = iterations
+        if max_nodes is not None:
+            self.max_nodes = max_nodes
+        self.arena = NodeArena(self.max_nodes)
+        self.rng = BattleRNG()
+        self.previous = None # the last decision's PastDecision
+        self.searched = None # this decision's, while it is being made
+
+    def __repr__(self):
+        return '<MCTSAgent: %s, %s>' % (self.selection, self.arena)
+
+    def select_action(self, battlefield, moves, switches, can_mega, time_budget=None):
+        self.searched = None
+        action, mega = super(MCTSAgent, self).select_action(battlefield, moves, switches,
+                                                            can_mega, time_budget)
+        searched, self.searched = self.searched, None
+        self.previous = None
+        if searched is not None: # the tree was searched in this process, so it can be kept
+            mine = next((i for i, choice in enumerate(searched.root.actions(self.my_player))
+                         if choice is not None and action_key(choice) == action_key(action)),
+                        None)
+            self.previous = PastDecision(searched.root, searched.battlefield, mine)
+        return action, mega
+
+    def search_decision(self, battle, breakpoint, deadline=None):
+        """
+        Search from the node of the last decision's tree that this decision was reached by, or
+        from a new root, and keep the tree in self.searched (a PastDecision without my action)
+        """
+        fresh = MCTSNode.from_battle(battle, breakpoint, SELECTORS[self.selection])
+        root = self.reuse_root(battle.battlefield, fresh) or fresh
+        self.arena.reroot(root)
+        started = time.time()
+        pool = search_pool(self)
+        if pool is not None and self.parallelism == Parallelism.LEAF:
+            iterations = self.search_leaf_parallel(root, battle, pool, deadline)
+        else:
+            iterations = self.search(root, battle, deadline)
+
+        strategy = root.strategy(self.my_player)
+        log.i('Ran %d iterations in %.2fs (root visited %d times); %s; strategy: %s',
+              iterations, time.time() - started, root.visits, self.arena, strategy)
+        self.searched = PastDecision(root, battle.battlefield, None)
+        return strategy
+
+    def search(self, root, battle, deadline=None, iterations=None):
+        """
+        Run iterations from root (whose state battle is in) until the deadline (a time.time()
+        value) if there is one, or else for iterations (by default, self.iterations). At least one
+        iteration is run. Return the number run.
+        """
+        if iterations is None:
+            iterations = self.iterations
+        count = 0
+        while True:
+            self.run_iteration(root, battle.clone())
+            count += 1
+            if (time.time() > deadline) if deadline is not None else count >= iterations:
+                return count
+
+    def run_iteration(self, root, battle):
+        """ Select a path down from root on battle, add a node, play it out, and back it up """
+        path, breakpoint = self.select_leaf(root, battle)
+        self.backup(path, self.estimate(battle, breakpoint))
+
+    def select_leaf(self, root, battle, virtual_loss=False):
+        """
+        Select a path down from root on battle, adding the first node that isn't in the tree yet
+        (if there is room). Return (path, breakpoint), where battle is left in the leaf's state,
+        stopped at breakpoint, for estimate. With virtual_loss, the path's actions are counted as
+        visited until it is backed up (see DUCTSelector.add_virtual_loss).
+        """
+        rng = self.rng
+        path = []
+        node = root
+        while True:
+            (i, p), (j, q) = node.selectors[0].choose(rng), node.selectors[1].choose(rng)
+            path.append((node, i, p, j, q))
+            try:
+                node.decision.run_actions(battle, node.row_actions[i], node.col_actions[j])
+            except Breakpoint as bp:
+                breakpoint = bp
+            else:
+                breakpoint = None
+
+            outcomes = node.children.setdefault((i, j), {})
+            key = state_key(battle, breakpoint)
+            child = outcomes.get(key)
+            if child is None:
+                if not self.arena.full and len(outcomes) < self.max_outcomes:
+                    child = MCTSNode.from_battle(battle, breakpoint, SELECTORS[self.selection])
+                if child is None:
+                    break
+                outcomes[key] = child
+                self.arena.add(child)
+                if child.decision is None or breakpoint.state == BattleState.NEW_TURN:
+                    break
+            elif child.decision is None:
+                break
+            node = child
+
+        if virtual_loss:
+            for node, i, _, j, _ in path:
+                node.selectors[0].add_virtual_loss(i)
+                node.selectors[1].add_virtual_loss(j)
+        return path, breakpoint
+
+    def backup(self, path, value, virtual_loss=False):
+        """ Back value (player 0's) up along path, which was selected with virtual_loss or not """
+        for node, i, p, j, q in path:
+            node.visits += 1
+            if virtual_loss:
+                node.selectors[0].remove_virtual_loss(i)
+                node.selectors[1].remove_virtual_loss(j)
+            node.selectors[0].update(i, value, p)
+            node.selectors[1].update(j, 1.0 - value, q)
+
+    def search_leaf_parallel(self, root, battle, pool, deadline=None, iterations=None):
+        """
+        Leaf parallelization: like search, but select the leaves in batches of leaves_per_worker
+        per worker (spread out by virtual losses), and play each leaf out playouts_per_leaf times
+        in one of pool's workers. Stops are only checked between batches. Return the number of
+        iterations run.
+
+        Selecting a leaf and sending it to a worker take about as long as a playout that is cut off
+        after a few turns, and this process's share of the work limits the speedup, so each leaf
+        is played out more than once.
+        """
+        if iterations is None:
+            iterations = self.iterations
+        kwargs = dict(turn_initialized=True, first_action=None, max_turns=self.max_turns,
+                      evaluator=self.evaluator, greedy=self.greedy)
+        count = 0
+        while True:
+            size = self.leaves_per_worker * pool.processes
+            if deadline is None:
+                size = min(size, iterations - count)
+            leaves = []
+            for _ in range(size):
+                leaf = battle.clone()
+                path, breakpoint = self.select_leaf(root, leaf, virtual_loss=True)
+                leaves.append((path, leaf, breakpoint))
+
+            jobs = [(pickling.dumps(leaf.battlefield), kwargs, self.rng.getrandbits(64),
+                     self.playouts_per_leaf, self.stats is not None)
+                    for _, leaf, breakpoint in leaves
+                    if breakpoint is not None and breakpoint.state == BattleState.NEW_TURN]
+            results = iter(pool.map(_playout, jobs))
+            for path, leaf, breakpoint in leaves:
+                if breakpoint is not None and breakpoint.state == BattleState.NEW_TURN:
+                    wins, _, stats = next(results)
+                    value = wins[0] / float(self.playouts_per_leaf)
+                    if stats is not None:
+                        self.stats.update(stats)
+                else:
+                    value = self.estimate(leaf, breakpoint)
+                self.backup(path, value, virtual_loss=True)
+
+            count += size
+            if (time.time() > deadline) if deadline is not None else count >= iterations:
+                return count
+
+    def search_root_parallel(self, battlefields, breakpoint, pool, deadline=None):
+        """
+        Root parallelization: search root_trees trees (by default, one per worker) in pool, each
+        from one of battlefields (in turn; see AI.parallelsearch.root_battlefields), stopped at
+        breakpoint, with its own seed, and until the deadline or else for its share of
+        self.iterations.
+        Return (my strategy, from the trees' merged root statistics, or None; the total number of
+        iterations run). The trees are discarded.
+        """
+        trees = self.root_trees or pool.processes
+        settings = {name: getattr(self, name) for name in self.search_settings}
+        iterations = -(-self.iterations // trees)
+        jobs = [(i % len(battlefields), self.rng.getrandbits(64), breakpoint, settings, deadline,
+                 iterations) for i in range(trees)]
+        started = time.time()
+        results = pool.map(_search_tree, jobs, battlefields)
+        total = sum(count for count, _ in results)
+        strategy = merge_statistics([statistics[self.my_player] for _, statistics in results],
+                                    SELECTORS[self.selection].strategy_from)
+        log.i('Ran %d iterations in %d trees in %.2fs; strategy: %s', total, trees,
+              time.time() - started, strategy)
+        return strategy, total
+
+    def estimate(self, battle, breakpoint):
+        """
+        Return the value of battle, stopped at breakpoint (or finished, if breakpoint is None): the
+        result of a playout from a new turn, or else the evaluator's estimate, since a battle
+        can't be played out from the middle of a turn.
+        """
+        if breakpoint is None:
+            return 1.0 if battle.win == 0 else 0.0
+        if breakpoint.state == BattleState.NEW_TURN:
+            value, _ = self.rollout_one_battle(battle.battlefield, True, battle.rng,
+                                               max_turns=self.max_turns,
+                                               evaluator=self.evaluator, greedy=self.greedy,
+                                               stats=self.stats)
+            return value
+        return self.evaluator.evaluate(battle.battlefield)
+
+    def reuse_root(self, root_field, fresh):
+        """
+        Return the node of the last decision's tree for this decision (fresh, on root_field): the
+        most visited one with fresh's signature that was reached by my last action and the foe's
+        observed one, and then by any switches the foe was seen to make on its own (e.g. after a
+        faint). Return None if there is no such node.
+        """
+        if not self.reuse_tree or self.previous is None or fresh is None:
+            return None
+        previous, self.previous = self.previous, None
+        foe = not self.my_player
+        mine = previous.mine
+        theirs = observed_action(previous.battlefield, root_field, foe, previous.root.actions(foe))
+        if mine is None or theirs is None:
+            return None
+
+        pair = (mine, theirs) if self.my_player == 0 else (theirs, mine)
+        candidates = previous.root.children.get(pair, {}).values()
+        active = root_field.sides[foe].active_pokemon
+        for _ in range(2):
+            reached = []
+            for node in candidates:
+                if node.decision is not None and node.actions(self.my_player) == [None]:
+                    for k, action in enumerate(node.actions(foe)):
+                        if active is not None and action.incoming_name == active.name:
+                            reached.extend(node.children.get((k, 0) if foe == 0 else (0, k),
+                                                             {}).values())
+                else:
+                    reached.append(node)
+            candidates = reached
+
+        signature = fresh.signature()
+        matches = [node for node in candidates if node.signature() == signature]
+        if not matches:
+            log.i('No node in the last tree matches this decision')
+            return None
+        root = max(matches, key=lambda node: node.visits)
+        log.i('Reusing the last tree from a node visited %d times', root.visits)
+        return root
+
+
+def _search_tree(battlefields, index, seed, breakpoint, settings, deadline, iterations):
+    """
+    A WorkerPool job of MCTSAgent.search_root_parallel: search a tree from battlefields[index],
+    stopped at breakpoint, with an MCTSAgent that has settings and draws from BattleRNG(seed).
+    Return (the number of iterations run, each player's root statistics).
+    """
+    agent = MCTSAgent()
+    vars(agent).update(settings)
+    agent.arena = NodeArena(agent.max_nodes)
+    agent.rng = BattleRNG(seed)
+    battle = BreakpointBattle.from_battlefield(battlefields[index].clone(), (), (),
+                                               rng=agent.rng.fork())
+    root = MCTSNode.from_battle(battle, breakpoint, SELECTORS[agent.selection])
+    if root is None:
+        return 0, (None, None)
+    agent.arena.reroot(root)
+    count = agent.search(root, battle, deadline, iterations)
+    return count, (root.statistics(0), root.statistics(1))
+
+def _playout(_, battlefield, kwargs, seed, playouts, collect_stats):
+    """
+    A WorkerPool job of MCTSAgent.search_leaf_parallel: run _rollout_chunk for playouts of
+    battlefield, which is pickled with misc.pickling (rather than sent as the snapshot, which would
+    send every leaf of the batch to every worker)
+    """
+    return _rollout_chunk([pickling.loads(battlefield)], kwargs, 0, seed, playouts,
+                          collect_stats)
@@ -1,17 +1,25 @@
-from copy import deepcopy
+import time
 
-from AI.baseagent import BaseAgent
-from AI.rollout import BattleRoller, sanitize_battle_state
-from AI.matrixtree import (BreakpointBattle, BreakNewTurn, BreakMustSwitch, BreakPostFaintSwitch,
-                           BreakDoublePostFaintSwitch, new_node)
+from AI.matrixtree import BreakpointBattle, SearchTimeout, new_node, SOLVER
+from AI.parallelsearch import SearchAgent, merge_statistics
+from AI.transposition import TranspositionTable
+from battle.rng import BattleRNG
 from _logging import log
 
 
-class MinimaxAgent(BaseAgent, BattleRoller):
+class MinimaxAgent(SearchAgent):
     max_fill_in = 1
+    search_depth = 1     # turns to search when there is no time budget
+    max_search_depth = 5 # with a time budget, deepen until it runs out or this depth is searched
+    prune = True         # skip the cells that can't affect the root's value (see search_cells)
+    model_chance = True  # branch on accuracy checks and secondary effects (see MatrixNodeChance)
+    parallelism = None   # Parallelism.ROOT to search in worker processes (see AI.parallelsearch)
+    # the attributes that a root-parallel search's workers copy
+    search_settings = ('my_player', 'search_depth', 'max_search_depth', 'prune', 'model_chance')
 
     def __init__(self, *args, **kwargs):
         super(MinimaxAgent, self).__init__(*args, **kwargs)
+        self.transposition_table = TranspositionTable()
 
     def my_side(self, battlefield):
         return battlefield.sides[self.my_player]
@@ -22,28 +30,104 @@ class MinimaxAgent(BaseAgent, BattleRoller):
     def set_my_player(self, player):
         self.my_player = player
 
-    def select_action(self, battlefield, moves, switches, can_mega):
-        root_field = deepcopy(battlefield)
-        self.fill_in_unrevealed(root_field, max_fill=1)
-        sanitize_battle_state(root_field)
-
-        if moves is None: # force-switch
-            if self.my_side(battlefield).active_pokemon.is_fainted():
-                if self.foe_side(battlefield).active_pokemon.is_fainted():
-                    breakpoint = BreakDoublePostFaintSwitch
-                    log.i('Requesting switch action for a double-switch-in')
-                else:
-                    breakpoint = BreakPostFaintSwitch(self.my_player)
-                    log.i('Requesting switch action for a single switch-in after a faint')
-            else:
-                breakpoint = BreakMustSwitch(self.my_player)
-                log.i('Requesting switch action after a switch move/item took effect')
-        else:
-            breakpoint = BreakNewTurn
-            log.i('Action requested for turn %d', battlefield.turns)
-
-        battle = BreakpointBattle.from_battlefield(root_field, (), ())
-        # pylint: disable=unused-variable
+    def search_decision(self, battle, breakpoint, deadline=None):
+        battle.model_chance = self.model_chance
+        root_node = self.search_root(battle, breakpoint, deadline)
+        strategy = root_node and root_node.strategy(self.my_player)
+        log.i('Root value %s; strategy: %s; %s', root_node and root_node.value, strategy, SOLVER)
+        return strategy
+
+    def search_root(self, battle, breakpoint, deadline=None):
+        """
+        Search the decision that battle is stopped at (breakpoint) search_depth turns ahead, or
+        deepen until the deadline if there is one. Return the root node (see deepen for when it
+        can be None).
+        """
+        if deadline is not None:
+            return self.deepen(battle, breakpoint, deadline)
         root_node = new_node(breakpoint.state)(battle, depth=0, breakpoint=breakpoint)
+        root_node.search(self.search_depth, self.transposition_table, prune=self.prune)
+        log.i('Searched %d turns ahead: %s', self.search_depth, self.transposition_table)
+        return root_node
+
+    def search_root_parallel(self, battlefields, breakpoint, pool, deadline=None):
+        """
+        Root parallelization: search each of battlefields (determinizations; see
+        AI.parallelsearch.root_battlefields), stopped at breakpoint, in pool, each with its own
+        seed and transposition table. Return (my strategy, averaged over the searches that have
+        one, or None; the mean of their root values, or None).
+        """
+        settings = {name: getattr(self, name) for name in self.search_settings}
+        rng = BattleRNG()
+        jobs = [(i, rng.getrandbits(64), breakpoint, settings, deadline)
+                for i in range(len(battlefields))]
+        started = time.time()
+        results = [result for result in pool.map(_search_determinization, jobs, battlefields)
+                   if result[0] is not None]
+        strategy = merge_statistics([strategy for strategy, _ in results])
+        value = sum(value for _, value in results) / len(results) if results else None
+        log.i('Searched %d determinizations (%d with a strategy) in %.2fs: root value %s; '
+              'strategy: %s', len(battlefields), len(results), time.time() - started, value,
+              strategy)
+        return strategy, value
+
+    def deepen(self, battle, breakpoint, deadline):
+        """
+        Iterative deepening: search the tree 1, 2, ... turns deep (up to max_search_depth), until
+        the next iteration isn't expected to finish before the deadline. Each iteration's root
+        actions are ordered by the previous iteration's strategy, and the transposition table keeps
+        the values of the subtrees searched so far. An iteration that is still running at the
+        deadline is abandoned.
+
+        Return the root node of the deepest completed iteration that has a strategy (its value
+        could come from the transposition table instead), or None.
+        """
+        best = None
+        previous_duration = None
+        for depth in range(1, self.max_search_depth + 1):
+            started = time.time()
+            root_node = new_node(breakpoint.state)(battle, depth=0, breakpoint=breakpoint)
+            if best is not None:
+                root_node.order_matrix(best)
+            try:
+                root_node.search(depth, self.transposition_table, deadline, self.prune)
+            except SearchTimeout:
+                log.i('Abandoned the search %d turns ahead at the deadline', depth)
+                break
+
+            log.i('Searched %d turns ahead: %s', depth, self.transposition_table)
+            if root_node.strategy(self.my_player) is not None:
+                best = root_node
+
+            # expect the next iteration to take as many times longer than this one as this one did
+            # than the last (or as many times as there are cells, for the first)
+            duration = time.time() - started
+            if previous_duration:
+                growth = max(duration / previous_duration, 1.0)
+            else:
+                rows, cols = root_node.shape()
+                growth = rows * cols
+            if time.time() + duration * growth > deadline:
+                break
+            previous_duration = duration
+
+        return best
+
 
-        # TODO: return mixed-strategy selection from solved probability distribution
+def _search_determinization(battlefields, index, seed, breakpoint, settings, deadline):
+    """
+    A WorkerPool job of MinimaxAgent.search_root_parallel: search battlefields[index], stopped at
+    breakpoint, with a MinimaxAgent that has settings, drawing from BattleRNG(seed). Return (the
+    root's strategy for the agent's player, the root's value), or (None, None) if there is no root
+    or it has no strategy.
+    """
+    agent = MinimaxAgent()
+    vars(agent).update(settings)
+    battle = BreakpointBattle.from_battlefield(battlefields[index].clone(), (), (),
+                                               rng=BattleRNG(seed))
+    battle.model_chance = agent.model_chance
+    root_node = agent.search_root(battle, breakpoint, deadline)
+    strategy = root_node and root_node.strategy(agent.my_player)
+    if not strategy:
+        return None, None
+    return strategy, root_node.value
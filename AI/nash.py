@@ -0,0 +1,182 @@
+"""
+A solver for the zero-sum matrix games at the simultaneous nodes of the matrix tree (see
+AI.matrixtree), where each player picks an action without knowing the other's.
+
+The payoff matrices are small (at most 9 rows by 9 columns: 4 moves and 5 switches each), and a
+search solves one per node, so the solver tries the cheap cases first:
+
+1. iterated elimination of dominated rows and columns, which often leaves a single action
+2. a 1xN or Nx1 game, or a pure saddle point, which needs no mixing
+3. the closed form for a 2x2 game
+4. otherwise, the simplex method on the game's linear program
+
+Solutions are cached by payoff matrix, since identical matrices are common (e.g. among nodes
+whose cells are all wins and losses).
+"""
+from operator import sub
+
+EPSILON = 1e-9
+MAX_PIVOTS = 1000 # a safeguard against cycling; a 9x9 game takes about 10
+
+
+class NashSolver(object):
+    max_size = 100000 # solutions; the cache is cleared when it is full
+
+    def __init__(self):
+        self._cache = {}
+        self.hits = self.misses = 0
+
+    def __repr__(self):
+        return '<NashSolver: %d cached, %d hits, %d misses>' % (len(self._cache), self.hits,
+                                                                self.misses)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def clear(self):
+        self._cache.clear()
+
+    def solve(self, payoff):
+        """
+        Solve the zero-sum game whose payoff matrix (to the row player, who maximizes it) is payoff:
+        a tuple of rows, each a tuple of numbers. Return (value, row_strategy, col_strategy), where
+        the strategies are tuples of the probability of playing each row/column.
+        """
+        solution = self._cache.get(payoff)
+        if solution is None:
+            self.misses += 1
+            if len(self._cache) >= self.max_size:
+                self._cache.clear()
+            solution = self._cache[payoff] = solve_game(payoff)
+        else:
+            self.hits += 1
+        return solution
+
+
+def solve_game(payoff):
+    """ Solve the game with payoff matrix payoff (uncached); see NashSolver.solve """
+    rows, cols = eliminate_dominated(payoff, range(len(payoff)), range(len(payoff[0])))
+
+    value, row, col = _solve_pure(payoff, rows, cols) # always solves a 1xN or Nx1 game
+    if row is None:
+        if len(rows) == 2 and len(cols) == 2:
+            value, row, col = _solve_2x2(payoff, rows, cols)
+        else:
+            value, row, col = _solve_lp(payoff, rows, cols)
+
+    row_strategy = [0.0] * len(payoff)
+    for i, p in zip(rows, row):
+        row_strategy[i] = p
+    col_strategy = [0.0] * len(payoff[0])
+    for j, q in zip(cols, col):
+        col_strategy[j] = q
+    return value, tuple(row_strategy), tuple(col_strategy)
+
+def eliminate_dominated(payoff, rows, cols):
+    """
+    Repeatedly remove the rows and columns (of the given lists of indices) that are weakly
+    dominated by another remaining one, until none are. Return the remaining (rows, cols).
+    Removing weakly dominated actions keeps the value of the game, and at least one equilibrium.
+    """
+    rows, cols = list(rows), list(cols)
+    while len(rows) > 1 or len(cols) > 1:
+        dominated = _find_dominated([[payoff[i][j] for j in cols] for i in rows])
+        if dominated is not None:
+            del rows[dominated]
+            continue
+        # negated, so that the column player's dominant actions are also the greater ones
+        dominated = _find_dominated([[-payoff[i][j] for i in rows] for j in cols])
+        if dominated is None:
+            break
+        del cols[dominated]
+    return rows, cols
+
+def _find_dominated(vectors):
+    """ Return the index of a vector that another is >= in every position, or None """
+    if len(vectors) > 1:
+        sums = map(sum, vectors) # a vector can only be dominated by one with a greater sum
+        for i, vector in enumerate(vectors):
+            for k, other in enumerate(vectors):
+                if k != i and sums[k] >= sums[i] and min(map(sub, other, vector)) >= 0:
+                    return i
+    return None
+
+def _solve_pure(payoff, rows, cols):
+    """
+    Return the solution (value, row strategy, col strategy) as a pure strategy pair if the game
+    has a saddle point, as a 1xN or Nx1 game always does, or else (None, None, None)
+    """
+    row_mins = [min(payoff[i][j] for j in cols) for i in rows]
+    col_maxes = [max(payoff[i][j] for i in rows) for j in cols]
+    maximin = max(row_mins)
+    minimax = min(col_maxes)
+    if minimax - maximin > EPSILON:
+        return None, None, None
+    best_row = row_mins.index(maximin)
+    best_col = col_maxes.index(minimax)
+    return (maximin, [float(r == best_row) for r in range(len(rows))],
+            [float(c == best_col) for c in range(len(cols))])
+
+def _solve_2x2(payoff, rows, cols):
+    """ Solve a 2x2 game that has no saddle point, whose equilibrium is mixed """
+    (i, k), (j, l) = rows, cols
+    a, b = payoff[i][j], payoff[i][l]
+    c, d = payoff[k][j], payoff[k][l]
+    denominator = float(a - b - c + d)
+    p = (d - c) / denominator
+    q = (d - b) / denominator
+    return (a * d - b * c) / denominator, [p, 1 - p], [q, 1 - q]
+
+def _solve_lp(payoff, rows, cols):
+    """
+    Solve the game with the simplex method. With the payoffs shifted to be at least 1, the column
+    player's optimal strategy is y / sum(y) for the y that maximizes sum(y) subject to
+    (payoff . y)[i] <= 1 for each row i and y >= 0; the row player's is the dual solution, and the
+    value of the shifted game is 1 / sum(y).
+    """
+    shift = 1.0 - min(payoff[i][j] for i in rows for j in cols)
+    m, n = len(rows), len(cols)
+    # one row per constraint: [coefficients of y..., of the slack variables..., right hand side]
+    tableau = [[payoff[i][j] + shift for j in cols] + [float(s == r) for s in range(m)] + [1.0]
+               for r, i in enumerate(rows)]
+    objective = [-1.0] * n + [0.0] * m + [0.0]
+    basis = range(n, n + m) # the slack variables
+
+    for _ in range(MAX_PIVOTS):
+        # Dantzig's rule: the variable that improves the objective fastest enters
+        entering = min(range(n + m), key=objective.__getitem__)
+        if objective[entering] >= -EPSILON:
+            break
+        leaving = best_ratio = None
+        for r in range(m):
+            coefficient = tableau[r][entering]
+            if coefficient > EPSILON:
+                ratio = tableau[r][-1] / coefficient
+                if (leaving is None or ratio < best_ratio - EPSILON or
+                        (ratio < best_ratio + EPSILON and basis[r] < basis[leaving])):
+                    leaving, best_ratio = r, ratio
+
+        pivot_row = tableau[leaving]
+        pivot = pivot_row[entering]
+        pivot_row = tableau[leaving] = [x / pivot for x in pivot_row]
+        for r in range(m):
+            factor = tableau[r][entering]
+            if r != leaving and factor:
+                tableau[r] = [x - factor * y for x, y in zip(tableau[r], pivot_row)]
+        factor = objective[entering]
+        objective = [x - factor * y for x, y in zip(objective, pivot_row)]
+        basis[leaving] = entering
+
+    total = objective[-1]
+    col = [0.0] * n
+    for r, v in enumerate(basis):
+        if v < n:
+            col[v] = tableau[r][-1] / total
+    row = [x / total for x in objective[n:n + m]]
+    return 1.0 / total - shift, _normalize(row), _normalize(col)
+
+def _normalize(strategy):
+    """ Scale strategy to sum to 1, zeroing the tiny negative probabilities of rounding errors """
+    strategy = [max(0.0, p) for p in strategy]
+    total = sum(strategy)
+    return [p / total for p in strategy]
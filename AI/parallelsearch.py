@@ -0,0 +1,135 @@
+"""
+The common parts of the agents' parallel search drivers, which run a decision's search in the
+processes of a WorkerPool (see AI.workerpool). An agent's parallelism (see Parallelism) chooses the
+driver:
+
+- ROOT: each worker searches a tree of its own, from its own determinization of the foe's hidden
+  information (see AI.determinize) and with its own seed, and the trees' root statistics are
+  merged into one strategy (see merge_statistics). The trees share nothing while they are searched,
+  so this scales with the number of workers, as long as there are at least as many trees. See
+  MCTSAgent.search_root_parallel and MinimaxAgent.search_root_parallel.
+- LEAF: a single tree is searched in the agent's process, which selects its leaves in batches and
+  sends each batch's playouts to the workers. Only the playouts are parallel, so this suits
+  searches whose time goes into their playouts. See MCTSAgent.search_leaf_parallel; the matrix
+  tree's leaves are valued by the evaluator, which is cheaper than sending them to a worker, so
+  MinimaxAgent only has the ROOT driver.
+
+Jobs draw their randomness from the seeds they are given: the workers are forked from the same
+process, so their own random states are all the same.
+
+Both agents choose between the drivers and their serial search in SearchAgent.select_action.
+"""
+import time
+from collections import OrderedDict
+
+from AI.baseagent import BaseAgent
+from AI.determinize import DeterminizationSampler
+from AI.enums import Parallelism
+from AI.matrixtree import BreakpointBattle, action_key, root_breakpoint
+from AI.rollout import BattleRoller, sanitize_battle_state
+from AI.workerpool import WorkerPool
+from battle.enums import Decision
+from battle.rng import BattleRNG
+
+
+class SearchAgent(BaseAgent, BattleRoller):
+    """
+    An agent that searches each decision: root-parallel (see search_root_parallel) if its
+    parallelism is ROOT and it has a pool, or else in this process (see search_decision).
+    """
+    parallelism = None # a Parallelism, to search in worker processes
+
+    def select_action(self, battlefield, moves, switches, can_mega, time_budget=None):
+        breakpoint = root_breakpoint(battlefield, self.my_player, moves)
+        deadline = None if time_budget is None else time.time() + time_budget
+        pool = search_pool(self)
+        if pool is not None and self.parallelism == Parallelism.ROOT:
+            battlefields = root_battlefields(self, battlefield,
+                                             self.determinizations or pool.processes)
+            strategy, _ = self.search_root_parallel(battlefields, breakpoint, pool, deadline)
+        else:
+            root_field = battlefield.clone()
+            self.fill_in_unrevealed(root_field, max_fill=1)
+            sanitize_battle_state(root_field)
+            root_field.reset_zobrist()
+
+            battle = BreakpointBattle.from_battlefield(root_field, (), ())
+            if self.stats is not None:
+                self.stats.start()
+                battle.stats = self.stats
+            try:
+                strategy = self.search_decision(battle, breakpoint, deadline)
+            finally:
+                if self.stats is not None:
+                    self.stats.stop()
+
+        action = self.sample_action(strategy, moves or [], switches)
+        return action, can_mega and action.action_type == Decision.MOVE
+
+    def search_decision(self, battle, breakpoint, deadline=None):
+        """
+        Search the decision that battle (on a filled-in and sanitized copy of the battlefield) is
+        stopped at (breakpoint), until the deadline if there is one. Return my strategy, or None.
+        """
+        raise NotImplementedError
+
+    def search_root_parallel(self, battlefields, breakpoint, pool, deadline=None):
+        """
+        Search the decision in pool, from each of battlefields (see root_battlefields), stopped at
+        breakpoint. Return (my strategy, or None; a statistic of the search for logging).
+        """
+        raise NotImplementedError
+
+
+
+def search_pool(agent):
+    """
+    Return the WorkerPool to run agent's search in, or None if it searches serially: agent.pool,
+    or else (if agent.workers > 1) a pool that is started the first time it is needed and kept, as
+    BattleRoller.run_rollouts does.
+    """
+    if agent.parallelism is None:
+        return None
+    if agent.pool is None and agent.workers > 1:
+        agent.pool = WorkerPool(agent.workers)
+    return agent.pool
+
+def root_battlefields(agent, battlefield, count):
+    """
+    Return count determinizations of battlefield, the decision of agent (a BattleRoller), to root
+    the trees of a root-parallel search at: sanitized, and with their zobrist hashes reset.
+    """
+    if agent.sampler is None:
+        agent.sampler = DeterminizationSampler()
+    battlefields = agent.sampler.sample(battlefield, not agent.my_player, count, BattleRNG())
+    for clone in battlefields:
+        sanitize_battle_state(clone)
+        clone.reset_zobrist()
+    return battlefields
+
+def normalize(weights):
+    total = float(sum(weights))
+    if not total:
+        return [1.0 / len(weights)] * len(weights)
+    return [weight / total for weight in weights]
+
+def merge_statistics(statistics, strategy_from=normalize):
+    """
+    Merge one player's root statistics from several trees: each a list of (action, weight) pairs,
+    or None for a tree where the player has no decision to make. The trees' actions are matched by
+    action_key, since each tree has its own action objects. Each action's weights are summed, and
+    strategy_from turns the sums (a list) into a list of probabilities.
+
+    Return the merged strategy as a list of (action, probability) pairs, or None if no tree had
+    one.
+    """
+    weights = OrderedDict()
+    actions = {}
+    for tree in statistics:
+        for action, weight in tree or ():
+            key = action_key(action)
+            actions.setdefault(key, action)
+            weights[key] = weights.get(key, 0.0) + weight
+    if not weights:
+        return None
+    return zip([actions[key] for key in weights], strategy_from(weights.values()))
@@ -3,13 +3,14 @@ from AI.baseagent import BaseAgent
 
 
 class RandomAgent(BaseAgent):
-    def __init__(self, switch_freq=0.1):
+    def __init__(self, switch_freq=0.1, pool=None, collect_stats=False):
+        super(RandomAgent, self).__init__(pool, collect_stats)
         self.switch_freq = switch_freq
 
     def __repr__(self):
         return '<RandomAgent:switch_freq=%s>' % self.switch_freq
 
-    def select_action(self, _, moves, switches, can_mega):
+    def select_action(self, _, moves, switches, can_mega, time_budget=None):
         if not moves or (switches and random.random() < self.switch_freq):
             return random.choice(switches), False
 
@@ -1,67 +1,313 @@
 import random
+import time
 from collections import Counter
-from copy import deepcopy
+from math import sqrt
 
 from battle.battleengine import Battle
 from battle.battlepokemon import BattlePokemon
-from battle.rolloutpolicy import RandomRolloutPolicy
+from battle.damagetable import DamageTable
+from battle.rolloutpolicy import BaseRolloutPolicy, RandomRolloutPolicy, GreedyRolloutPolicy
+from AI.determinize import DeterminizationSampler, EXCLUDED, apply_set
+from AI.evaluator import MaterialEvaluator
+from AI.workerpool import WorkerPool
 from bot.foeside import UNREVEALED
 from showdowndata import pokedex, type_index
 from showdowndata.rbstats import rbstats, rbstats_key
 from battle.items import itemdex
 from battle.abilities import abilitydex
 from battle.moves import movedex
-from battle.enums import Type
+from battle.enums import Type, Decision
+from battle.rng import BattleRNG
+from battle.rolloutstats import RolloutStats
 from battle.stats import Boosts
+from misc.lru import LRUCache
 from _logging import log, no_console_log
 
+# Shared by the greedy rollouts in this process (and kept, in a worker, from one decision to the
+# next), since the same matchups come up again and again
+DAMAGE_TABLE = DamageTable()
 
 class BattleRoller(object):
-    def __init__(self, my_player):
-        self._cache = {}
+    """
+    Estimates the value of a battlefield by playing it out with random rollouts. If greedy, the
+    rollouts use GreedyRolloutPolicy instead of RandomRolloutPolicy: slower per turn, but much
+    closer to how a battle would actually go.
+
+    rollout_battles runs a fixed number of rollouts. rollout_until_confident runs them in batches
+    of batch_size, and stops as soon as the win rate is known to within target_half_width, or is
+    decisively above or below 0.5. race_actions compares candidate actions for my first decision
+    by successive elimination, so that rollouts are spent only on the actions that are still
+    close to the best one.
+
+    If max_turns is set, each rollout is cut off after that many turns, and the evaluator's
+    estimate of the battlefield (see AI.evaluator) stands in for its result. Cut off or not, a
+    rollout adds its value to player 0's count of wins and the rest to player 1's, so the counts
+    may be fractional. self.turns_simulated is the number of turns simulated for the latest
+    decision (i.e. call to rollout_battles, rollout_until_confident or race_actions).
+
+    If determinizations is set, the foe's hidden information is sampled that many times (see
+    AI.determinize) instead of being filled in with its most probable values, and the rollouts are
+    spread evenly over the samples.
+
+    If collect_stats, self.stats is a battle.rolloutstats.RolloutStats of the latest decision,
+    which is also logged at the end of the decision.
+
+    If workers > 1 (or a WorkerPool is given), the rollouts are split into chunks of chunk_size
+    (by default, enough for four chunks per worker) and run in the pool's worker processes, each
+    chunk with its own rng stream. The pool is kept across turns; if none is given, the roller
+    starts its own the first time it is needed.
+    """
+    workers = 1
+    chunk_size = None
+    pool = None
+    batch_size = 16
+    confidence_z = 1.96       # ~95% confidence intervals
+    target_half_width = 0.05
+    max_turns = None
+    evaluator = MaterialEvaluator()
+    turns_simulated = 0
+    greedy = False
+    determinizations = None
+    sampler = None
+    filled_teams = None
+    stats = None
+
+    def __init__(self, my_player, workers=None, chunk_size=None, pool=None, max_turns=None,
+                 evaluator=None, greedy=None, determinizations=None, collect_stats=False):
         self.my_player = my_player
+        if workers is not None:
+            self.workers = workers
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+        if pool is not None:
+            self.pool = pool
+        if max_turns is not None:
+            self.max_turns = max_turns
+        if evaluator is not None:
+            self.evaluator = evaluator
+        if greedy is not None:
+            self.greedy = greedy
+        if determinizations is not None:
+            self.determinizations = determinizations
+        if collect_stats:
+            self.stats = RolloutStats()
+
+    def prepare_for_rollouts(self, battlefield, turn_initialized):
+        """
+        Return a list of filled-in and sanitized clones of battlefield to roll out: one per
+        determinization of the foe's hidden information if self.determinizations is set (see
+        AI.determinize), or else one filled in by fill_in_unrevealed.
+        """
+        if self.stats is not None:
+            self.stats.start()
+        if self.determinizations:
+            if self.sampler is None:
+                self.sampler = DeterminizationSampler()
+            battlefields = self.sampler.sample(battlefield, not self.my_player,
+                                               self.determinizations, BattleRNG())
+        else:
+            battlefields = [battlefield.clone()]
+            self.fill_in_unrevealed(battlefields[0])
+        for clone in battlefields:
+            sanitize_battle_state(clone)
+            clone.reset_zobrist()
+        self.turns_simulated = 0
+
+        log.i('Rolling out battle: my_player=%d, turn_initialized=%s, turn=%d, '
+              'determinizations=%d', self.my_player, turn_initialized, battlefield.turns,
+              len(battlefields))
+        return battlefields
 
     def rollout_battles(self, battlefield, num_rollouts, turn_initialized):
-        clone = deepcopy(battlefield)
-        self.fill_in_unrevealed(clone)
-        sanitize_battle_state(clone)
+        battlefields = self.prepare_for_rollouts(battlefield, turn_initialized)
+        wins = self.run_rollouts(battlefields, [(None, num_rollouts)], turn_initialized)[0]
 
-        log.i('Rolling out battle: my_player=%d, turn_initialized=%s, turn=%d',
-              self.my_player, turn_initialized, battlefield.turns)
+        log.i('rollout results: %s (%d turns simulated)', sorted(wins.items()),
+              self.turns_simulated)
+        self.log_stats()
+        return wins
 
+    def rollout_until_confident(self, battlefield, max_rollouts, turn_initialized):
+        """
+        Run rollouts in batches until the win rate's confidence interval is narrower than
+        2*target_half_width, or excludes 0.5, or max_rollouts have been run. Return the Counter of
+        winners; its total is the number of rollouts actually used.
+        """
+        battlefields = self.prepare_for_rollouts(battlefield, turn_initialized)
         wins = Counter()
-        for _ in range(num_rollouts):
-            winner = self.rollout_one_battle(clone, turn_initialized)
-            wins[winner] += 1
+        used = 0
+        while used < max_rollouts:
+            batch = min(self.batch_size, max_rollouts - used)
+            wins.update(self.run_rollouts(battlefields, [(None, batch)], turn_initialized)[0])
+            used += batch
+            if self.is_decided(wins[self.my_player], used):
+                break
 
-        log.i('rollout results: %s', sorted(wins.items()))
+        log.i('rollout results: %s (used %d of %d rollouts, %d turns simulated)',
+              sorted(wins.items()), used, max_rollouts, self.turns_simulated)
+        self.log_stats()
         return wins
 
+    def race_actions(self, battlefield, actions, max_rollouts, turn_initialized):
+        """
+        Race the candidate actions (AI.actions.Action) for my first decision: each round, every
+        action still in the race gets a batch of rollouts in which I make that decision first, and
+        any action whose win rate's upper bound falls below the best action's lower bound is
+        eliminated. The race ends when one action is left, when the remaining actions' win rates
+        are all known to within target_half_width, or when they have had max_rollouts each.
+
+        Return {action: Counter of winners} for all of the actions, and the list of the actions
+        that were still in the race at the end.
+        """
+        battlefields = self.prepare_for_rollouts(battlefield, turn_initialized)
+        wins = {action: Counter() for action in actions}
+        used = dict.fromkeys(actions, 0)
+        racing = list(actions)
+
+        while len(racing) > 1 and used[racing[0]] < max_rollouts:
+            batch = min(self.batch_size, max_rollouts - used[racing[0]])
+            results = self.run_rollouts(battlefields, [((self.my_player, action), batch)
+                                                       for action in racing], turn_initialized)
+            intervals = {}
+            for action, result in zip(racing, results):
+                wins[action].update(result)
+                used[action] += batch
+                intervals[action] = win_rate_interval(wins[action][self.my_player], used[action],
+                                                      self.confidence_z)
+
+            best_low = max(low for low, _ in intervals.values())
+            racing = [action for action in racing if intervals[action][1] >= best_low]
+            if all(high - low <= 2 * self.target_half_width
+                   for low, high in (intervals[action] for action in racing)):
+                break
+
+        log.i('race results: %s (used %d rollouts, %d turns simulated, still racing: %s)',
+              [(action, wins[action][self.my_player], used[action]) for action in actions],
+              sum(used.values()), self.turns_simulated, racing)
+        self.log_stats()
+        return wins, racing
+
+    def log_stats(self):
+        """ Stop collecting stats for the latest decision, and log them (if collect_stats) """
+        if self.stats is not None:
+            self.stats.stop()
+            log.i('%s; most dispatched: %s', self.stats, self.stats.most_dispatched())
+
+    def is_decided(self, num_wins, num_rollouts):
+        low, high = win_rate_interval(num_wins, num_rollouts, self.confidence_z)
+        return high - low <= 2 * self.target_half_width or low > 0.5 or high < 0.5
+
+    def run_rollouts(self, battlefields, batches, turn_initialized):
+        """
+        Run a batch of rollouts of battlefields (as returned by prepare_for_rollouts; the rollouts
+        are spread evenly over them) for each (first_action, num_rollouts) in batches, and return
+        a Counter of winners for each batch. See rollout_one_battle for first_action.
+        """
+        options = [dict(turn_initialized=turn_initialized, first_action=first_action,
+                        max_turns=self.max_turns, evaluator=self.evaluator, greedy=self.greedy)
+                   for first_action, _ in batches]
+        if self.pool is None and self.workers == 1:
+            results = []
+            for kwargs, (_, num_rollouts) in zip(options, batches):
+                wins, turns = _rollout_batch(battlefields, kwargs, 0, num_rollouts,
+                                             stats=self.stats)
+                results.append(wins)
+                self.turns_simulated += turns
+            return results
+
+        if self.pool is None:
+            self.pool = WorkerPool(self.workers)
+        chunks_wanted = 4 * self.pool.processes
+        total = sum(num_rollouts for _, num_rollouts in batches)
+        chunk_size = self.chunk_size or max(1, (total + chunks_wanted - 1) // chunks_wanted)
+        rng = BattleRNG()
+        chunks, owners = [], []
+        for i, (kwargs, (_, num_rollouts)) in enumerate(zip(options, batches)):
+            for start in range(0, num_rollouts, chunk_size):
+                chunks.append((kwargs, start, rng.getrandbits(64),
+                               min(chunk_size, num_rollouts - start), self.stats is not None))
+                owners.append(i)
+
+        results = [Counter() for _ in batches]
+        for i, (wins, turns, stats) in zip(owners,
+                                           self.pool.map(_rollout_chunk, chunks, battlefields)):
+            results[i].update(wins)
+            self.turns_simulated += turns
+            if stats is not None:
+                self.stats.update(stats)
+        return results
+
+    @staticmethod
     @no_console_log
-    def rollout_one_battle(self, battlefield, turn_initialized):
+    def rollout_one_battle(battlefield, turn_initialized, rng=None, first_action=None,
+                           max_turns=None, evaluator=None, greedy=False, stats=None):
         """
         Create a Battle from the client's battlefield, and run the game forward.
         If turn_initialized, then skip running Battle.init_turn for the next turn.
+        If first_action is a (player, action) pair, then that player's first decision is action.
+        If max_turns is set, stop after that many more turns, and let evaluator score the result.
+        If greedy, both players use GreedyRolloutPolicy (with this process's DAMAGE_TABLE).
+        If stats (a RolloutStats) is given, the rollout is counted and timed in it.
+
+        Return (value, turns): value is 1 if player 0 won and 0 if player 1 won, or the
+        evaluator's score if the battle was cut off; turns is the number of turns simulated.
         """
-        clone = deepcopy(battlefield)
-        battle = Battle.from_battlefield(clone, *[RandomRolloutPolicy(i) for i in range(2)])
+        if stats is not None:
+            started = time.time()
+        clone = battlefield.clone()
+        if stats is not None:
+            stats.clone_time += time.time() - started
+        if greedy:
+            policies = [GreedyRolloutPolicy(i, DAMAGE_TABLE) for i in range(2)]
+        else:
+            policies = [RandomRolloutPolicy(i) for i in range(2)]
+        if first_action is not None:
+            player = first_action[0]
+            policies[player] = FirstActionRolloutPolicy(player, first_action[1], policies[player])
+        battle = Battle.from_battlefield(clone, *policies, rng=rng)
+        if stats is not None:
+            battle.stats = stats
+            started = time.time()
 
+        start = clone.turns
         if turn_initialized:
             battle.run_initialized_turn() # run the next turn without initializing it
-        return battle.run_battle()        # complete the battle and return the winner
+        if max_turns is None:
+            battle.run_battle()           # complete the battle
+        else:
+            while clone.win is None and clone.turns - start < max_turns:
+                battle.run_turn()
+        turns = clone.turns - start
+
+        if stats is not None:
+            stats.simulate_time += time.time() - started
+            stats.battles += 1
+            stats.turns += turns
+        if clone.win is None:
+            return evaluator.evaluate(clone), turns
+        return int(clone.win == 0), turns
 
     def fill_in_unrevealed(self, battlefield, max_fill=6):
         """
         Fill in the unrevealed moves/abilities/item of known foe pokemon with their most probable
         values (based on rbstats). Generate remaining unrevealed foe pokemon with a type that
         balances the foe's team.
+
+        Filled-in teams are kept in self.filled_teams (a FilledTeamCache), keyed by everything that
+        has been revealed about the foe's team, so that the same foe team is used until something
+        more is revealed.
         """
+        if self.filled_teams is None:
+            self.filled_teams = FilledTeamCache()
         foe_side = battlefield.sides[not self.my_player]
+        key = revealed_foe_key(foe_side)
+        filled_team = self.filled_teams.get(key)
+        if filled_team is None:
+            filled_team = fill_in_foe_team(battlefield.clone().sides[foe_side.index])
+            self.filled_teams.put(key, filled_team)
+
         foe_team = foe_side.team
-        foe_names = tuple(foe.name for foe in foe_side.team)
-        cached = self._cache.get(foe_names)
         filled_in = 0
-
         for i, foe in enumerate(foe_team):
             if foe.is_fainted():
                 continue
@@ -69,17 +315,122 @@ class BattleRoller(object):
                 if filled_in == max_fill:
                     continue
                 filled_in += 1
-                if cached:
-                    foe_team[i] = deepcopy(cached[i])
-                    foe_team[i].side = foe_side
-                else:
-                    foe_team[i] = create_foe_for_rollout(foe_side)
+                foe_team[i] = filled_team[i].clone()
+                foe_team[i].side = foe_side
             else:
-                fill_in_unrevealed_attrs(foe)
+                filled = filled_team[i]
+                item = filled.item # None if it was knocked off, in which case it isn't applied
+                apply_set(foe, tuple(move.name for move in filled.moves) +
+                          (filled.base_ability.name, None if item is None else item.name))
+
+
+class FilledTeamCache(LRUCache):
+    """
+    A bounded map of revealed_foe_key(foe_side) -> the foe's team as filled in by fill_in_foe_team,
+    ready to be cloned into a battlefield. When the cache holds max_entries teams, storing a new
+    one evicts the least recently used, so a team that stops matching (e.g. after a zoroark is
+    revealed) is still there if the foe's team matches it again.
+    """
+    DEFAULT_MAX_ENTRIES = 64
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        super(FilledTeamCache, self).__init__(max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        team = super(FilledTeamCache, self).get(key)
+        if team is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return team
 
-        if not cached:
-            self._cache.clear()
-            self._cache[foe_names] = deepcopy(foe_team)
+    def clear(self):
+        super(FilledTeamCache, self).clear()
+        self.hits = self.misses = 0
+
+    def __repr__(self):
+        return '<FilledTeamCache: %d/%d entries, %d hits, %d misses>' % (
+            len(self), self.max_entries, self.hits, self.misses)
+
+class FirstActionRolloutPolicy(BaseRolloutPolicy):
+    """
+    Makes action (an AI.actions.Action) as its first decision, and leaves the rest to policy
+    """
+    def __init__(self, side, action, policy):
+        super(FirstActionRolloutPolicy, self).__init__(side)
+        self.action = action
+        self.policy = policy
+        self.mega = False
+
+    def make_move_decision(self, moves, switches, battlefield, rng):
+        action, self.action = self.action, None
+        if action is None:
+            return self.policy.make_move_decision(moves, switches, battlefield, rng)
+        if action.action_type == Decision.MOVE:
+            move = movedex[action.move_name]
+            assert move in moves, (move, moves)
+            self.mega = True # like MoveAction.make_events, mega evolve if possible
+            return move, True
+        return _switch_choice(action, switches), False
+
+    def make_switch_decision(self, choices, battlefield, rng):
+        action, self.action = self.action, None
+        if action is None or action.action_type != Decision.SWITCH:
+            return self.policy.make_switch_decision(choices, battlefield, rng)
+        return _switch_choice(action, choices)
+
+    def make_mega_evo_decision(self, battlefield, rng):
+        if self.mega:
+            self.mega = False
+            return True
+        return self.policy.make_mega_evo_decision(battlefield, rng)
+
+def _switch_choice(action, choices):
+    return next(pokemon for pokemon in choices if pokemon.name == action.incoming_name)
+
+def win_rate_interval(num_wins, num_rollouts, z):
+    """ Return the Wilson score interval (low, high) of the win rate, with z standard deviations """
+    if num_rollouts == 0:
+        return 0.0, 1.0
+    n = float(num_rollouts)
+    p = num_wins / n
+    center = p + z*z / (2*n)
+    margin = z * sqrt(p * (1 - p) / n + z*z / (4*n*n))
+    scale = 1 + z*z / n
+    return (center - margin) / scale, (center + margin) / scale
+
+def _rollout_batch(battlefields, kwargs, start, num_rollouts, rng=None, stats=None):
+    """
+    Run num_rollouts rollouts (the i'th of them of battlefields[(start + i) % len(battlefields)])
+    with rollout_one_battle(stats=stats, **kwargs), each drawing from a fork of rng (or its own new
+    BattleRNG, if rng is None). Return the Counter of wins and the number of turns simulated.
+    """
+    wins = Counter()
+    total_turns = 0
+    for i in range(start, start + num_rollouts):
+        value, turns = BattleRoller.rollout_one_battle(battlefields[i % len(battlefields)],
+                                                       rng=rng.fork() if rng is not None else None,
+                                                       stats=stats, **kwargs)
+        wins[0] += value
+        wins[1] += 1 - value
+        total_turns += turns
+    return wins, total_turns
+
+def _rollout_chunk(battlefields, kwargs, start, seed, num_rollouts, collect_stats):
+    """
+    A WorkerPool job: run _rollout_batch, drawing from BattleRNG(seed). Return its results and, if
+    collect_stats, this chunk's RolloutStats (or else None).
+    """
+    stats = None
+    if collect_stats:
+        stats = RolloutStats()
+        stats.start()
+    wins, turns = _rollout_batch(battlefields, kwargs, start, num_rollouts, BattleRNG(seed), stats)
+    if stats is not None:
+        stats.stop()
+    return wins, turns, stats
 
 def sanitize_battle_state(battlefield):
     for side in battlefield.sides:
@@ -87,12 +438,36 @@ def sanitize_battle_state(battlefield):
             side.active_pokemon = None
         for pokemon in side.team:
             if pokemon.is_fainted():
-                if pokemon._effect_index:
-                    pokemon._effect_index.clear()
-                    pokemon.effect_handlers = {key: list() for key in pokemon.effect_handlers}
+                pokemon.discard_effects()
                 pokemon.boosts = Boosts()
                 pokemon.is_active = False
 
+def revealed_foe_key(foe_side):
+    """
+    Return a hashable digest of everything revealed about foe_side's team: for each slot in order,
+    its species, level, known move/ability/item names, and whether it has fainted
+    """
+    key = []
+    for foe in foe_side.team:
+        if foe.name == UNREVEALED:
+            key.append(UNREVEALED)
+        else:
+            attrs, _ = foe.known_attrs()
+            key.append((foe.name, foe.level, tuple(sorted(attrs)), foe.is_fainted()))
+    return tuple(key)
+
+def fill_in_foe_team(foe_side):
+    """ Fill in foe_side's team in place (see BattleRoller.fill_in_unrevealed); return the team """
+    foe_team = foe_side.team
+    for i, foe in enumerate(foe_team):
+        if foe.is_fainted():
+            continue
+        if foe.name == UNREVEALED:
+            foe_team[i] = create_foe_for_rollout(foe_side)
+        else:
+            fill_in_unrevealed_attrs(foe)
+    return foe_team
+
 def fill_in_unrevealed_attrs(foe):
     attrs, all_known = foe.known_attrs()
     if all_known:
@@ -170,15 +545,6 @@ COMPLEMENT = {
     Type.FAIRY: (Type.DRAGON, Type.DARK, Type.FIGHTING, Type.POISON),
 }
 
-EXCLUDED = frozenset(pokemon for pokemon in pokedex if
-                     (pokemon.endswith('mega') or
-                      pokemon.endswith('megax') or
-                      pokemon.endswith('megay') or
-                      pokemon.endswith('primal') or
-                      pokemon == 'ditto' or
-                      pokemon == 'zoroark') and not
-                     pokemon.lower() == 'yanmega')
-
 # Create type index excluding megas, primals, ditto, and zoroark.
 # megas/primals are included in the base formes via the megastone/orb,
 # and ditto/zoroark are excluded for simplicity.
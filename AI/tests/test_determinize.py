@@ -0,0 +1,89 @@
+from collections import Counter
+from unittest import TestCase
+
+from AI.determinize import DeterminizationSampler
+from bot.foeside import FoeBattleSide, FoePokemon, UnrevealedPokemon, UNREVEALED
+from battle.abilities import abilitydex
+from battle.battlefield import BattleField, BattleSide
+from battle.battlepokemon import BattlePokemon
+from battle.items import itemdex
+from battle.moves import movedex
+from battle.rng import BattleRNG
+from showdowndata import pokedex
+from showdowndata.miner import RandbatsStatistics
+
+
+def entry(level, sets):
+    number = sum(sets.values())
+    return {'number': number, 'level': Counter({level: number}), 'sets': Counter(sets)}
+
+STATS = RandbatsStatistics()
+STATS.counter.update({
+    'garchomp': entry(75, {('dragonclaw', 'earthquake', 'firefang', 'swordsdance',
+                            'roughskin', 'lifeorb'): 3,
+                           ('dragontail', 'earthquake', 'stealthrock', 'stoneedge',
+                            'roughskin', 'rockyhelmet'): 1}),
+    'gengar': entry(79, {('focusblast', 'shadowball', 'sludgewave', 'substitute',
+                          'levitate', 'lifeorb'): 1}),
+    'scizor': entry(77, {('bugbite', 'bulletpunch', 'roost', 'superpower',
+                          'technician', 'leftovers'): 1}),
+})
+
+
+class TestDeterminizationSampler(TestCase):
+    def setUp(self):
+        self.sampler = DeterminizationSampler(STATS)
+        self.garchomp = FoePokemon(pokedex['garchomp'], 75, moves=[movedex['earthquake']],
+                                   ability=abilitydex['_unrevealed_'],
+                                   item=itemdex['_unrevealed_'])
+        my_team = [BattlePokemon(pokedex['scizor'], 77, [movedex['bulletpunch']])]
+        foe_team = [self.garchomp, UnrevealedPokemon(), UnrevealedPokemon()]
+        self.battlefield = BattleField(BattleSide(my_team, 0), FoeBattleSide(foe_team, 1))
+
+    def test_determinize_fills_in_foe_team(self):
+        clone = self.sampler.determinize(self.battlefield.clone(), 1, BattleRNG(1))
+        team = clone.sides[1].team
+
+        self.assertEqual({foe.name for foe in team}, {'garchomp', 'gengar', 'scizor'})
+        for foe in team:
+            self.assertEqual(len(foe.moves), 4)
+            self.assertNotEqual(foe.item, itemdex['_unrevealed_'])
+            self.assertNotEqual(foe.ability, abilitydex['_unrevealed_'])
+            self.assertIs(foe.side, clone.sides[1])
+        self.assertEqual(team[1].level, 79 if team[1].name == 'gengar' else 77)
+
+        self.assertEqual(self.battlefield.sides[1].num_unrevealed, 2)
+        self.assertEqual(len(self.garchomp.moves), 1)
+
+    def test_revealed_attrs_restrict_set(self):
+        self.garchomp.moves[movedex['stealthrock']] = movedex['stealthrock'].max_pp
+        for seed in range(10):
+            clone = self.sampler.determinize(self.battlefield.clone(), 1, BattleRNG(seed))
+            garchomp = clone.sides[1].team[0]
+            self.assertEqual(garchomp.item, itemdex['rockyhelmet'])
+            self.assertIn(movedex['stoneedge'], garchomp.moves)
+
+    def test_sets_are_drawn_by_count(self):
+        rng = BattleRNG(1)
+        items = Counter(self.sampler.determinize(self.battlefield.clone(), 1, rng)
+                        .sides[1].team[0].item.name for _ in range(400))
+        self.assertTrue(0.65 < items['lifeorb'] / 400.0 < 0.85, items)
+
+    def test_inconsistent_foe_draws_from_all_sets(self):
+        self.garchomp.moves[movedex['roost']] = movedex['roost'].max_pp
+        clone = self.sampler.determinize(self.battlefield.clone(), 1, BattleRNG(1))
+        self.assertIn(clone.sides[1].team[0].item, (itemdex['lifeorb'], itemdex['rockyhelmet']))
+
+    def test_sample(self):
+        samples = self.sampler.sample(self.battlefield, 1, 5, BattleRNG(1))
+        self.assertEqual(len(samples), 5)
+        self.assertEqual(len({id(sample) for sample in samples}), 5)
+        for sample in samples:
+            self.assertNotIn(UNREVEALED, [foe.name for foe in sample.sides[1].team])
+        self.assertEqual(self.battlefield.sides[1].num_unrevealed, 2)
+
+    def test_tables_are_cached(self):
+        self.assertIs(self.sampler.set_table('garchomp', ('earthquake',)),
+                      self.sampler.set_table('garchomp', ('earthquake',)))
+        self.assertIsNone(self.sampler.set_table('garchomp', ('roost',)))
+        self.assertIs(self.sampler.species_table(), self.sampler.species_table())
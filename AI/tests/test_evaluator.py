@@ -0,0 +1,48 @@
+from AI.evaluator import MaterialEvaluator
+from battle.enums import Status
+from bot.foeside import UnrevealedPokemon
+from tests.multi_move_test_case import MultiMoveTestCaseWithoutSetup
+
+
+class TestMaterialEvaluator(MultiMoveTestCaseWithoutSetup):
+    def setUp(self):
+        self.new_battle(tearDown=False)
+        self.add_pokemon('flareon', 0)
+        self.add_pokemon('jolteon', 1)
+        self.evaluator = MaterialEvaluator()
+
+    def test_even(self):
+        self.assertAlmostEqual(self.evaluator.evaluate(self.battlefield), 0.5)
+
+    def test_hp(self):
+        self.leafeon.hp //= 2
+        score = self.evaluator.evaluate(self.battlefield)
+        self.assertGreater(score, 0.5)
+        self.vaporeon.hp //= 2
+        self.flareon.hp //= 2
+        self.assertLess(self.evaluator.evaluate(self.battlefield), 0.5)
+
+    def test_fainted(self):
+        self.leafeon.hp //= 2
+        damaged = self.evaluator.evaluate(self.battlefield)
+        self.leafeon.hp = 0
+        self.leafeon.status = Status.FNT
+        self.assertGreater(self.evaluator.evaluate(self.battlefield), damaged)
+
+    def test_status(self):
+        self.leafeon.status = Status.PSN
+        poisoned = self.evaluator.evaluate(self.battlefield)
+        self.assertGreater(poisoned, 0.5)
+        self.leafeon.status = Status.FRZ
+        self.assertGreater(self.evaluator.evaluate(self.battlefield), poisoned)
+
+    def test_bounds(self):
+        for pokemon in self.battlefield.sides[1].team:
+            pokemon.hp = 0
+            pokemon.status = Status.FNT
+        self.assertAlmostEqual(self.evaluator.evaluate(self.battlefield), 1.0)
+        self.assertAlmostEqual(self.evaluator.material(self.battlefield.sides[1]), 0.0)
+
+    def test_unrevealed_counts_as_healthy(self):
+        self.battlefield.sides[1].team[1] = UnrevealedPokemon()
+        self.assertAlmostEqual(self.evaluator.evaluate(self.battlefield), 0.5)
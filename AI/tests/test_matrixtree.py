@@ -1,12 +1,20 @@
-from AI.matrixtree import (BreakpointBattle, new_node, BreakNewTurn, MatrixNodeNewTurn,
+import time
+
+from unittest import TestCase
+
+from AI.matrixtree import (BreakpointBattle, new_node, BreakNewTurn, BreakMustSwitch, MatrixNodeNewTurn,
                            MatrixNodeMustSwitch, MatrixNodePostFaintSwitch,
-                           MatrixNodeDoublePostFaintSwitch)
+                           MatrixNodeDoublePostFaintSwitch, MatrixNodeChanceAccuracy,
+                           MatrixNodeChanceSecondary, SearchTimeout, DAMAGE_TABLE, cell_value,
+                           dominated_row_bound, dominated_col_bound)
 from AI.actions import SwitchAction
+from AI.transposition import TranspositionTable
 from bot.battleclient import BattleClient
 from bot.foeside import FoeBattleSide, UnrevealedPokemon
 from battle import effects
 from battle.battlefield import BattleField
-from battle.enums import Decision, Hazard
+from battle.enums import Decision, Hazard, Status
+from battle.moves import movedex
 from tests.common import TestCaseCommon
 
 
@@ -222,6 +230,277 @@ class TestFromRootNode(TestMatrixTree):
         self.assertPpUsed(self.get_active(cell.node, 0), 'protect', 0)
         self.assertPpUsed(self.get_active(cell2.node, 0), 'protect', 1)
 
+    def test_search_rolls_back_root_battle(self):
+        self.root.search(1)
+
+        pangoro = self.get_active(self.root, 0)
+        self.assertEqual(pangoro.name, 'pangoro')
+        self.assertPpUsed(pangoro, 'knockoff', 0)
+        self.assertDamageTaken(pangoro, 0)
+        self.assertFalse(self.get_side(self.root, 0).has_effect(Hazard.STEALTHROCK))
+        self.assertEqual(self.get_field(self.root).turns, 1)
+
+        for row in self.root.matrix:
+            for cell in row:
+                self.assertTrue(cell.node is not None or cell.win is not None)
+                if cell.node is not None:
+                    self.assertIsNone(cell.node.battle)
+
+    def test_search_with_transposition_table(self):
+        table = TranspositionTable()
+        self.root.search(1, table)
+        self.assertIn(self.root.transposition_key(), table)
+
+        untabled = new_node(self.breakpoint.state)(self.battle, depth=0,
+                                                   breakpoint=self.breakpoint)
+        untabled.search(1)
+        self.assertAlmostEqual(self.root.value, untabled.value)
+
+        hits, entries = table.hits, len(table)
+        root = new_node(self.breakpoint.state)(self.battle, depth=0, breakpoint=self.breakpoint)
+        root.search(1, table)
+        self.assertEqual(table.hits, hits + 1)
+        self.assertEqual(len(table), entries)
+        self.assertAlmostEqual(root.value, untabled.value)
+        self.assertTrue(all(cell.node is None and cell.win is None
+                            for row in root.matrix for cell in row))
+
+    def test_search_solves_root(self):
+        self.root.search(1)
+
+        self.assertTrue(0 <= self.root.value <= 1)
+        row_strategy = self.root.strategy(0)
+        col_strategy = self.root.strategy(1)
+        self.assertEqual(len(row_strategy), 9)
+        self.assertEqual(len(col_strategy), 5)
+        self.assertAlmostEqual(sum(p for _, p in row_strategy), 1)
+        self.assertAlmostEqual(sum(p for _, p in col_strategy), 1)
+        self.assertEqual([action for action, _ in row_strategy],
+                         [row[0].row_action for row in self.root.matrix])
+
+        # the row player can't do better than the value against the column player's strategy
+        for row in self.root.matrix:
+            value = sum(p * cell_value(cell) for (_, p), cell in zip(col_strategy, row))
+            self.assertLessEqual(value, self.root.value + 1e-9)
+
+    def test_search_deadline(self):
+        table = TranspositionTable()
+        with self.assertRaises(SearchTimeout):
+            self.root.search(2, table, deadline=time.time() + 0.05)
+
+        self.assertIsNone(self.root.value)
+        self.assertGreater(len(table), 0) # the nodes searched before the deadline were stored
+        pangoro = self.get_active(self.root, 0)
+        self.assertEqual(pangoro.name, 'pangoro')
+        self.assertDamageTaken(pangoro, 0)
+        self.assertEqual(self.get_field(self.root).turns, 1)
+
+        self.root.search(1, table, deadline=time.time() + 60)
+        self.assertIsNotNone(self.root.value)
+
+    def test_order_matrix(self):
+        self.root.search(1)
+        root = new_node(self.breakpoint.state)(self.battle, depth=0, breakpoint=self.breakpoint)
+        root.order_matrix(self.root)
+
+        row_probabilities = dict((self.get_action_id(action), p)
+                                 for action, p in self.root.strategy(0))
+        ordered = [row_probabilities[self.get_action_id(row[0].row_action)] for row in root.matrix]
+        self.assertEqual(ordered, sorted(ordered, reverse=True))
+        self.assertEqual(len(ordered), 9)
+
+        col_probabilities = dict((self.get_action_id(action), p)
+                                 for action, p in self.root.strategy(1))
+        cols = [self.get_action_id(cell.col_action) for cell in root.matrix[0]]
+        ordered = [col_probabilities[col] for col in cols]
+        self.assertEqual(ordered, sorted(ordered, reverse=True))
+        for row in root.matrix:
+            self.assertEqual([self.get_action_id(cell.col_action) for cell in row], cols)
+
+    def count_searched_cells(self, node):
+        count = 0
+        for row in node.matrix:
+            for cell in row:
+                if cell.node is not None:
+                    count += 1 + self.count_searched_cells(cell.node)
+                elif cell.win is not None:
+                    count += 1
+        return count
+
+    def test_pruned_search(self):
+        full = new_node(self.breakpoint.state)(self.battle, depth=0, breakpoint=self.breakpoint)
+        full.search(2)
+        pruned = new_node(self.breakpoint.state)(self.battle, depth=0, breakpoint=self.breakpoint)
+        value = pruned.search(2, prune=True)
+
+        self.assertEqual(value, full.value)
+        self.assertEqual(pruned.value, full.value)
+        self.assertLess(self.count_searched_cells(pruned), self.count_searched_cells(full))
+        self.assertAlmostEqual(sum(pruned.row_strategy), 1)
+        self.assertAlmostEqual(sum(pruned.col_strategy), 1)
+
+    def test_cells_are_made_lazily(self):
+        self.assertEqual(self.root.shape(), (9, 5))
+        self.assertEqual(self.root.cells, {})
+        cell = self.root.cell(2, 3)
+        self.assertIs(self.root.cell(2, 3), cell)
+        self.assertEqual((cell.row_action, cell.col_action),
+                         (self.root.row_actions[2], self.root.col_actions[3]))
+        self.assertEqual(len(self.root.cells), 1)
+        self.assertIs(self.root.matrix[2][3], cell)
+        self.assertEqual(len(self.root.cells), 45)
+
+    def count_cells(self, node):
+        """ Count the cells made in node's subtree (without making the rest) """
+        cells = node.cells.values() if node.simultaneous else node.matrix[0]
+        return len(cells) + sum(self.count_cells(cell.node) for cell in cells
+                                if cell.node is not None)
+
+    def test_pruned_search_makes_fewer_cells(self):
+        full = new_node(self.breakpoint.state)(self.battle, depth=0, breakpoint=self.breakpoint)
+        full.search(2)
+        pruned = new_node(self.breakpoint.state)(self.battle, depth=0, breakpoint=self.breakpoint)
+        pruned.search(2, prune=True)
+        self.assertLess(self.count_cells(pruned), self.count_cells(full))
+
+    def test_action_order(self):
+        battlefield = self.battle.battlefield
+        for player, actions in enumerate((self.root.row_actions, self.root.col_actions)):
+            active = battlefield.sides[player].active_pokemon
+            foe = battlefield.sides[not player].active_pokemon
+            damage = DAMAGE_TABLE.expected_damage(active, foe, battlefield)
+            moves = [movedex[action.move_name] for action in actions
+                     if action.action_type == Decision.MOVE]
+            self.assertEqual(len(moves), 4)
+            expected = [damage.get(move, 0) for move in moves]
+            self.assertEqual(expected, sorted(expected, reverse=True))
+            self.assertGreater(expected[0], 0)
+            self.assertTrue(all(action.action_type == Decision.SWITCH for action in actions[4:]))
+
+    def test_order_matrix_keeps_cells(self):
+        self.root.search(1)
+        cells = dict(self.root.cells)
+        self.root.order_matrix(self.root)
+        self.assertEqual(self.root.cells, cells)
+        for a, row_action in enumerate(self.root.row_actions):
+            for b, col_action in enumerate(self.root.col_actions):
+                self.assertIs(self.root.cell(a, b), cells[row_action, col_action])
+
+    def test_pruned_search_window(self):
+        self.root.search(1)
+        value = self.root.value
+        root = new_node(self.breakpoint.state)(self.battle, depth=0, breakpoint=self.breakpoint)
+        self.assertEqual(root.search(1, prune=True, alpha=value + 0.01, beta=1.0), value + 0.01)
+        root = new_node(self.breakpoint.state)(self.battle, depth=0, breakpoint=self.breakpoint)
+        self.assertEqual(root.search(1, prune=True, alpha=0.0, beta=value - 0.01), value - 0.01)
+        self.assertIsNone(root.row_strategy)
+        root = new_node(self.breakpoint.state)(self.battle, depth=0, breakpoint=self.breakpoint)
+        self.assertAlmostEqual(root.search(1, prune=True, alpha=value - 0.01, beta=value + 0.01),
+                               value)
+
+    def test_transposition_key(self):
+        cell = self.find_and_expand_cell(self.root, 'knockoff', 'earthquake')
+        key = cell.node.transposition_key()
+        self.assertNotEqual(key, self.root.transposition_key())
+
+        self.root.expand_cell(cell)
+        self.assertEqual(cell.node.transposition_key(), key)
+
+
+class TestChanceNode(TestMatrixTree):
+    def setUp(self):
+        super(TestChanceNode, self).setUp()
+        self.battle.model_chance = True
+
+    def run_chance_cell(self, p0, p1):
+        """ Run a root cell on the root's battle, as a search would """
+        cell = self.find_cell(self.root, p0, p1)
+        self.root.mark = self.battle.mark()
+        self.root.run_cell(self.battle, cell)
+        return cell.node
+
+    def test_expand_cell_with_accuracy_check(self):
+        cell = self.find_and_expand_cell(self.root, 'gunkshot', 'earthquake')
+        node = cell.node
+        self.assertIsInstance(node, MatrixNodeChanceAccuracy)
+        self.assertEqual(node.depth, 0)
+        self.assertAlmostEqual(node.probabilities[0], 0.8)
+
+        node.evaluate(-1)
+        hit, miss = node.matrix[0]
+        self.assertIsInstance(hit.node, MatrixNodeChanceSecondary) # gunkshot's 30% poison
+        self.assertAlmostEqual(hit.node.probabilities[0], 0.3)
+        self.assertIsInstance(miss.node, MatrixNodeNewTurn)
+        self.assertDamageTaken(self.get_active(miss.node, 1), 0)
+
+        hit.node.evaluate(-1)
+        poisoned, not_poisoned = hit.node.matrix[0]
+        self.assertStatus(self.get_active(poisoned.node, 1), Status.PSN)
+        self.assertStatus(self.get_active(not_poisoned.node, 1), None)
+
+    def test_chance_node_value(self):
+        node = self.find_and_expand_cell(self.root, 'gunkshot', 'earthquake').node
+        node.evaluate(-1)
+        hit, miss = node.matrix[0]
+        self.assertAlmostEqual(node.value, 0.8 * cell_value(hit) + 0.2 * cell_value(miss))
+
+    def test_search_with_chance_nodes(self):
+        self.root.search(1)
+        self.assertDamageTaken(self.get_active(self.root, 1), 0)
+        node = self.find_cell(self.root, 'gunkshot', 'earthquake').node
+        self.assertIsInstance(node, MatrixNodeChanceAccuracy)
+        hit, miss = node.matrix[0]
+        self.assertAlmostEqual(node.value, 0.8 * hit.node.value + 0.2 * miss.node.value)
+
+        pruned = new_node(self.breakpoint.state)(self.battle, depth=0, breakpoint=self.breakpoint)
+        self.assertEqual(pruned.search(1, prune=True), self.root.value)
+
+    def test_pruned_chance_node_window(self):
+        value = self.run_chance_cell('gunkshot', 'earthquake').search(1)
+        self.battle.rollback(self.root.mark)
+        node = self.run_chance_cell('gunkshot', 'earthquake')
+        self.assertEqual(node.search(1, prune=True, alpha=value + 0.01), value + 0.01)
+        self.battle.rollback(self.root.mark)
+        node = self.run_chance_cell('gunkshot', 'earthquake')
+        self.assertEqual(node.search(1, prune=True, beta=value - 0.01), value - 0.01)
+        self.battle.rollback(self.root.mark)
+        node = self.run_chance_cell('gunkshot', 'earthquake')
+        self.assertAlmostEqual(node.search(1, prune=True, alpha=value - 0.01, beta=value + 0.01),
+                               value)
+
+    def test_identical_outcomes_are_merged(self):
+        marowak = self.get_active(self.root, 1)
+        self.battle.set_status(marowak, Status.PAR, None) # so gunkshot can't poison it
+        node = self.run_chance_cell('gunkshot', 'earthquake')
+        node.search(2)
+        hit = node.matrix[0][0]
+        self.assertIsInstance(hit.node, MatrixNodeChanceSecondary)
+        poisoned, not_poisoned = hit.node.matrix[0]
+        self.assertEqual(poisoned.node.value, not_poisoned.node.value)
+        # the more likely outcome was searched, and the other took its value
+        self.assertTrue(all(cell.node is not None or cell.win is not None
+                            for row in not_poisoned.node.matrix for cell in row))
+        self.assertTrue(all(cell.node is None and cell.win is None
+                            for row in poisoned.node.matrix for cell in row))
+
+
+class TestDominanceBounds(TestCase):
+    def test_row_bound(self):
+        lower = [[0.6, 0.7, 0.0], [0.0, 0.0, 0.0], [0.2, 0.9, 0.0]]
+        upper = [[0.6, 0.7, 1.0], [0.5, 1.0, 0.6], [0.2, 0.9, 1.0]]
+        # row 1 is dominated by row 0 if its cell in column 1 is at most 0.7 (row 2 is too
+        # low in column 0), and its cell in column 2 doesn't matter yet
+        self.assertEqual(dominated_row_bound(lower, upper, [0, 1, 2], [0, 1], 1, 1), 0.7)
+        self.assertIsNone(dominated_row_bound(lower, upper, [0, 1, 2], [0, 1, 2], 1, 1))
+        self.assertIsNone(dominated_row_bound(lower, upper, [1, 2], [0, 1], 1, 1))
+
+    def test_col_bound(self):
+        lower = [[0.3, 0.5], [0.4, 0.8]]
+        upper = [[0.3, 0.5], [1.0, 1.0]]
+        # column 1 is dominated by column 0 if its cell in row 1 is at least 1.0
+        self.assertEqual(dominated_col_bound(lower, upper, [0, 1], [0, 1], 1, 1), 1.0)
+        self.assertIsNone(dominated_col_bound(lower, upper, [0, 1], [0, 1], 1, 0))
+
 
 class TestMustSwitchNode(TestMatrixTree):
     def setUp(self):
@@ -255,6 +534,21 @@ class TestMustSwitchNode(TestMatrixTree):
         self.assertActive(zoroark)
         self.assertDamageTaken(zoroark)
 
+    def test_must_switch_node_value(self):
+        self.msnode.evaluate(-1)
+        values = [cell.node.value for cell in self.msnode.matrix[0]]
+        self.assertEqual(self.msnode.value, max(values))
+        self.assertEqual(sum(self.msnode.row_strategy), 1)
+        self.assertIsNone(self.msnode.strategy(1))
+        action, p = max(self.msnode.strategy(0), key=lambda pair: pair[1])
+        self.assertEqual(self.find_cell(self.msnode, p0=action.incoming_name).node.value,
+                         max(values))
+
+    def test_pruned_must_switch_node(self):
+        self.msnode.evaluate(-1)
+        node = MatrixNodeMustSwitch(self.msnode.battle, self.msnode.depth, BreakMustSwitch(0))
+        self.assertEqual(node.search(1, prune=True), self.msnode.value)
+
     def test_run_moves_after_switch_node(self):
         self.msnode.evaluate(-1)
         node2 = self.find_cell(self.msnode, p0='dewgong').node
@@ -308,6 +602,12 @@ class TestPostFaintSwitchNode(TestMatrixTree):
         self.assertEqual(self.get_side(cell4.node, 0).remaining_pokemon, 4)
         self.assertEqual(self.get_field(cell4.node).turns, 3)
 
+    def test_post_faint_switch_node_value(self):
+        self.pfsnode.evaluate(-1)
+        self.assertEqual(self.pfsnode.value,
+                         min(cell.node.value for cell in self.pfsnode.matrix[0]))
+        self.assertEqual(sum(self.pfsnode.col_strategy), 1)
+
     def test_run_moves_after_post_faint_switch(self):
         self.pfsnode.evaluate(-1)
         node2 = self.find_cell(self.pfsnode, p1='marowak').node
@@ -0,0 +1,155 @@
+import time
+from copy import deepcopy
+from unittest import TestCase
+
+from AI.actions import MoveAction, SwitchAction
+from AI.enums import Selection
+from AI.matrixtree import BreakNewTurn, BreakpointBattle
+from AI.mctsagent import (MCTSAgent, MCTSNode, NodeArena, DUCTSelector, Exp3Selector,
+                          RegretMatchingSelector, SELECTORS, observed_action)
+from AI.tests.test_matrixtree import TestMatrixTree
+from battle.enums import Decision
+from battle.rng import BattleRNG
+
+
+class TestSelectors(TestCase):
+    def play(self, selector_class, payoff, iterations=5000):
+        """ Let two selectors play the matrix game payoff against each other """
+        rng = BattleRNG(1)
+        row = selector_class(len(payoff))
+        col = selector_class(len(payoff[0]))
+        for _ in range(iterations):
+            (i, p), (j, q) = row.choose(rng), col.choose(rng)
+            row.update(i, payoff[i][j], p)
+            col.update(j, 1 - payoff[i][j], q)
+        return row.strategy(), col.strategy()
+
+    def test_dominant_actions(self):
+        payoff = ((0.9, 0.6),
+                  (0.4, 0.1))
+        for selector_class in SELECTORS.values():
+            row, col = self.play(selector_class, payoff)
+            self.assertGreater(row[0], 0.8, selector_class)
+            self.assertGreater(col[1], 0.8, selector_class)
+
+    def test_mixed_equilibrium(self):
+        payoff = ((1, 0),
+                  (0, 1))
+        for selector_class in (Exp3Selector, RegretMatchingSelector):
+            for strategy in self.play(selector_class, payoff):
+                self.assertAlmostEqual(strategy[0], 0.5, delta=0.1)
+
+    def test_duct_tries_every_action(self):
+        selector = DUCTSelector(3)
+        rng = BattleRNG(1)
+        chosen = set()
+        for _ in range(3):
+            i, p = selector.choose(rng)
+            selector.update(i, 0.0, p)
+            chosen.add(i)
+        self.assertEqual(chosen, {0, 1, 2})
+
+    def test_duct_virtual_loss(self):
+        selector = DUCTSelector(2)
+        selector.visits, selector.totals = [10, 10], [6.0, 5.0]
+        self.assertEqual(selector.choose(BattleRNG(1))[0], 0)
+        for _ in range(3):
+            selector.add_virtual_loss(0)
+        self.assertEqual(selector.choose(BattleRNG(1))[0], 1)
+        for _ in range(3):
+            selector.remove_virtual_loss(0)
+            selector.update(0, 1.0, 1.0)
+        self.assertEqual(selector.visits, [13, 10])
+        self.assertEqual(selector.totals, [9.0, 5.0])
+
+
+class TestMCTSAgent(TestMatrixTree):
+    revealed_foes = 6
+
+    def setUp(self):
+        super(TestMCTSAgent, self).setUp()
+        self.agent = MCTSAgent(iterations=20)
+        self.agent.set_my_player(0)
+        # the foe's team is fully known (and not made of FoePokemon): there's nothing to fill in
+        self.agent.fill_in_unrevealed = lambda battlefield, max_fill: None
+        self.moves = [MoveAction(move.name, i + 1)
+                      for i, move in enumerate(self.my_side.active_pokemon.moves)]
+        self.switches = [SwitchAction(pokemon.name, i + 2)
+                         for i, pokemon in enumerate(self.my_side.team[1:])]
+
+    def new_root(self, selection=Selection.DUCT):
+        return MCTSNode.from_battle(self.battle, BreakNewTurn, SELECTORS[selection])
+
+    def test_root_node(self):
+        root = self.new_root()
+        self.assertEqual(len(root.row_actions), 9)
+        self.assertEqual(len(root.col_actions), 9)
+        self.assertEqual(root.decision.cells, {})
+        self.assertIsNone(root.decision.battle)
+
+    def test_search(self):
+        for selection in Selection.values:
+            self.agent.selection = selection
+            root = self.new_root(selection)
+            self.agent.arena.reroot(root)
+            self.assertEqual(self.agent.search(root, self.battle), 20)
+            self.assertEqual(root.visits, 20)
+            self.assertEqual(len(self.agent.arena), len(list(root.subtree())))
+            strategy = root.strategy(0)
+            self.assertEqual(len(strategy), 9)
+            self.assertAlmostEqual(sum(p for _, p in strategy), 1)
+            self.assertEqual(len(root.strategy(1)), 9)
+
+    def test_search_until_deadline(self):
+        root = self.new_root()
+        start = time.time()
+        iterations = self.agent.search(root, self.battle, deadline=start + 0.5)
+        self.assertLess(time.time() - start, 1.5)
+        self.assertGreater(iterations, 1)
+        self.assertEqual(root.visits, iterations)
+        # the root battle is untouched
+        self.assertDamageTaken(self.get_active(self.root, 0), 0)
+
+    def test_arena_is_bounded(self):
+        self.agent.arena = NodeArena(5)
+        root = self.new_root()
+        self.agent.arena.reroot(root)
+        self.agent.search(root, self.battle, iterations=50)
+        self.assertEqual(len(self.agent.arena), 5)
+        self.assertEqual(root.visits, 50)
+
+    def test_select_action(self):
+        action, mega = self.agent.select_action(self.battlefield, self.moves, self.switches, False)
+        self.assertIn(action, self.moves + self.switches)
+        self.assertFalse(mega)
+        root, _, mine = self.agent.previous
+        self.assertEqual(root.visits, 20)
+        self.assertEqual(root.row_actions[mine].action_type, action.action_type)
+
+    def test_reuse_subtree_after_observed_actions(self):
+        self.agent.select_action(self.battlefield, self.moves, self.switches, False)
+        previous_root, previous_field, mine = self.agent.previous
+
+        # the foe used earthquake; nothing else changed
+        field = deepcopy(previous_field)
+        foe = field.sides[1].active_pokemon
+        earthquake = next(move for move in foe.moves if move.name == 'earthquake')
+        foe.pp[earthquake] -= 1
+        j = observed_action(previous_field, field, 1, previous_root.col_actions)
+        self.assertEqual(previous_root.col_actions[j].move_name, 'earthquake')
+
+        battle = BreakpointBattle.from_battlefield(field, (), ())
+        fresh = MCTSNode.from_battle(battle, BreakNewTurn, SELECTORS[self.agent.selection])
+        previous_root.children[mine, j] = {'state': fresh}
+        self.assertIs(self.agent.reuse_root(field, self.new_root()), fresh)
+        self.assertIsNone(self.agent.previous)
+
+    def test_observed_switch(self):
+        field = deepcopy(self.battlefield)
+        side = field.sides[1]
+        side.active_pokemon, side.team[1].is_active = side.team[1], True
+        actions = self.new_root().col_actions
+        j = observed_action(self.battlefield, field, 1, actions)
+        self.assertEqual(actions[j].action_type, Decision.SWITCH)
+        self.assertEqual(actions[j].incoming_name, side.team[1].name)
+        self.assertIsNone(observed_action(self.battlefield, self.battlefield, 1, actions))
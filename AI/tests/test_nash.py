@@ -0,0 +1,82 @@
+import random
+from unittest import TestCase
+
+from AI.nash import NashSolver, solve_game, eliminate_dominated
+
+
+class TestSolveGame(TestCase):
+    def assertSolution(self, solution, value, row_strategy, col_strategy):
+        self.assertAlmostEqual(solution[0], value)
+        for p, expected in zip(solution[1], row_strategy):
+            self.assertAlmostEqual(p, expected)
+        for q, expected in zip(solution[2], col_strategy):
+            self.assertAlmostEqual(q, expected)
+
+    def assertEquilibrium(self, payoff, solution):
+        """ Neither player can do better than the value by deviating to a pure strategy """
+        value, row_strategy, col_strategy = solution
+        self.assertAlmostEqual(sum(row_strategy), 1)
+        self.assertAlmostEqual(sum(col_strategy), 1)
+        self.assertTrue(all(p >= 0 for p in row_strategy + col_strategy))
+        for j in range(len(payoff[0])):
+            self.assertGreaterEqual(sum(p * row[j] for p, row in zip(row_strategy, payoff)),
+                                    value - 1e-9)
+        for row in payoff:
+            self.assertLessEqual(sum(q * x for q, x in zip(col_strategy, row)), value + 1e-9)
+
+    def test_single_action(self):
+        self.assertSolution(solve_game(((0.3,),)), 0.3, (1,), (1,))
+        self.assertSolution(solve_game(((0.3, 0.1, 0.7),)), 0.1, (1,), (0, 1, 0))
+        self.assertSolution(solve_game(((0.3,), (0.1,), (0.7,))), 0.7, (0, 0, 1), (1,))
+
+    def test_saddle_point(self):
+        payoff = ((0.5, 0.7, 0.6),
+                  (0.4, 0.9, 0.3),
+                  (0.45, 0.2, 0.8))
+        self.assertSolution(solve_game(payoff), 0.5, (1, 0, 0), (1, 0, 0))
+
+    def test_matching_pennies(self):
+        self.assertSolution(solve_game(((1, 0), (0, 1))), 0.5, (0.5, 0.5), (0.5, 0.5))
+
+    def test_2x2(self):
+        payoff = ((0.8, 0.2), (0.4, 0.6))
+        self.assertSolution(solve_game(payoff), 0.5, (0.25, 0.75), (0.5, 0.5))
+
+    def test_rock_paper_scissors(self):
+        payoff = ((0.5, 0, 1),
+                  (1, 0.5, 0),
+                  (0, 1, 0.5))
+        third = 1 / 3.0
+        self.assertSolution(solve_game(payoff), 0.5, (third,) * 3, (third,) * 3)
+
+    def test_dominated_actions(self):
+        # the last row and column are dominated; what's left is matching pennies
+        payoff = ((1, 0, 1),
+                  (0, 1, 1),
+                  (0, 0, 0.5))
+        self.assertEqual(eliminate_dominated(payoff, range(3), range(3)), ([0, 1], [0, 1]))
+        self.assertSolution(solve_game(payoff), 0.5, (0.5, 0.5, 0), (0.5, 0.5, 0))
+
+    def test_random_games(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            rows, cols = rng.randint(1, 9), rng.randint(1, 9)
+            payoff = tuple(tuple(rng.choice((0, 0.25, 0.5, 1, rng.random())) for _ in range(cols))
+                           for _ in range(rows))
+            self.assertEquilibrium(payoff, solve_game(payoff))
+
+
+class TestNashSolver(TestCase):
+    def test_cache(self):
+        solver = NashSolver()
+        payoff = ((1, 0), (0, 1))
+        solution = solver.solve(payoff)
+        self.assertIs(solver.solve(((1, 0), (0, 1))), solution)
+        self.assertEqual((solver.hits, solver.misses, len(solver)), (1, 1, 1))
+
+    def test_cache_is_cleared_when_full(self):
+        solver = NashSolver()
+        solver.max_size = 2
+        for value in (0.1, 0.2, 0.3):
+            solver.solve(((value,),))
+        self.assertEqual(len(solver), 1)
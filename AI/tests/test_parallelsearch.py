@@ -0,0 +1,116 @@
+import pickle
+from unittest import TestCase
+
+from AI.actions import MoveAction, SwitchAction
+from AI.enums import Parallelism, Selection
+from AI.matrixtree import BreakMustSwitch, BreakPostFaintSwitch, BreakpointBattle, action_key
+from AI.mctsagent import MCTSAgent, MCTSNode, SELECTORS
+from AI.minimaxagent import MinimaxAgent
+from AI.parallelsearch import merge_statistics, search_pool
+from AI.tests.test_matrixtree import TestMatrixTree
+from AI.workerpool import WorkerPool
+
+
+class TestMergeStatistics(TestCase):
+    def test_actions_are_matched_by_key(self):
+        tree1 = [(MoveAction('earthquake', 1), 3.0), (SwitchAction('garchomp', 2), 1.0)]
+        tree2 = [(SwitchAction('garchomp', 2), 2.0), (MoveAction('earthquake', 1), 2.0)]
+        strategy = merge_statistics([tree1, None, tree2])
+        self.assertEqual([(action.action_type, p) for action, p in strategy],
+                         [('MOVE', 5 / 8.0), ('SWITCH', 3 / 8.0)])
+        self.assertIs(strategy[0][0], tree1[0][0])
+
+    def test_strategy_from(self):
+        tree1 = [(MoveAction('earthquake', 1), 3), (MoveAction('outrage', 2), 4)]
+        tree2 = [(MoveAction('earthquake', 1), 5), (MoveAction('outrage', 2), 1)]
+        strategy = merge_statistics([tree1, tree2], SELECTORS[Selection.DUCT].strategy_from)
+        self.assertEqual([(action.move_name, p) for action, p in strategy],
+                         [('earthquake', 1.0), ('outrage', 0.0)])
+
+    def test_no_statistics(self):
+        self.assertIsNone(merge_statistics([None, None]))
+        self.assertIsNone(merge_statistics([]))
+
+    def test_breakpoints_can_be_sent_to_workers(self):
+        for breakpoint in (BreakMustSwitch(1), BreakPostFaintSwitch(0)):
+            copy = pickle.loads(pickle.dumps(breakpoint))
+            self.assertIs(type(copy), type(breakpoint))
+            self.assertEqual(copy.side_index, breakpoint.side_index)
+
+
+class TestParallelSearch(TestMatrixTree):
+    revealed_foes = 6
+
+    def setUp(self):
+        super(TestParallelSearch, self).setUp()
+        self.pool = WorkerPool(2)
+        self.mcts = MCTSAgent(pool=self.pool, iterations=20)
+        self.mcts.set_my_player(0)
+        # the foe's team is fully known (and not made of FoePokemon): there's nothing to fill in
+        self.mcts.fill_in_unrevealed = lambda battlefield, max_fill: None
+
+    def tearDown(self):
+        self.pool.close()
+
+    def assertStrategy(self, strategy, num_actions):
+        self.assertEqual(len(strategy), num_actions)
+        self.assertAlmostEqual(sum(p for _, p in strategy), 1)
+
+    def test_search_pool(self):
+        self.assertIsNone(search_pool(self.mcts))
+        self.mcts.parallelism = Parallelism.ROOT
+        self.assertIs(search_pool(self.mcts), self.pool)
+
+    def test_mcts_root_parallel(self):
+        for selection in Selection.values:
+            self.mcts.selection = selection
+            strategy, iterations = self.mcts.search_root_parallel(
+                [self.battlefield], self.breakpoint, self.pool)
+            self.assertEqual(iterations, 20)
+            self.assertStrategy(strategy, 9)
+
+    def test_mcts_root_parallel_with_more_trees_than_workers(self):
+        battlefields = [self.battlefield, self.battlefield.clone()]
+        self.mcts.root_trees = 3
+        strategy, iterations = self.mcts.search_root_parallel(battlefields, self.breakpoint,
+                                                              self.pool)
+        self.assertEqual(iterations, 21) # 7 per tree
+        self.assertStrategy(strategy, 9)
+
+    def test_mcts_leaf_parallel(self):
+        for selection in Selection.values:
+            self.mcts.selection = selection
+            root = MCTSNode.from_battle(self.battle, self.breakpoint, SELECTORS[selection])
+            self.mcts.arena.reroot(root)
+            self.assertEqual(self.mcts.search_leaf_parallel(root, self.battle, self.pool), 20)
+            self.assertEqual(root.visits, 20)
+            if selection == Selection.DUCT: # the virtual losses weren't counted twice
+                self.assertEqual(sum(root.selectors[0].visits), 20)
+                self.assertEqual(sum(root.selectors[1].visits), 20)
+            self.assertStrategy(root.strategy(0), 9)
+            # the root battle is untouched
+            self.assertDamageTaken(self.get_active(self.root, 0), 0)
+
+    def test_mcts_leaf_parallel_select_action(self):
+        self.mcts.parallelism = Parallelism.LEAF
+        moves = [MoveAction(move.name, i + 1)
+                 for i, move in enumerate(self.my_side.active_pokemon.moves)]
+        action, _ = self.mcts.select_action(self.battlefield, moves, [], False)
+        self.assertIn(action, moves)
+        root, _, _ = self.mcts.previous
+        self.assertEqual(root.visits, 20)
+
+    def test_minimax_root_parallel(self):
+        agent = MinimaxAgent()
+        agent.set_my_player(0)
+        strategy, value = agent.search_root_parallel([self.battlefield, self.battlefield],
+                                                     self.breakpoint, self.pool)
+        self.assertStrategy(strategy, 9)
+
+        battle = BreakpointBattle.from_battlefield(self.battlefield.clone(), (), ())
+        battle.model_chance = agent.model_chance
+        root_node = agent.search_root(battle, self.breakpoint)
+        self.assertAlmostEqual(value, root_node.value)
+        expected = {action_key(action): p for action, p in root_node.strategy(0)}
+        for action, p in strategy:
+            self.assertAlmostEqual(p, expected[action_key(action)])
@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from AI.transposition import TranspositionTable
+
+
+class TestTranspositionTable(TestCase):
+    def setUp(self):
+        self.table = TranspositionTable(max_entries=3)
+
+    def test_lookup_missing_state(self):
+        self.assertIsNone(self.table.lookup('a', 0))
+        self.assertEqual(self.table.misses, 1)
+        self.assertEqual(self.table.hits, 0)
+
+    def test_store_and_lookup(self):
+        self.table.store('a', 0.5, 2)
+        entry = self.table.lookup('a', 2)
+        self.assertEqual(entry.value, 0.5)
+        self.assertEqual(entry.depth, 2)
+        self.assertEqual(self.table.hits, 1)
+        self.assertEqual(self.table.misses, 0)
+        self.assertIn('a', self.table)
+
+    def test_shallower_entry_is_a_miss(self):
+        self.table.store('a', 0.5, 1)
+        self.assertIsNotNone(self.table.lookup('a', 0))
+        self.assertIsNotNone(self.table.lookup('a', 1))
+        self.assertIsNone(self.table.lookup('a', 2))
+        self.assertEqual(self.table.hits, 2)
+        self.assertEqual(self.table.misses, 1)
+        self.assertAlmostEqual(self.table.hit_rate, 2. / 3)
+
+    def test_deeper_search_is_kept(self):
+        self.table.store('a', 0.5, 2)
+        self.table.store('a', 0.1, 1)
+        self.assertEqual(self.table.lookup('a', 0).value, 0.5)
+
+        self.table.store('a', 0.9, 2)
+        self.assertEqual(self.table.lookup('a', 0).value, 0.9)
+        self.table.store('a', 0.7, 3)
+        self.assertEqual(self.table.lookup('a', 3).value, 0.7)
+        self.assertEqual(len(self.table), 1)
+
+    def test_least_recently_used_is_evicted(self):
+        for key in 'abc':
+            self.table.store(key, 0, 0)
+        self.table.lookup('a', 0)
+        self.table.store('d', 0, 0)
+
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(self.table.evictions, 1)
+        self.assertNotIn('b', self.table)
+        for key in 'acd':
+            self.assertIn(key, self.table)
+
+    def test_clear(self):
+        self.table.store('a', 0, 0)
+        self.table.lookup('a', 0)
+        self.table.clear()
+        self.assertEqual(len(self.table), 0)
+        self.assertEqual(self.table.hits, 0)
+        self.assertNotIn('a', self.table)
@@ -0,0 +1,66 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from AI.workerpool import WorkerPool, WorkerCrashed, JobFailed
+
+
+def add(snapshot, x):
+    return snapshot + x
+
+def pid(_):
+    return os.getpid()
+
+def fail(_):
+    raise ValueError('boom')
+
+def crash_once(marker_path, x):
+    if not os.path.exists(marker_path):
+        open(marker_path, 'w').close()
+        os._exit(1)
+    return x
+
+def crash(_):
+    os._exit(1)
+
+
+class TestWorkerPool(TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(2)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_map(self):
+        self.assertEqual(self.pool.map(add, [(i,) for i in range(10)], 100), range(100, 110))
+        self.assertEqual(self.pool.map(add, [], 100), [])
+
+    def test_workers_are_reused(self):
+        pids = set(self.pool.map(pid, [()] * 10))
+        self.assertLessEqual(len(pids), 2)
+        self.assertNotIn(os.getpid(), pids)
+        self.assertEqual(set(self.pool.map(pid, [()] * 10)) | pids, pids)
+
+    def test_new_snapshot(self):
+        self.assertEqual(self.pool.map(add, [(1,)] * 4, 10), [11] * 4)
+        self.assertEqual(self.pool.map(add, [(1,)] * 4, 20), [21] * 4)
+
+    def test_job_failed(self):
+        with self.assertRaises(JobFailed) as context:
+            self.pool.map(fail, [()])
+        self.assertIn('boom', str(context.exception))
+        self.assertEqual(self.pool.map(add, [(1,)], 1), [2])
+
+    def test_crashed_worker_is_restarted(self):
+        marker_path = os.path.join(tempfile.gettempdir(), 'test_workerpool.%d' % os.getpid())
+        try:
+            self.assertEqual(self.pool.map(crash_once, [(i,) for i in range(4)], marker_path),
+                             range(4))
+        finally:
+            os.remove(marker_path)
+        self.assertEqual(self.pool.restarts, 1)
+
+    def test_worker_keeps_crashing(self):
+        with self.assertRaises(WorkerCrashed):
+            self.pool.map(crash, [()])
+        self.assertEqual(self.pool.map(add, [(1,)], 1), [2])
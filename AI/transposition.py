@@ -0,0 +1,62 @@
+"""
+A transposition table for the matrix game tree (see AI.matrixtree).
+
+Different paths through the tree often reach the same state: e.g. both sides switching to the same
+pair of pokemon, Protect against a status move, or moves whose order doesn't matter. The table
+remembers the value of each state searched (keyed by BaseMatrixNode.transposition_key, which uses
+the battlefield's zobrist hash), so that the subtree below a repeated state is only searched once.
+"""
+from collections import namedtuple
+
+from misc.lru import LRUCache
+
+TableEntry = namedtuple('TableEntry', ['value', 'depth'])
+
+
+class TranspositionTable(LRUCache):
+    """
+    A bounded map of state key -> TableEntry(value, depth), where depth is the number of turns that
+    were searched below the state to obtain its value.
+
+    Replacement policy: storing a state that is already in the table keeps the deeper search of the
+    two. When the table holds max_entries states, storing a new one evicts the least recently used.
+    An entry takes roughly 300 bytes, so the default cap is about 30MB.
+    """
+    DEFAULT_MAX_ENTRIES = 100000
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        super(TranspositionTable, self).__init__(max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key, depth):
+        """
+        Return the entry for the state key if it was searched at least `depth` turns deep, or None.
+        """
+        entry = self.get(key)
+        if entry is None or entry.depth < depth:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    def store(self, key, value, depth):
+        """ Store the value of the state key, which was found by searching `depth` turns deep """
+        entry = self.get(key)
+        if entry is None or entry.depth <= depth:
+            self.put(key, TableEntry(value, depth))
+
+    def clear(self):
+        super(TranspositionTable, self).clear()
+        self.hits = self.misses = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def __repr__(self):
+        return ('<TranspositionTable: %d/%d entries, %d hits, %d misses (%.1f%%), %d evictions>' %
+                (len(self), self.max_entries, self.hits, self.misses, 100 * self.hit_rate,
+                 self.evictions))
@@ -0,0 +1,188 @@
+"""
+A long-lived pool of worker processes for rollout and search jobs.
+
+Starting a worker per decision is expensive: a fresh interpreter re-imports showdowndata (which
+shells out to node for the pokedex and unpickles rbstats.pkl) and rebuilds the movedex, abilitydex
+and itemdex. A WorkerPool forks its workers once, from a process that has already loaded all of
+these, and keeps them for as long as its owner (e.g. the Bot, across turns and battles) needs them.
+
+Jobs are run with WorkerPool.map(func, args_list, snapshot). func must be a module-level function;
+each worker calls it as func(snapshot, *args). The snapshot (e.g. a battlefield) is pickled once
+with misc.pickling and sent to each worker at most once, however many jobs use it.
+
+A worker that dies mid-job is replaced by a new one, and its job is retried (at most max_retries
+times) before map gives up with WorkerCrashed.
+"""
+import itertools
+import multiprocessing
+import select
+import signal
+import traceback
+from collections import deque
+
+from misc import pickling
+from _logging import log
+
+
+class WorkerCrashed(Exception):
+    pass
+
+class JobFailed(Exception):
+    """ A job raised an exception in its worker. The message is the worker's traceback. """
+    pass
+
+
+class WorkerPool(object):
+    max_retries = 2
+    poll_interval = 1.0 # seconds between checks that the busy workers are still alive
+
+    def __init__(self, processes=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.restarts = 0
+        self._workers = [_Worker() for _ in xrange(self.processes)]
+        self._snapshot_ids = itertools.count()
+        self._snapshot = None # (snapshot, snapshot_id, pickled snapshot) of the latest map
+
+    def __repr__(self):
+        return '<WorkerPool: processes=%d, restarts=%d>' % (self.processes, self.restarts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def map(self, func, args_list, snapshot=None):
+        """
+        Return [func(snapshot, *args) for args in args_list], with the calls run in the workers.
+
+        Consecutive maps with the same snapshot object reuse the copy that each worker already
+        has, so the snapshot must not be changed in between.
+        """
+        assert self._workers is not None, 'The pool is closed'
+        snapshot_id, data = self._pickle_snapshot(snapshot)
+        pending = deque((index, args, 0) for index, args in enumerate(args_list))
+        results = [None] * len(pending)
+        idle = list(self._workers)
+        busy = {} # worker -> (index, args, tries)
+
+        try:
+            while pending or busy:
+                while pending and idle:
+                    worker, job = idle.pop(), pending.popleft()
+                    busy[worker] = job
+                    if not worker.send_job(func, job[1], snapshot_id, data):
+                        idle.append(self._replace(worker, busy, pending))
+
+                ready, _, _ = select.select(list(busy), [], [], self.poll_interval)
+                if not ready: # a worker may have died without closing its end of the pipe
+                    ready = [worker for worker in busy if not worker.process.is_alive()]
+
+                for worker in ready:
+                    try:
+                        ok, value = worker.conn.recv()
+                    except (EOFError, IOError):
+                        idle.append(self._replace(worker, busy, pending))
+                        continue
+                    index, _, _ = busy.pop(worker)
+                    if not ok:
+                        raise JobFailed(value)
+                    results[index] = value
+                    idle.append(worker)
+        finally:
+            # Don't leave a result that is still on its way to be picked up by the next map
+            for worker in busy:
+                self._restart(worker)
+
+        return results
+
+    def close(self):
+        """ Stop the workers. The pool can't be used after this. """
+        if self._workers is not None:
+            for worker in self._workers:
+                worker.stop()
+            self._workers = None
+            self._snapshot = None
+
+    def _pickle_snapshot(self, snapshot):
+        if self._snapshot is None or self._snapshot[0] is not snapshot:
+            self._snapshot = (snapshot, next(self._snapshot_ids), pickling.dumps(snapshot))
+        return self._snapshot[1:]
+
+    def _replace(self, worker, busy, pending):
+        """ Replace a worker that died while running a job, and put its job back in the queue """
+        index, args, tries = busy.pop(worker)
+        log.i('Worker %d died running job %d; restarting it', worker.process.pid, index)
+        new_worker = self._restart(worker)
+        if tries == self.max_retries:
+            raise WorkerCrashed('A worker died running job %d (%r) %d times' %
+                                (index, args, tries + 1))
+        pending.appendleft((index, args, tries + 1))
+        return new_worker
+
+    def _restart(self, worker):
+        worker.kill()
+        new_worker = _Worker()
+        self._workers[self._workers.index(worker)] = new_worker
+        self.restarts += 1
+        return new_worker
+
+
+class _Worker(object):
+    stop_timeout = 1.0 # seconds to wait for a worker to exit before terminating it
+
+    def __init__(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker_main, args=(child_conn,))
+        self.process.daemon = True # don't outlive the owner if it exits without closing the pool
+        self.process.start()
+        child_conn.close() # so that self.conn gets EOFError if the worker dies
+        self.snapshot_id = None
+
+    def fileno(self):
+        return self.conn.fileno()
+
+    def send_job(self, func, args, snapshot_id, data):
+        """ Return False if the worker has died """
+        if snapshot_id == self.snapshot_id:
+            data = None # the worker already has it
+        try:
+            self.conn.send((func, args, data))
+        except (IOError, EOFError):
+            return False
+        self.snapshot_id = snapshot_id
+        return True
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (IOError, EOFError):
+            pass
+        self.process.join(self.stop_timeout)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+def _worker_main(conn):
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # let the owner handle ^C, and then close the pool
+    snapshot = None
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, IOError): # the owner has gone away
+            return
+        if msg is None:
+            return
+
+        func, args, data = msg
+        if data is not None:
+            snapshot = pickling.loads(data)
+        try:
+            result = (True, func(snapshot, *args))
+        except Exception:
+            result = (False, traceback.format_exc())
+        conn.send(result)
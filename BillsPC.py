@@ -21,6 +21,8 @@ INTERACTIVE_HELP = ('Run a "MultiMoveTestCase" interactively. This allows you to
 LOGBOT_HELP = ("Listen in on an active (client-side) Pokemon Showdown websocket, and save the "
                "traffic to a file. Used for development and debugging of the battle client and "
                "bot. Can be used with a local server or the official sim.")
+BENCHMARK_HELP = ('Measure the speed of the battle engine and the AI search. Run as '
+                  '`python -O BillsPC.py benchmark` for representative results.')
 
 
 class BillsParser(argparse.ArgumentParser):
@@ -55,6 +57,12 @@ def get_parser():
                             default='ws://sim.smogon.com:8000/showdown/websocket')
     logbot_cmd.set_defaults(invoke=logbot)
 
+    benchmark_cmd = subparsers.add_parser('benchmark', help=BENCHMARK_HELP)
+    benchmark_cmd.add_argument('names', nargs='*', help='Benchmarks to run (default: all)')
+    benchmark_cmd.add_argument('-d', '--duration', type=float, default=2.0,
+                               help='Seconds to spend on each measurement')
+    benchmark_cmd.set_defaults(invoke=benchmark)
+
     return parser
 
 def rbstats_(_):
@@ -106,6 +114,10 @@ def logbot(args):
     except KeyboardInterrupt:
         print 'done'
 
+def benchmark(args):
+    import benchmark as benchmark_
+    benchmark_.main(args)
+
 if __name__ == '__main__':
     parser = get_parser()
     args = parser.parse_args()
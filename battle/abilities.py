@@ -5,7 +5,6 @@ effects call on_start when the ability is activated (i.e. by switching in) or re
 (i.e. through transform, trace, etc.).
 """
 import inspect
-import random
 
 if __debug__: from _logging import log
 from misc.functions import priority
@@ -183,7 +182,7 @@ class Contrary(AbilityEffect):
 
 class CursedBody(AbilityEffect):
     def on_after_move_damage(self, battle, pokemon, damage, move, foe):
-        if not foe.is_fainted() and random.randrange(10) < 3: # 30% chance
+        if not foe.is_fainted() and battle.rng.randrange(10) < 3: # 30% chance
             if foe.pp.get(move):
                 if __debug__: log.i('CursedBody activated!')
                 foe.set_effect(effects.Disable(move, 5))
@@ -196,7 +195,7 @@ class CuteCharm(AbilityEffect):
             foe.ability.name in ('oblivious', 'aromaveil') or
             not ((foe.gender == 'M' and pokemon.gender == 'F') or
                  (foe.gender == 'F' and pokemon.gender == 'M')) or
-            random.randrange(10) >= 3
+            battle.rng.randrange(10) >= 3
         ):
             return
 
@@ -300,7 +299,7 @@ class EffectSpore(AbilityEffect):
             not foe.is_fainted() and
             not foe.is_immune_to(POWDER)
         ):
-            rand = random.randrange(100)
+            rand = battle.rng.randrange(100)
             if __debug__:
                 if rand < 30: log.i("%s's EffectSpore activated!", pokemon)
             if rand < 11:   # 11% chance
@@ -328,7 +327,7 @@ class FlameBody(AbilityEffect):
     def on_after_move_damage(self, battle, pokemon, damage, move, foe):
         if (move.makes_contact and
             not foe.is_fainted() and
-            random.randrange(10) < 3
+            battle.rng.randrange(10) < 3
         ):
             if __debug__: log.i("%s was burned by %s's FlameBody", foe, pokemon)
             battle.set_status(foe, Status.BRN, pokemon)
@@ -403,7 +402,7 @@ class Harvest(AbilityEffect):
         if (pokemon.item is None and
             pokemon.last_berry_used is not None and
             (battle.battlefield.weather in (Weather.SUNNYDAY, Weather.DESOLATELAND) or
-             random.randrange(2) == 0)
+             battle.rng.randrange(2) == 0)
         ):
             if __debug__: log.i("%s harvested a %s!", pokemon, pokemon.last_berry_used)
             pokemon.set_item(pokemon.last_berry_used)
@@ -926,7 +925,7 @@ class ShadowTag(AbilityEffect):
 class ShedSkin(AbilityEffect):
     @priority(-5.1)
     def on_residual(self, pokemon, foe, battle):
-        if random.randrange(3) == 0:
+        if battle.rng.randrange(3) == 0:
             if __debug__:
                 if pokemon.status is not None: log.i("%s was healed by ShedSkin!", pokemon)
             pokemon.cure_status()
@@ -1033,7 +1032,7 @@ class Static(AbilityEffect):
         if (move.makes_contact and
             foe is not None and
             not foe.is_fainted() and
-            random.randrange(10) < 3
+            battle.rng.randrange(10) < 3
         ):
             if __debug__: log.i("%s's Static activated!", pokemon)
             battle.set_status(foe, Status.PAR, pokemon)
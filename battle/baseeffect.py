@@ -19,7 +19,7 @@ In cases such as the on_before_move handler, the order in which the handlers are
 important. The @priority decorator assigns a number to the handler, and when multiple effects are
 present on the pokemon, they run in order of priority (highest first). For example:
 
-    if user.activate_effect('on_before_move', user, move, self, failfast=True) is FAIL:
+    if user.activate_effect_failfast('on_before_move', user, move, self) is FAIL:
         return
 
 If a higher priority effect causes the move to fail, then the lower priority on_before_move handler
@@ -34,8 +34,11 @@ but only one ability at a time is ever in effect on a pokemon.)
 Effects inheriting from BaseEffect are in the effects, abilities, statuses and weather modules.
 """
 from misc.functions import priority
+from battle.effecthandler import handler_mask
 from battle.enums import ABILITY
 
+_NO_DEFAULT = object()
+
 class BaseEffect(object):
     class __metaclass__(type):
         def __init__(cls, name, bases, dct):
@@ -56,6 +59,7 @@ class BaseEffect(object):
                 search_cls = search_cls.__bases__[0]
                 if search_cls.__name__ == 'BaseEffect':
                     break
+            cls.handler_mask = handler_mask(cls.handler_names)
 
         def __repr__(cls):
             return "(unrevealed)" if cls.__name__ == '_unrevealed_' else cls.__name__
@@ -63,6 +67,33 @@ class BaseEffect(object):
     source = None   # must be overriden
     duration = None # default: effect does not expire
 
+    def clone(self, memo):
+        """
+        Return a shallow copy of this effect. Attributes referring to an object in memo (e.g.
+        Attract's mate) are redirected to that object's copy; all other attributes are scalars or
+        shared immutable objects (moves, items), and are shared.
+        """
+        clone = self.__class__.__new__(self.__class__)
+        attrs = {key: memo.get(id(value), value) for key, value in vars(self).iteritems()}
+        clone.__dict__ = attrs #pylint: disable=attribute-defined-outside-init
+        memo[id(self)] = clone
+        return clone
+
+    def zobrist_state(self):
+        """
+        Return this effect's state (e.g. its remaining duration, a substitute's hp or a choice
+        item's locked move) as a tuple of (attribute, value) pairs, for the battle's zobrist hash.
+        Attributes that still have their class's default value are left out, so that equal states
+        give equal tuples. Moves and pokemon are given by name.
+        """
+        cls = self.__class__
+        state = []
+        for key, value in sorted(self.__dict__.iteritems()):
+            default = getattr(cls, key, _NO_DEFAULT)
+            if default is _NO_DEFAULT or value != default:
+                state.append((key, getattr(value, 'name', value)))
+        return tuple(state)
+
     def on_end(self, pokemon, battle):
         """ Called when an effect ends, regardless of cause """
 
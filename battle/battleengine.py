@@ -1,20 +1,22 @@
 import math
-import random
-from bisect import insort
 from collections import namedtuple
 from itertools import chain
 from functools import partial
 
 from battle.battlefield import BattleField, BattleSide
 from battle.battlepokemon import BattlePokemon
+from battle.effecthandler import hook_bit
+from battle.rng import BattleRNG
 from battle.rolloutpolicy import RandomRolloutPolicy
-from battle.events import MoveEvent, SwitchEvent, InstaSwitchEvent, ResidualEvent, MegaEvoEvent
+from battle.events import (MoveEvent, SwitchEvent, InstaSwitchEvent, ResidualEvent, MegaEvoEvent,
+                           EventQueue)
 from misc.functions import gf_round
 from battle import effects, statuses
 from battle.abilities import abilitydex
 from battle.enums import MoveCategory, Volatile, Status, Cause, FAIL, Type, Decision, ABILITY
 from battle.moves import movedex, Move
 from battle.stats import Boosts
+from battle.trail import Trail
 
 if __debug__: from _logging import log
 
@@ -32,6 +34,18 @@ STATUS_EFFECTS = {
 
 Residual = namedtuple('Residual', ['holder', 'effect', 'call'])
 
+# hooks that are checked for across several effectors at once (see EffectHandlerMixin.handler_mask)
+ON_ACCURACY = hook_bit('on_accuracy')
+ON_FOE_ACCURACY = hook_bit('on_foe_accuracy')
+ON_MODIFY_BASE_POWER = hook_bit('on_modify_base_power')
+ON_MODIFY_DAMAGE = hook_bit('on_modify_damage')
+ON_MODIFY_FOE_DAMAGE = hook_bit('on_modify_foe_damage')
+ON_MODIFY_EFFECTIVENESS = hook_bit('on_modify_effectiveness')
+ON_MODIFY_SPD = hook_bit('on_modify_spd')
+ON_MODIFY_SPE = hook_bit('on_modify_spe')
+ON_SET_STATUS = hook_bit('on_set_status')
+ON_UPDATE = hook_bit('on_update')
+
 class Battle(object):
     """
     Encapsulates the logic required to run each turn of a full battle. All battle state is
@@ -39,32 +53,88 @@ class Battle(object):
     battlefields provided they are in-between turns.
 
     The event_queue and faint_queue are the only members with state besides the battlefield, and
-    they are always empty lists between turns.
+    they are always empty between turns.
+
+    All of the battle's randomness is drawn from self.rng (see battle.rng), so a battle can be
+    reproduced by seeding it.
+
+    A Battle can also run in trail mode (see battle.trail), where it records its changes so that
+    they can be undone with rollback(mark).
+
+    If stats is set to a battle.rolloutstats.RolloutStats, the events run are counted in it.
     """
-    def __init__(self, team0, team1, policy0=None, policy1=None):
+    trail = None
+    stats = None
+    def __init__(self, team0, team1, policy0=None, policy1=None, rng=None):
         """
         team is a list of up to 6 BattlePokemon.
         policy is a RolloutPolicy
+        rng is a BattleRNG (by default, a new one seeded from the global random module)
         """
         assert 0 < len(team0) <= 6
         assert 0 < len(team1) <= 6
         self.battlefield = BattleField(BattleSide(team0, 0), BattleSide(team1, 1))
         self.rollout_policies = (RandomRolloutPolicy(0) if policy0 is None else policy0,
                                  RandomRolloutPolicy(1) if policy1 is None else policy1)
-        self.event_queue = []   # pop from right
+        self.rng = BattleRNG() if rng is None else rng
+        self.event_queue = EventQueue(self.rng)
         self.faint_queue = []   # pop from right
 
     @classmethod
-    def from_battlefield(cls, battlefield, policy0=None, policy1=None):
+    def from_battlefield(cls, battlefield, policy0=None, policy1=None, rng=None):
         """ Alternate constructor from an existing battlefield. """
         battle = cls.__new__(cls)
         battle.battlefield = battlefield
         battle.rollout_policies = (RandomRolloutPolicy(0) if policy0 is None else policy0,
                                    RandomRolloutPolicy(1) if policy1 is None else policy1)
-        battle.event_queue = []
+        battle.rng = BattleRNG() if rng is None else rng
+        battle.event_queue = EventQueue(battle.rng)
         battle.faint_queue = []
         return battle
 
+    def clone(self, rng=None):
+        """
+        Return a copy of this battle, including its intra-turn state (event_queue and
+        faint_queue), so that it can be run forward independently of the original.
+        The copy draws from rng, or by default from a fork of this battle's rng.
+        """
+        trail = self.trail
+        if trail is not None: # the copy is made from (and so will be) untrailed objects
+            trail.release_battlefield(self.battlefield)
+
+        memo = {}
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__ = self.__dict__.copy() #pylint: disable=attribute-defined-outside-init
+        clone.battlefield = self.battlefield.clone(memo)
+        clone.rng = self.rng.fork() if rng is None else rng
+        clone.event_queue = self.event_queue.clone(memo, clone.rng)
+        clone.faint_queue = [memo[id(pokemon)] for pokemon in self.faint_queue]
+
+        if trail is not None:
+            trail.adopt_battlefield(self.battlefield)
+            clone.trail = None
+        return clone
+
+    def mark(self):
+        """
+        Return a mark that the battle can be rolled back to. The first call puts the battle in
+        trail mode, so that it records every change to its state from then on.
+        """
+        if self.trail is None:
+            self.trail = Trail()
+            self.trail.adopt_battlefield(self.battlefield)
+        return self.trail.mark(self)
+
+    def rollback(self, mark):
+        """ Undo all changes to the battle made since `mark` was returned by self.mark() """
+        self.trail.rollback(self, mark)
+
+    def stop_trail(self):
+        """ Leave trail mode. Any marks are invalidated. """
+        if self.trail is not None:
+            self.trail.release_battlefield(self.battlefield)
+            self.trail = None
+
     def get_foe(self, pokemon):
         """ Return the foe opposite to `pokemon`. If the foe is fainted, return None. """
         return self.battlefield.sides[not pokemon.side.index].active_pokemon
@@ -94,7 +164,7 @@ class Battle(object):
         if user.has_effect(Volatile.ENCORE) and move != movedex['struggle']:
             move = user.get_effect(Volatile.ENCORE).override_move_choice()
 
-        if user.activate_effect('on_before_move', user, move, self, failfast=True) is FAIL:
+        if user.activate_effect_failfast('on_before_move', user, move, self) is FAIL:
             user.remove_effect(Volatile.TWOTURNMOVE) # remove bounce etc.'s invulnerability
             return
 
@@ -173,13 +243,13 @@ class Battle(object):
         if move.check_success(user, target, self) is FAIL:
             return FAIL # moves are responsible for logging their own failure
 
-        if self.battlefield.activate_effect('on_try_hit',
-                                            user, move, target, self, failfast=True) is FAIL:
+        if self.battlefield.activate_effect_failfast('on_try_hit',
+                                                     user, move, target, self) is FAIL:
             return FAIL
 
         for effector in (target, target.side):
-            if effector.activate_effect('on_foe_try_hit', user, move, target, self,
-                                        failfast=True) is FAIL:
+            if effector.activate_effect_failfast('on_foe_try_hit',
+                                                 user, move, target, self) is FAIL:
                 return FAIL
 
         if target.is_immune_to_move(user, move):
@@ -191,7 +261,7 @@ class Battle(object):
 
         if move.multihit:
             hits = (move.multihit[-1] if user.ability is abilitydex['skilllink'] else
-                    random.choice(move.multihit))
+                    self.rng.choice(move.multihit))
 
             total_damage = 0
             hit = 0
@@ -279,8 +349,11 @@ class Battle(object):
         An accuracy value of None means to skip the accuracy check, i.e. it always hits.
         """
         accuracy = move.accuracy
-        accuracy = user.accumulate_effect('on_accuracy', user, move, target, self, accuracy)
-        accuracy = target.accumulate_effect('on_foe_accuracy', user, move, target, self, accuracy)
+        if user.handler_mask & ON_ACCURACY:
+            accuracy = user.accumulate_effect('on_accuracy', user, move, target, self, accuracy)
+        if target.handler_mask & ON_FOE_ACCURACY:
+            accuracy = target.accumulate_effect('on_foe_accuracy',
+                                                user, move, target, self, accuracy)
         if accuracy is None:
             return
 
@@ -300,7 +373,7 @@ class Battle(object):
                 accuracy *= boost_factor[-evn_boost]
 
         if __debug__: log.d('Using accuracy of %s', accuracy)
-        if random.randrange(100) >= int(accuracy):
+        if not self.roll_accuracy(accuracy):
             if __debug__: log.i('But it missed!')
             return FAIL
 
@@ -338,10 +411,10 @@ class Battle(object):
             self.faint(user, Cause.SELFDESTRUCT, move)
 
     def apply_secondary_effect(self, pokemon, s_effect, user):
-        if (random.randrange(100) >= s_effect.chance or
-            pokemon is None or
+        if (pokemon is None or
             pokemon.is_fainted() or
-            (pokemon.ability is abilitydex['shielddust'] and not s_effect.affects_user)):
+            (pokemon.ability is abilitydex['shielddust'] and not s_effect.affects_user) or
+            not self.roll_secondary_effect(s_effect.chance)):
             return
 
         if __debug__: log.d('Applying %s to %s', s_effect, pokemon)
@@ -452,48 +525,65 @@ class Battle(object):
         return damage
 
     def modify_base_power(self, user, move, target, base_power):
-        for effector in (user, self.battlefield):
-            base_power = effector.accumulate_effect('on_modify_base_power',
-                                                    user, move, target, self, base_power)
+        battlefield = self.battlefield
+        if (user.handler_mask | battlefield.handler_mask) & ON_MODIFY_BASE_POWER:
+            for effector in (user, battlefield):
+                base_power = effector.accumulate_effect('on_modify_base_power',
+                                                        user, move, target, self, base_power)
         if target.ability is abilitydex['dryskin'] and move.type is Type.FIRE:
             base_power *= 1.25
         return base_power
 
-    @staticmethod # for duck punching
-    def get_critical_hit(crit_ratio):
-        return random.randrange(CRIT_ROLL[min(crit_ratio, 3)]) == 0
+    def get_critical_hit(self, crit_ratio): # may be duck punched with a function of crit_ratio
+        return self.rng.randrange(CRIT_ROLL[min(crit_ratio, 3)]) == 0
+
+    def damage_randomizer(self): # may be duck punched with a function of no arguments
+        return 100 - self.rng.randrange(16)
 
-    @staticmethod # for duck punching
-    def damage_randomizer():
-        return 100 - random.randrange(16)
+    def roll_accuracy(self, accuracy): # may be duck punched; True if the move hits
+        return self.rng.randrange(100) < int(accuracy)
+
+    def roll_secondary_effect(self, chance): # may be duck punched; True if the effect applies
+        return self.rng.randrange(100) < chance
 
     def modify_damage(self, damage, user, move, target, crit, effectiveness):
-        for effector in (user, user.side, self.battlefield):
-            damage = effector.accumulate_effect('on_modify_damage',
-                                                user, move, effectiveness, damage)
-        for effector in (target, target.side):
-            damage = effector.accumulate_effect('on_modify_foe_damage',
-                                                user, move, target, crit, effectiveness, damage)
+        user_side, battlefield = user.side, self.battlefield
+        if (user.handler_mask | user_side.handler_mask | battlefield.handler_mask) & \
+           ON_MODIFY_DAMAGE:
+            for effector in (user, user_side, battlefield):
+                damage = effector.accumulate_effect('on_modify_damage',
+                                                    user, move, effectiveness, damage)
+        target_side = target.side
+        if (target.handler_mask | target_side.handler_mask) & ON_MODIFY_FOE_DAMAGE:
+            for effector in (target, target_side):
+                damage = effector.accumulate_effect('on_modify_foe_damage',
+                                                    user, move, target, crit, effectiveness, damage)
         return damage
 
     def get_effectiveness(self, user, move, target):
         effectiveness = move.get_effectiveness(target)
-        for effector in (user, self.battlefield):
-            effectiveness = effector.accumulate_effect('on_modify_effectiveness',
-                                                       user, move, target, effectiveness)
+        battlefield = self.battlefield
+        if (user.handler_mask | battlefield.handler_mask) & ON_MODIFY_EFFECTIVENESS:
+            for effector in (user, battlefield):
+                effectiveness = effector.accumulate_effect('on_modify_effectiveness',
+                                                           user, move, target, effectiveness)
         return effectiveness
 
     def modify_def(self, def_, target, move):
         return target.accumulate_effect('on_modify_def', target, move, self, def_)
 
     def modify_spd(self, spd, target, move):
-        for effector in (target, self.battlefield):
-            spd = effector.accumulate_effect('on_modify_spd', target, move, self, spd)
+        battlefield = self.battlefield
+        if (target.handler_mask | battlefield.handler_mask) & ON_MODIFY_SPD:
+            for effector in (target, battlefield):
+                spd = effector.accumulate_effect('on_modify_spd', target, move, self, spd)
         return spd
 
     def modify_spe(self, spe, pokemon):
-        for effector in (pokemon, pokemon.side, self.battlefield):
-            spe = effector.accumulate_effect('on_modify_spe', pokemon, self, spe)
+        side, battlefield = pokemon.side, self.battlefield
+        if (pokemon.handler_mask | side.handler_mask | battlefield.handler_mask) & ON_MODIFY_SPE:
+            for effector in (pokemon, side, battlefield):
+                spe = effector.accumulate_effect('on_modify_spe', pokemon, self, spe)
         return spe
 
     def effective_spe(self, pokemon):
@@ -531,8 +621,8 @@ class Battle(object):
         else:
             damage = int(damage)
 
-        damage = pokemon.accumulate_effect('on_damage',
-                                           pokemon, cause, source, self, damage, failfast=True)
+        damage = pokemon.accumulate_effect_failfast('on_damage',
+                                                    pokemon, cause, source, self, damage)
         if damage is FAIL:
             return FAIL
 
@@ -564,8 +654,8 @@ class Battle(object):
         assert isinstance(hp, int)
         assert hp >= 0
 
-        if foe is not None and foe.activate_effect('on_foe_heal',
-                                                   pokemon, hp, cause, self, failfast=True) is FAIL:
+        if foe is not None and foe.activate_effect_failfast('on_foe_heal',
+                                                            pokemon, hp, cause, self) is FAIL:
             return FAIL
 
         if __debug__: prev_hp = pokemon.hp
@@ -620,7 +710,7 @@ class Battle(object):
 
         team_members = pokemon.get_switch_choices(forced=True)
         if team_members:
-            incoming = random.choice(team_members)
+            incoming = self.rng.choice(team_members)
             if __debug__: log.d('Force switching %s for %s', pokemon, incoming)
             self.run_switch(pokemon, incoming)
             forcer.get_effect(ABILITY).on_break_mold(incoming, self)
@@ -654,10 +744,12 @@ class Battle(object):
                                  '%s is immune') % pokemon)
             return FAIL
 
-        for effector in (pokemon, pokemon.side, self.battlefield):
-            if effector.activate_effect('on_set_status',
-                                        status, pokemon, setter, self, failfast=True) is FAIL:
-                return FAIL
+        side, battlefield = pokemon.side, self.battlefield
+        if (pokemon.handler_mask | side.handler_mask | battlefield.handler_mask) & ON_SET_STATUS:
+            for effector in (pokemon, side, battlefield):
+                if effector.activate_effect_failfast('on_set_status',
+                                                     status, pokemon, setter, self) is FAIL:
+                    return FAIL
 
         pokemon.status = status
         pokemon.set_effect(STATUS_EFFECTS[status](pokemon))
@@ -668,7 +760,7 @@ class Battle(object):
         sides = self.battlefield.sides
         actives = sorted([sides[0].active_pokemon, sides[1].active_pokemon],
                          key=lambda p: 0 if p is None else (-self.effective_spe(p),
-                                                            random.random()))
+                                                            self.rng.random()))
 
         residuals = []
 
@@ -694,11 +786,11 @@ class Battle(object):
             if pokemon is not None:
                 residuals.extend(Residual(pokemon, on_residual.__self__.source,
                                           partial(on_residual, pokemon, foe, self))
-                                 for on_residual in pokemon.effect_handlers['on_residual'])
+                                 for on_residual in pokemon.effect_handlers.get('on_residual', ()))
 
         residuals.extend(Residual(self.battlefield, on_residual.__self__.source,
                                   partial(on_residual, actives[0], actives[1], self))
-                         for on_residual in self.battlefield.effect_handlers['on_residual'])
+                         for on_residual in self.battlefield.effect_handlers.get('on_residual', ()))
 
         # For each residual, check first if its effect still exists on the holder, because another
         # residual may have removed it (e.g. shedskin and poison).
@@ -711,10 +803,12 @@ class Battle(object):
                 residual.call()
 
     def run_update(self):
-        actives = (side.active_pokemon for side in self.battlefield.sides if
-                   side.active_pokemon is not None)
+        actives = [side.active_pokemon for side in self.battlefield.sides if
+                   side.active_pokemon is not None and side.active_pokemon.handler_mask & ON_UPDATE]
+        if len(actives) > 1:
+            actives.sort(key=lambda p: (-self.effective_spe(p), self.rng.random()))
 
-        for pokemon in sorted(actives, key=lambda p: (-self.effective_spe(p), random.random())):
+        for pokemon in actives:
             pokemon.activate_effect('on_update', pokemon, self)
 
     def run_switch(self, outgoing, incoming):
@@ -781,8 +875,8 @@ class Battle(object):
         """
         # Assumes that all side-based on_switch_in handlers have higher priority than the
         # pokemon-based ones
-        for on_switch_in in chain(pokemon.side.effect_handlers['on_switch_in'][:],
-                                  pokemon.effect_handlers['on_switch_in'][:]):
+        for on_switch_in in chain(pokemon.side.effect_handlers.get('on_switch_in', ()),
+                                  pokemon.effect_handlers.get('on_switch_in', ())):
             on_switch_in(pokemon, self)
             if pokemon.is_fainted():
                 return
@@ -800,7 +894,7 @@ class Battle(object):
             spe = self.effective_spe(pokemon)
             choice, is_move = policy.make_move_decision(pokemon.get_move_choices(),
                                                         pokemon.get_switch_choices(),
-                                                        self.battlefield)
+                                                        self.battlefield, self.rng)
             if is_move:
                 event = MoveEvent(pokemon, spe, self.modify_priority(pokemon, choice), choice)
             else:
@@ -809,7 +903,7 @@ class Battle(object):
 
             if (pokemon.can_mega_evolve and
                 is_move and
-                policy.make_mega_evo_decision(self.battlefield)
+                policy.make_mega_evo_decision(self.battlefield, self.rng)
             ):
                 decisions.append(MegaEvoEvent(pokemon, spe))
 
@@ -820,7 +914,8 @@ class Battle(object):
 
     def get_switch_decision(self, side, forced=False):
         choices = side.get_switch_choices(forced=forced)
-        return self.rollout_policies[side.index].make_switch_decision(choices, self.battlefield)
+        return self.rollout_policies[side.index].make_switch_decision(choices, self.battlefield,
+                                                                     self.rng)
 
     def init_battle(self):
         if self.battlefield.turns > 0:
@@ -831,7 +926,7 @@ class Battle(object):
         sides = self.battlefield.sides
         if __debug__: log.i('Starting battle: %s %s', sides[0], sides[1])
         leads = sorted([side.active_pokemon for side in sides],
-                       key=lambda p: (-p.calculate_stat('spe'), random.random()))
+                       key=lambda p: (-p.calculate_stat('spe'), self.rng.random()))
         for lead in leads:
             self.switch_in(lead)
         for lead in leads:
@@ -865,15 +960,17 @@ class Battle(object):
                 self.get_foe(decision.pokemon).set_effect(effects.Pursuit(decision.pokemon))
 
         self.event_queue.extend(decisions)
-        self.event_queue.append(ResidualEvent())
-        self.event_queue.sort()
+        self.event_queue.push(ResidualEvent())
 
     def run_queued_events(self):
+        stats = self.stats
         while self.event_queue:
             if __debug__: log.d('Event Queue: %r', self.event_queue)
-            if __debug__: log.d('Next event: %s', self.event_queue[-1])
+            if __debug__: log.d('Next event: %s', self.event_queue.peek())
             event = self.event_queue.pop()
             event.run_event(self, self.event_queue)
+            if stats is not None:
+                stats.events += 1
             if event.type is not Decision.SWITCH:
                 self.run_update()
 
@@ -888,7 +985,7 @@ class Battle(object):
 
     def run_must_switch(self, side):
         if __debug__: log.d('%s must switch: requesting switch decision', side.active_pokemon)
-        insort(self.event_queue, SwitchEvent(
+        self.event_queue.push(SwitchEvent(
             side.active_pokemon,
             0, # spe calculation is unnecessary; this can't run for both sides at once
             self.get_switch_decision(side, forced=True)))
@@ -933,7 +1030,9 @@ class Battle(object):
                 continue
             return
 
-    def resolve_switch_queue(self, switch_queue):
+    def resolve_switch_queue(self, switch_events):
+        """ Run switch_events (and the PostSwitchInEvents they queue), fastest first """
+        switch_queue = EventQueue(self.rng, switch_events)
         while switch_queue:
             event = switch_queue.pop()
             event.run_event(self, switch_queue)
@@ -956,14 +1055,14 @@ class Battle(object):
             self._debug_sanity_check()
 
     def get_instaswitches(self, sides):
-        switch_queue = []
+        switch_events = []
         for i, side in enumerate(sides):
             if side is not None:
                 if __debug__: log.i('No active pokemon on side %d; requesting switch' % i)
-                event = InstaSwitchEvent(None, 0, self.get_switch_decision(side, forced=True))
-                insort(switch_queue, event)
-        assert switch_queue
-        return switch_queue
+                switch_events.append(
+                    InstaSwitchEvent(None, 0, self.get_switch_decision(side, forced=True)))
+        assert switch_events
+        return switch_events
 
     def resolve_faint_queue(self):
         while self.faint_queue:
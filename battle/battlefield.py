@@ -3,9 +3,10 @@ from subprocess import check_output
 
 from battle.effecthandler import EffectHandlerMixin
 from misc.bashcolors import strip_ANSI
-from battle.baseeffect import BaseEffect
 from battle.enums import FAIL, Status, Hazard, Weather
 from battle.weather import WEATHER_EFFECTS
+from battle.zobrist import zobrist_key
+from misc.slots import copy_slots
 
 if __debug__: from _logging import log
 
@@ -17,6 +18,10 @@ class BattleField(object, EffectHandlerMixin):
 
     Note: the Battle does maintain some intra-turn state.
     """
+    __slots__ = ('_weather', 'terrain', '_effect_index', 'sides', 'last_move_used',
+                 '_weather_suppressed', 'win', 'turns', 'effect_handlers', 'handler_mask',
+                 '_zobrist')
+
     def __init__(self, side0=None, side1=None):
         self._weather = None
         self.terrain = None
@@ -29,11 +34,74 @@ class BattleField(object, EffectHandlerMixin):
         self._weather_suppressed = False
         self.win = None            # set to 0 or 1 when one side wins
         self.turns = 0
-        self.effect_handlers = {key: list() for key in BaseEffect.handler_names}
+        EffectHandlerMixin.__init__(self)
+        self._zobrist = None
 
     def get_foe(self, pokemon):
         return self.sides[not pokemon.side.index].active_pokemon
 
+    def clone(self, memo=None):
+        """
+        Return an independent copy of this battlefield; a much faster replacement for deepcopy.
+        Immutable data (pokedex entries, stats, moves, items, abilities) is shared, and effect
+        handlers are rebound to the copied effects.
+
+        If memo is passed, it is filled with id(original) -> copy for every side, pokemon and
+        effect, so that other objects referring to them (e.g. queued events) can be redirected.
+        """
+        if memo is None:
+            memo = {}
+        clone = self.__class__.__new__(self.__class__)
+        copy_slots(self, clone)
+        memo[id(self)] = clone
+        clone.sides = tuple(side.clone_with_memo(memo) for side in self.sides)
+        for side in self.sides:
+            side.clone_team_effects(memo)
+        self.clone_effects(clone, memo)
+        return clone
+
+    @property
+    def zobrist(self):
+        """
+        A 64-bit hash of the state of the battle: pokemon's hp, status, boosts, pp, item, ability,
+        forme, effects, turns out, last move used and turns slept, which pokemon are active, whether
+        each side has mega-evolved, and the effects on each side and the field. Effects are hashed
+        with their state (e.g. durations, a substitute's hp, the toxic counter, a choice-locked or
+        disabled move), so equal hashes stand for states that play out the same way.
+
+        Most of it is kept up to date incrementally as the state changes (see battle.zobrist); the
+        effects' state and the attributes that change every turn are hashed when it is read.
+        """
+        zobrist = self.own_zobrist() ^ self.state_zobrist()
+        for side in self.sides:
+            zobrist ^= side.own_zobrist() ^ side.state_zobrist()
+            for pokemon in side.team:
+                zobrist ^= pokemon.own_zobrist() ^ pokemon.state_zobrist()
+        return zobrist
+
+    def compute_zobrist(self):
+        """ Compute self.zobrist from scratch, without using the incrementally updated parts """
+        zobrist = self.compute_own_zobrist() ^ self.state_zobrist()
+        for side in self.sides:
+            zobrist ^= side.compute_own_zobrist() ^ side.state_zobrist()
+            for pokemon in side.team:
+                zobrist ^= pokemon.compute_own_zobrist() ^ pokemon.state_zobrist()
+        return zobrist
+
+    def reset_zobrist(self):
+        """
+        Recompute self.zobrist from scratch the next time it is used. Call this after changing the
+        state by other means than the engine's (e.g. writing to _effect_index or pp directly).
+        """
+        self.reset_own_zobrist()
+        for side in self.sides:
+            side.reset_own_zobrist()
+            for pokemon in side.team:
+                pokemon.reset_own_zobrist()
+
+    def _zobrist_key(self, *feature):
+        return zobrist_key('field', *feature)
+
     @property
     def effects(self):
         return self._effect_index.values()
@@ -77,6 +145,7 @@ class BattleField(object, EffectHandlerMixin):
 
         self._effect_index[effect.source] = effect
         self._set_handlers(effect)
+        self._toggle_zobrist('effect', effect.source)
 
     def get_effect(self, source):
         return self._effect_index.get(source)
@@ -90,6 +159,7 @@ class BattleField(object, EffectHandlerMixin):
             if __debug__: log.d("Tried to remove nonexistent %s from battlefield", source)
             return
         self._remove_handlers(effect)
+        self._toggle_zobrist('effect', source)
 
         if source in Weather.values:
             self._weather = None
@@ -117,6 +187,9 @@ def split_justify(lline, rline, cols):
 
 
 class BattleSide(object, EffectHandlerMixin):
+    __slots__ = ('_effect_index', 'active_pokemon', 'index', 'team', 'last_fainted_on_turn',
+                 'username', 'has_mega_evolved', 'effect_handlers', 'handler_mask', '_zobrist')
+
     def __init__(self, team, index, username=None):
         """ :param team: 6-element list of BattlePokemon """
         assert index in (0, 1)
@@ -129,11 +202,42 @@ class BattleSide(object, EffectHandlerMixin):
         self.last_fainted_on_turn = None
         self.username = username or '<side-%d>' % index
         self.has_mega_evolved = False
-        self.effect_handlers = {key: list() for key in BaseEffect.handler_names}
+        EffectHandlerMixin.__init__(self)
+        self._zobrist = None
 
         for pokemon in self.team:
             pokemon.side = self # ! circular reference; BattleSide owns BattlePokemon
 
+    def clone(self):
+        """ Return a copy of this side and its team. See BattleField.clone """
+        memo = {}
+        self.clone_with_memo(memo)
+        self.clone_team_effects(memo)
+        return memo[id(self)]
+
+    def _zobrist_key(self, *feature):
+        return zobrist_key(self.index, *feature)
+
+    def state_zobrist(self):
+        zobrist = EffectHandlerMixin.state_zobrist(self)
+        if self.has_mega_evolved:
+            zobrist ^= self._zobrist_key('has_mega_evolved')
+        return zobrist
+
+    def clone_with_memo(self, memo):
+        clone = self.__class__.__new__(self.__class__)
+        copy_slots(self, clone)
+        memo[id(self)] = clone
+        clone.team = [pokemon.clone_with_memo(memo) for pokemon in self.team]
+        if self.active_pokemon is not None:
+            clone.active_pokemon = memo[id(self.active_pokemon)]
+        return clone
+
+    def clone_team_effects(self, memo):
+        self.clone_effects(memo[id(self)], memo)
+        for pokemon in self.team:
+            pokemon.clone_effects(memo[id(pokemon)], memo)
+
     @property
     def effects(self):
         return self._effect_index.values()
@@ -157,6 +261,7 @@ class BattleSide(object, EffectHandlerMixin):
 
         self._effect_index[effect.source] = effect
         self._set_handlers(effect)
+        self._toggle_zobrist('effect', effect.source)
 
     def has_effect(self, source):
         return source in self._effect_index
@@ -172,6 +277,7 @@ class BattleSide(object, EffectHandlerMixin):
             return
 
         self._remove_handlers(effect)
+        self._toggle_zobrist('effect', source)
         if __debug__: log.i('Removed %s from side %d', effect, self.index)
 
     def clear_hazards(self):
@@ -185,7 +291,7 @@ class BattleSide(object, EffectHandlerMixin):
 
     def get_switch_choices(self, pokemon=None, forced=False):
         if not forced and pokemon is not None:
-            for on_trap_check in pokemon.effect_handlers['on_trap_check']:
+            for on_trap_check in pokemon.effect_handlers.get('on_trap_check', ()):
                 if on_trap_check(pokemon):
                     return []
 
@@ -1,21 +1,68 @@
-from battle.effecthandler import EffectHandlerMixin
+from battle.effecthandler import EffectHandlerMixin, handler_mask
 from showdowndata import pokedex
 from battle import effects, abilities
 from battle.abilities import abilitydex
-from battle.baseeffect import BaseEffect
 from battle.enums import (Volatile, FAIL, Status, MoveCategory, Type, Weather, ABILITY, POWDER,
                           SideCondition, ITEM)
 from battle.items import itemdex
 from battle.stats import Boosts, PokemonStats
 from battle.types import effectiveness, HPivs
 from battle.moves import movedex
+from battle.zobrist import zobrist_key, salt
+from misc.slots import copy_slots
 if __debug__: from _logging import log
 
 
+class ZobristAttribute(object):
+    """
+    Keeps a pokemon's part of the zobrist hash (see battle.zobrist) up to date when the attribute is
+    set. This descriptor only defines __set__, so reading the attribute still finds the value in the
+    instance's __dict__, at full speed. (That is why these attributes are not among BattlePokemon's
+    __slots__: a slot can't be intercepted on write without slowing down every read.)
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __set__(self, pokemon, value):
+        #pylint: disable=protected-access
+        # (this descriptor is part of BattlePokemon's own zobrist bookkeeping)
+        name = self.name
+        dct = pokemon.__dict__
+        if pokemon._zobrist is not None:
+            dct['_zobrist'] ^= (pokemon._attr_zobrist(name, dct[name]) ^
+                                pokemon._attr_zobrist(name, value))
+        dct[name] = value
+
+
 class BattlePokemon(object, EffectHandlerMixin):
     """
     Represents a pokemon in a battle.
+
+    Most attributes are __slots__, to keep the many copies of each pokemon made during a search
+    compact. The instance __dict__ holds only the attributes that are part of the zobrist hash
+    (and _zobrist itself), plus anything set from outside the battle engine (e.g. by tests or by the
+    bot).
     """
+    __slots__ = ('__dict__', 'pokedex_entry', 'base_species', 'side', 'level', 'types', 'gender',
+                 'evs', 'ivs', 'stats', 'max_hp', '_weight', 'base_ability', 'boosts', 'is_mega',
+                 'has_moved_this_turn', 'will_move_this_turn', 'damage_done_this_turn',
+                 'was_attacked_this_turn', 'turns_out', 'last_move_used', 'is_switching_out',
+                 'must_switch', 'is_resting', 'turns_slept', 'is_transformed', 'illusion',
+                 'item_used_this_turn', 'last_berry_used', 'base_data', '_suppressed_ability',
+                 '_effect_index', 'effect_handlers', 'handler_mask')
+
+    # attributes that are part of the zobrist hash, besides boosts and effects
+    ZOBRIST_ATTRS = ('name', 'hp', 'status', 'item', 'ability', 'is_active', 'moves')
+    name = ZobristAttribute('name')
+    hp = ZobristAttribute('hp')
+    status = ZobristAttribute('status')
+    item = ZobristAttribute('item')
+    ability = ZobristAttribute('ability')
+    is_active = ZobristAttribute('is_active')
+    moves = ZobristAttribute('moves')
+    # attributes that are hashed by state_zobrist, since they change too often to be worth keeping
+    STATE_ZOBRIST_ATTRS = ('turns_out', 'last_move_used', 'turns_slept')
+
     def __init__(self, pokedex_entry, level=100, moves=(), ability=abilitydex['_none_'],
                  item=None, gender=None, evs=None, ivs=None, side=None):
         """
@@ -58,7 +105,69 @@ class BattlePokemon(object, EffectHandlerMixin):
         self.base_data = {}     # for transform
         self._suppressed_ability = None
         self._effect_index = {}
-        self.effect_handlers = {key: list() for key in BaseEffect.handler_names}
+        EffectHandlerMixin.__init__(self)
+
+    def clone(self):
+        """
+        Return a copy of this pokemon and its effects, for use in place of deepcopy. The copy
+        remains on the same side.
+        """
+        memo = {}
+        clone = self.clone_with_memo(memo)
+        self.clone_effects(clone, memo)
+        return clone
+
+    def clone_with_memo(self, memo):
+        """
+        Copy this pokemon's mutable state, sharing its immutable data (pokedex_entry, stats,
+        moves, item and ability). Effects are copied separately by clone_effects, once every
+        pokemon they might refer to is in memo.
+        """
+        clone = self.__class__.__new__(self.__class__)
+        copy_slots(self, clone)
+        clone.__dict__ = self.__dict__.copy() #pylint: disable=attribute-defined-outside-init
+        clone.side = memo.get(id(self.side), self.side)
+        clone.moves = self.moves.__class__(self.moves)
+        clone.types = list(self.types)
+        clone.boosts = self.boosts.copy()
+        if self.base_data:
+            clone.base_data = base_data = self.base_data.copy()
+            if self.is_transformed:
+                base_data['moves'] = base_data['moves'].__class__(base_data['moves'])
+                base_data['types'] = list(base_data['types'])
+        memo[id(self)] = clone
+        return clone
+
+    def _zobrist_key(self, *feature):
+        return zobrist_key(self.side.index, self.base_species, *feature)
+
+    def _attr_zobrist(self, name, value):
+        if name == 'moves':
+            zobrist = 0
+            for move, pp in value.iteritems():
+                zobrist ^= self._zobrist_key('pp', move, pp)
+            return zobrist
+        return self._zobrist_key(name, value)
+
+    def compute_own_zobrist(self):
+        zobrist = EffectHandlerMixin.compute_own_zobrist(self)
+        for name in self.ZOBRIST_ATTRS:
+            zobrist ^= self._attr_zobrist(name, getattr(self, name))
+        return zobrist ^ self._boosts_zobrist(self.boosts.compute_zobrist())
+
+    def own_zobrist(self):
+        return EffectHandlerMixin.own_zobrist(self) ^ self._boosts_zobrist(self.boosts.zobrist)
+
+    def state_zobrist(self):
+        zobrist = EffectHandlerMixin.state_zobrist(self)
+        for name in self.STATE_ZOBRIST_ATTRS:
+            zobrist ^= self._zobrist_key(name, getattr(self, name))
+        return zobrist
+
+    def _boosts_zobrist(self, boosts_zobrist):
+        if not boosts_zobrist:
+            return 0
+        return salt(boosts_zobrist, self._zobrist_key('boosts') | 1)
 
     @property
     def pp(self):
@@ -113,6 +222,7 @@ class BattlePokemon(object, EffectHandlerMixin):
 
         self._effect_index[effect.source] = effect
         self._set_handlers(effect)
+        self._toggle_zobrist('effect', effect.source)
 
         if __debug__: log.i('Set effect %s on %s', effect, self)
 
@@ -143,6 +253,7 @@ class BattlePokemon(object, EffectHandlerMixin):
             if __debug__: log.d("Trying to remove %s from %s, but it wasn't found!", source, self)
             return False
         self._remove_handlers(effect)
+        self._toggle_zobrist('effect', source)
 
         if __debug__: log.i('Removed %s from %s', effect, self)
         if not force and 'on_end' in effect.handler_names:
@@ -158,9 +269,7 @@ class BattlePokemon(object, EffectHandlerMixin):
 
     def clear_effects(self, battle):
         self.activate_effect('on_end', self, battle)
-
-        self._effect_index.clear()
-        self.effect_handlers = {key: list() for key in self.effect_handlers}
+        self.discard_effects()
 
     def suppress_ability(self, battle):
         if __debug__: log.d("Suppressing %s's ability", self)
@@ -307,7 +416,7 @@ class BattlePokemon(object, EffectHandlerMixin):
 
     def is_immune_to_move(self, user, move):
         """Return True if self is immune to move"""
-        for on_get_immunity in self.effect_handlers['on_get_immunity']:
+        for on_get_immunity in self.effect_handlers.get('on_get_immunity', ()):
             immune = on_get_immunity(move.type) # check type immunity first, then move
             if immune is None:
                 immune = on_get_immunity(move) # for bulletproof, overcoat, etc.
@@ -326,7 +435,7 @@ class BattlePokemon(object, EffectHandlerMixin):
 
     def is_immune_to(self, thing):
         """ `thing` may be a move Type, Status, Weather, POWDER, or Volatile """
-        for on_get_immunity in self.effect_handlers['on_get_immunity']:
+        for on_get_immunity in self.effect_handlers.get('on_get_immunity', ()):
             immune = on_get_immunity(thing)
             if immune is not None:
                 return immune
@@ -510,7 +619,10 @@ class BattlePokemon(object, EffectHandlerMixin):
                            target.ability is abilitydex['pressure'] and
                            not move.targets_user)
                      else 1)
-        self.pp[move] -= deduction
+        pp = self.pp[move]
+        self.pp[move] = pp - deduction
+        self._toggle_zobrist('pp', move, pp)
+        self._toggle_zobrist('pp', move, pp - deduction)
 
     def get_switch_choices(self, forced=False):
         return self.side.get_switch_choices(pokemon=self, forced=forced)
@@ -583,4 +695,6 @@ class BattlePokemon(object, EffectHandlerMixin):
             assert self in self.side.team
             assert not any([handler_list for handler_list in self.effect_handlers.values()])
 
+        assert self.handler_mask == handler_mask(self.effect_handlers), repr(self)
+
         assert self.hp <= self.max_hp
@@ -0,0 +1,93 @@
+"""
+A cache of expected move damage per matchup, for rollout policies that choose moves by damage
+(see battle.rolloutpolicy.GreedyRolloutPolicy) without running a full calculate_damage for every
+decision.
+
+An entry is computed the first time a matchup is seen, with Battle.calculate_damage at average
+damage and no crit, and reused for every later decision in the same matchup: the same attacker
+and defender (species, level, types, ability, item, status) with the same boosts, in the same
+weather. Anything else that modifies damage (e.g. screens, volatiles, or hp-dependent base power)
+is taken as it was when the entry was computed.
+"""
+from battle.battleengine import Battle
+from battle.enums import FAIL, MoveCategory
+from battle.moves import movedex
+
+# moves whose damage depends on what happens during the turn
+REACTIVE_MOVES = frozenset((movedex['counter'], movedex['mirrorcoat'], movedex['metalburst']))
+
+
+class DamageTable(object):
+    max_size = 100000 # entries; the table is cleared when it is full
+
+    def __init__(self):
+        self._table = {}
+        self._calculator = _DamageCalculator.from_battlefield(None)
+        self.hits = self.misses = 0
+
+    def __repr__(self):
+        return '<DamageTable: %d entries, %d hits, %d misses>' % (len(self._table), self.hits,
+                                                                 self.misses)
+
+    def __len__(self):
+        return len(self._table)
+
+    def clear(self):
+        self._table.clear()
+
+    def expected_damage(self, attacker, defender, battlefield):
+        """
+        Return {move: expected damage} for attacker's damaging moves against defender: damage
+        (capped at defender's hp) times the chance to hit. Damage-callback moves (seismictoss,
+        superfang, ...) are computed here rather than cached, since they depend on hp.
+        """
+        entry = self.lookup(attacker, defender, battlefield)
+        hp = defender.hp
+        expected = {move: min(damage, hp) * accuracy for move, damage, accuracy in entry}
+        for move in attacker.moves:
+            if move.has_damage_callback and move not in REACTIVE_MOVES:
+                damage = move.damage_callback(attacker, defender)
+                if damage:
+                    expected[move] = min(damage, hp) * _hit_chance(move)
+        return expected
+
+    def lookup(self, attacker, defender, battlefield):
+        """ Return the cached (move, damage, hit chance) entry for this matchup """
+        key = (attacker.name, attacker.level, tuple(attacker.types), attacker.ability,
+               attacker.item, attacker.status, attacker.boosts.zobrist,
+               defender.name, defender.level, tuple(defender.types), defender.ability,
+               defender.item, defender.status, defender.boosts.zobrist,
+               battlefield.weather)
+        entry = self._table.get(key)
+        if entry is None:
+            self.misses += 1
+            if len(self._table) >= self.max_size:
+                self._table.clear()
+            entry = self._table[key] = self._calculate(attacker, defender, battlefield)
+        else:
+            self.hits += 1
+        return entry
+
+    def _calculate(self, attacker, defender, battlefield):
+        calculator = self._calculator
+        calculator.battlefield = battlefield
+        entry = []
+        for move in attacker.moves:
+            if move.category is MoveCategory.STATUS or move.has_damage_callback:
+                continue
+            damage = calculator.calculate_damage(attacker, move, defender)
+            if damage is not None and damage is not FAIL and damage > 0:
+                entry.append((move, damage, _hit_chance(move)))
+        calculator.battlefield = None
+        return tuple(entry)
+
+
+class _DamageCalculator(Battle):
+    def get_critical_hit(self, crit_ratio): #pylint: disable=unused-argument
+        return False # expected damage leaves crits out
+
+    def damage_randomizer(self):
+        return 93 # average damage
+
+def _hit_chance(move):
+    return 1.0 if move.accuracy is None else move.accuracy / 100.0
@@ -2,59 +2,301 @@ if __debug__: from _logging import log
 
 from battle.enums import FAIL
 
+_hook_bits = {}
+
+def hook_bit(name):
+    """
+    Return the bit that stands for the named hook (e.g. 'on_modify_spe') in handler masks. Bits are
+    assigned on first use.
+    """
+    bit = _hook_bits.get(name)
+    if bit is None:
+        bit = _hook_bits[name] = 1 << len(_hook_bits)
+    return bit
+
+def handler_mask(names):
+    """ Return the handler mask with the bits of the named hooks set """
+    mask = 0
+    for name in names:
+        mask |= hook_bit(name)
+    return mask
+
+class EffectHandlers(dict):
+    """
+    A sparse map of handler name -> list of bound handler methods, in priority order. A name only
+    has a list while some effect has a handler by that name. Looking up an absent name returns a
+    new empty list, which is not stored.
+
+    The lists are never modified in place: adding or removing a handler replaces the list. So a
+    dispatch (see EffectHandlerMixin.activate_effect) can iterate over a list without copying it,
+    and still calls exactly the handlers that were registered when it started, even if one of them
+    removes an effect.
+    """
+    __slots__ = ()
+
+    def __missing__(self, name): #pylint: disable=unused-argument
+        return []
+
+
 class EffectHandlerMixin: #pylint: disable=old-style-class
     """
     Provides common functionality to classes that register effect handlers.  Such classes must
-    initialize an effect_handlers dictionary mapping handler name to list of bound handler methods.
+    call EffectHandlerMixin.__init__, which initializes self.effect_handlers to an EffectHandlers,
+    and self.handler_mask to 0.
+
+    handler_mask has the hook_bit of each hook in effect_handlers set, so that the engine can check
+    whether any of several effectors has a handler for a hook at once, e.g.
+    `(user.handler_mask | user.side.handler_mask) & hook_bit('on_modify_damage')`.
+
+    Such classes also keep their part of the battle's zobrist hash (see battle.zobrist) in
+    self._zobrist, once it has been initialized by own_zobrist, and must define _zobrist_key. The
+    state that changes in place (e.g. effects' durations) is hashed by state_zobrist instead.
     """
+    _zobrist = None
+
+    def __init__(self):
+        self._clear_handlers()
+
+    def _zobrist_key(self, *feature):
+        """ Return the zobrist key of one of this object's features, e.g. ('effect', source) """
+        raise NotImplementedError
+
+    def compute_own_zobrist(self):
+        """ Compute this object's part of the zobrist hash from scratch """
+        zobrist = 0
+        for source in self._effect_index:
+            zobrist ^= self._zobrist_key('effect', source)
+        return zobrist
+
+    def own_zobrist(self):
+        """ Return this object's part of the zobrist hash, and start keeping it up to date """
+        if self._zobrist is None:
+            self._zobrist = self.compute_own_zobrist()
+        return self._zobrist
+
+    def state_zobrist(self):
+        """
+        Compute the part of this object's zobrist hash that is not kept up to date incrementally:
+        the state of its effects (see BaseEffect.zobrist_state), which they change in place.
+        """
+        zobrist = 0
+        for source, effect in self._effect_index.iteritems():
+            state = effect.zobrist_state()
+            if state:
+                zobrist ^= self._zobrist_key('effect_state', source, state)
+        return zobrist
+
+    def reset_own_zobrist(self):
+        """ Recompute this object's part of the zobrist hash the next time it is used """
+        self._zobrist = None
+
+    def _toggle_zobrist(self, *feature):
+        """ Add or remove a feature's key from the zobrist hash, if it is being kept up to date """
+        if self._zobrist is not None:
+            self._zobrist ^= self._zobrist_key(*feature)
+
     def _set_handlers(self, effect):
+        self.handler_mask |= effect.handler_mask
+        effect_handlers = self.effect_handlers
         for name in effect.handler_names:
             method = getattr(effect, name)
+            handlers = effect_handlers.get(name)
+            if handlers is None:
+                effect_handlers[name] = [method]
+                continue
             priority = getattr(method, 'priority', None)
-            handlers = self.effect_handlers[name]
+            handlers = handlers[:] # see EffectHandlers
             if priority is None:
                 handlers.append(method)
             else:
-                for i, existing_effect in enumerate(self.effect_handlers[name][::-1]):
+                for i, existing_effect in enumerate(handlers[::-1]):
                     if priority <= existing_effect.priority:
                         handlers.insert(len(handlers) - i, method)
                         break
                 else:
                     handlers.insert(0, method)
+            effect_handlers[name] = handlers
 
     def _remove_handlers(self, effect):
+        effect_handlers = self.effect_handlers
         for name in effect.handler_names:
-            self.effect_handlers[name].remove(getattr(effect, name))
+            handlers = effect_handlers[name][:] # see EffectHandlers
+            handlers.remove(getattr(effect, name))
+            if handlers:
+                effect_handlers[name] = handlers
+            else:
+                del effect_handlers[name]
+                self.handler_mask &= ~hook_bit(name)
+
+    def discard_effects(self):
+        """
+        Remove all effects and unregister their handlers, without calling on_end (e.g. from a
+        fainted pokemon, or from one that the client saw switch out). The effects are cleared in
+        place, so under a trail (see battle.trail) the caller must copy_on_write them first, as
+        BattlePokemon.clear_effects does.
+        """
+        for source in self._effect_index:
+            self._toggle_zobrist('effect', source)
+        self._effect_index.clear()
+        self._clear_handlers()
+
+    def _clear_handlers(self):
+        """ Unregister all handlers (without calling on_end or removing the effects themselves) """
+        self.effect_handlers = EffectHandlers()
+        self.handler_mask = 0
+
+    def clone_effects(self, clone, memo):
+        """
+        Give clone its own copies of this object's effects, with each handler rebound to the copied
+        effect. Handler order (and thus priority order) is preserved.
+
+        memo maps id(original) -> copy, as in copy.deepcopy, and must already contain any pokemon
+        that the effects refer to (e.g. Attract's mate).
+        """
+        clone._effect_index = {source: effect.clone(memo)
+                               for source, effect in self._effect_index.iteritems()}
+        clone.effect_handlers = effect_handlers = EffectHandlers()
+        for name, handlers in self.effect_handlers.iteritems():
+            effect_handlers[name] = [_rebind(handler, memo) for handler in handlers]
 
-    def activate_effect(self, name, *args, **kwargs):
+    def activate_effect(self, name, *args):
         """
         Call all bound handlers for the named effect type, with *args as the handler method's
         arguments. Handlers are already in sorted priority order, if applicable.
+        """
+        handlers = self.effect_handlers.get(name)
+        if handlers is None:
+            return
+        for effect in handlers:
+            if __debug__: log.d('effect %s of %r activated', name, effect.__self__)
+            effect(*args)
 
-        When failfast is passed as a keyword arg, bail out and return FAIL as soon as any handler
-        returns FAIL.
+    def activate_effect_failfast(self, name, *args):
+        """
+        As activate_effect, but bail out and return FAIL as soon as any handler returns FAIL.
         """
-        failfast = kwargs.get('failfast', False)
-        for effect in self.effect_handlers[name][:]:
+        handlers = self.effect_handlers.get(name)
+        if handlers is None:
+            return
+        for effect in handlers:
             if __debug__: log.d('effect %s of %r activated', name, effect.__self__)
-            rv = effect(*args)
-            if failfast and rv is FAIL:
+            if effect(*args) is FAIL:
                 if __debug__: log.d('Effect %s was failed by %r', name, effect.__self__)
                 return FAIL
 
-    def accumulate_effect(self, name, *args, **kwargs):
+    def accumulate_effect(self, name, *args):
         """
         Call all bound handlers for the named effect type, with *args as the handler method's
         arguments. The argument in the last position, args[-1], is the accumulator variable and will
         be modified and returned.
+        """
+        handlers = self.effect_handlers.get(name)
+        if handlers is None:
+            return args[-1]
+        return _ACCUMULATE_BY_ARITY.get(len(args), _accumulate)(name, handlers, args)
 
-        Failfast works as for self.activate_effect
+    def accumulate_effect_failfast(self, name, *args):
+        """
+        As accumulate_effect, but bail out and return FAIL as soon as any handler returns FAIL.
         """
-        failfast = kwargs.get('failfast', False)
         accumulator = args[-1]
-        for effect in self.effect_handlers[name][:]:
+        handlers = self.effect_handlers.get(name)
+        if handlers is None:
+            return accumulator
+        args = args[:-1]
+        for effect in handlers:
             if __debug__: log.d('effect %s of %r activated', name, effect.__self__)
-            accumulator = effect(*(args[:-1] + (accumulator,)))
-            if failfast and accumulator is FAIL:
+            accumulator = effect(*(args + (accumulator,)))
+            if accumulator is FAIL:
                 return FAIL
         return accumulator
+
+
+# accumulate_effect's loop, specialized for the number of arguments (including the accumulator),
+# so that calling each handler doesn't have to build a new tuple of arguments
+
+def _accumulate(name, handlers, args):
+    accumulator = args[-1]
+    args = args[:-1]
+    for effect in handlers:
+        if __debug__: log.d('effect %s of %r activated', name, effect.__self__)
+        accumulator = effect(*(args + (accumulator,)))
+    return accumulator
+
+def _accumulate2(name, handlers, args):
+    a, accumulator = args
+    for effect in handlers:
+        if __debug__: log.d('effect %s of %r activated', name, effect.__self__)
+        accumulator = effect(a, accumulator)
+    return accumulator
+
+def _accumulate3(name, handlers, args):
+    a, b, accumulator = args
+    for effect in handlers:
+        if __debug__: log.d('effect %s of %r activated', name, effect.__self__)
+        accumulator = effect(a, b, accumulator)
+    return accumulator
+
+def _accumulate4(name, handlers, args):
+    a, b, c, accumulator = args
+    for effect in handlers:
+        if __debug__: log.d('effect %s of %r activated', name, effect.__self__)
+        accumulator = effect(a, b, c, accumulator)
+    return accumulator
+
+def _accumulate5(name, handlers, args):
+    a, b, c, d, accumulator = args
+    for effect in handlers:
+        if __debug__: log.d('effect %s of %r activated', name, effect.__self__)
+        accumulator = effect(a, b, c, d, accumulator)
+    return accumulator
+
+def _accumulate6(name, handlers, args):
+    a, b, c, d, e, accumulator = args
+    for effect in handlers:
+        if __debug__: log.d('effect %s of %r activated', name, effect.__self__)
+        accumulator = effect(a, b, c, d, e, accumulator)
+    return accumulator
+
+_ACCUMULATE_BY_ARITY = {2: _accumulate2, 3: _accumulate3, 4: _accumulate4, 5: _accumulate5,
+                        6: _accumulate6}
+
+
+# Counting handler dispatches (for battle.rolloutstats). The counting versions of the dispatch
+# methods replace the plain ones while counting is on, rather than the plain ones checking a flag,
+# so that dispatch costs nothing extra when it is off.
+
+_DISPATCH_METHODS = {name: EffectHandlerMixin.__dict__[name] for name in
+                     ('activate_effect', 'activate_effect_failfast', 'accumulate_effect',
+                      'accumulate_effect_failfast')}
+
+def count_dispatches(counter):
+    """
+    Until stop_counting_dispatches is called, add the number of handlers that each dispatch through
+    an EffectHandlerMixin calls to counter[name] (a collections.Counter keyed by handler name).
+    """
+    for name, method in _DISPATCH_METHODS.iteritems():
+        setattr(EffectHandlerMixin, name, _counting(method, counter))
+
+def stop_counting_dispatches():
+    for name, method in _DISPATCH_METHODS.iteritems():
+        setattr(EffectHandlerMixin, name, method)
+
+def _counting(dispatch, counter):
+    def counting_dispatch(self, name, *args):
+        handlers = self.effect_handlers.get(name)
+        if handlers is not None:
+            counter[name] += len(handlers)
+        return dispatch(self, name, *args)
+    return counting_dispatch
+
+
+def _rebind(handler, memo):
+    """
+    Return the method of the copied effect corresponding to handler. Handlers that are not bound
+    methods (e.g. a berry's staticmethod on_eat) are returned as-is.
+    """
+    effect = getattr(handler, '__self__', None)
+    if effect is None:
+        return handler
+    return getattr(memo[id(effect)], handler.__name__)
@@ -7,7 +7,6 @@ out. The on_end handler is always called when an effect is removed. Benched poke
 have any effects (even if they are statused, the effect is removed on switch out and reapplied on
 switch in).
 """
-import random
 import math
 from itertools import chain
 
@@ -32,7 +31,7 @@ class Attract(BaseEffect):
             user.remove_effect(Volatile.ATTRACT)
             return
 
-        if random.randrange(2):
+        if battle.rng.randrange(2):
             if __debug__: log.i('%s was immobolized by Attract!', user)
             return FAIL
 
@@ -162,7 +161,7 @@ class Confuse(BaseEffect):
         self.turns_left -= 1
 
         prob = CONFUSE_PROB[turn]
-        roll = random.random()
+        roll = battle.rng.random()
         if roll <= prob[0]:
             return
         elif roll <= prob[0] + prob[1]:
@@ -279,7 +278,7 @@ class PartialTrap(BaseEffect):
     def on_residual(self, pokemon, foe, battle):
         if __debug__: log.i("%s was hurt by PartialTrap", pokemon)
         battle.damage(pokemon, pokemon.max_hp / 8.0, Cause.RESIDUAL, self)
-        if self.duration == 2 and random.randrange(2) == 0:
+        if self.duration == 2 and battle.rng.randrange(2) == 0:
             self.duration = 1   # 4 turns
 
 class Trapped(BaseEffect):
@@ -298,8 +297,8 @@ class StallCounter(BaseEffect):
     duration = 2
     denominator = 3    # denominator of 1/X success probability
 
-    def check_stall_success(self):
-        if random.randrange(self.denominator) > 0:
+    def check_stall_success(self, battle):
+        if battle.rng.randrange(self.denominator) > 0:
             return FAIL
         self.duration = 2       # reset expiry
         self.denominator *= 3   # 3x less likely to succeed consecutively
@@ -407,7 +406,7 @@ class LockedMove(BaseEffect):       # outrage, petaldance, etc.
     def on_residual(self, pokemon, foe, battle):
         if pokemon.status is Status.SLP:
             pokemon.remove_effect(Volatile.LOCKEDMOVE)
-        if self.duration == 2 and random.randrange(2) == 0:
+        if self.duration == 2 and battle.rng.randrange(2) == 0:
             self.duration = 1   # 2 turns
 
     def on_end(self, pokemon, _):
@@ -461,8 +460,7 @@ class Pursuit(BaseEffect):
 
             battle.run_move(self.pursuer, self.pursuit, pokemon)
             # Don't let the pursuer move again afterwards
-            battle.event_queue = [event for event in battle.event_queue
-                                  if not event.pokemon is self.pursuer]
+            battle.event_queue.remove_if(lambda event: event.pokemon is self.pursuer)
 
 class Roost(BaseEffect):
     source = Volatile.ROOST
@@ -471,13 +469,12 @@ class Roost(BaseEffect):
 
     def __init__(self, pokemon):
         if Type.FLYING in pokemon.types:
-            pokemon.types.remove(Type.FLYING)
-            pokemon.types.append(None)
+            pokemon.types = [type_ for type_ in pokemon.types if type_ is not Type.FLYING] + [None]
             self.lost_type = True
 
     def on_end(self, pokemon, _):
         if self.lost_type:
-            pokemon.types[1] = Type.FLYING
+            pokemon.types = [pokemon.types[0], Type.FLYING]
 
 class Safeguard(BaseEffect):
     source = SideCondition.SAFEGUARD
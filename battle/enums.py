@@ -128,6 +128,9 @@ class SingletonEnum(NoCopy):
     def __repr__(self):
         return self.__class__.__name__.join(('<', '>'))
 
+    def __reduce__(self):
+        return self.__class__.__name__ # pickle as a reference to the module-level singleton
+
 FAIL = type('FAIL', (SingletonEnum,), {})()
 ABILITY = type('ABILITY', (SingletonEnum,), {})()
 ITEM = type('ITEM', (SingletonEnum,), {})()
@@ -12,17 +12,100 @@ Generally, a turn proceeds in this order:
   - post-switch-ins
 - Residuals (the "between turns" effects such as poison or speedboost)
 - if any pokemon are fainted, then InstaSwitch+PostSwitch until the side has an active pokemon
+
+Pending events are held in an EventQueue, ordered by each event's integer priority key.
 """
-from random import random
-from bisect import insort
 from functools import total_ordering
+from heapq import heapify, heappop, heappush
 
 from battle.enums import Decision
+from misc.slots import get_slots, set_slots
 
 if __debug__: from _logging import log
 
+TIER_SCALE = 10             # priority can be fractional, e.g. custapberry (+0.1)
+SPE_SCALE = 256             # speeds can be fractional after modifiers, e.g. paralysis (x0.25)
+SPE_RANGE = 1 << 26         # room for speeds (or negated speeds, in trickroom) up to +/-131072
+SPE_OFFSET = SPE_RANGE >> 1
+
+def priority_key(tier, spe):
+    """
+    Encode an event's (tier, spe) as an int that orders the same way, so that heap entries compare
+    as plain ints. The tier (>= 0; e.g. 100 + move priority) takes precedence over spe.
+    """
+    return int(tier * TIER_SCALE + 0.5) * SPE_RANGE + int(spe * SPE_SCALE) + SPE_OFFSET
+
+
+class EventQueue(object):
+    """
+    The events waiting to run this turn, popped highest priority first.
+
+    Backed by a heap of (-priority, tiebreak, event) entries, where tiebreak is drawn from rng (the
+    battle's rng) when the event is pushed, so that events with equal priority (i.e. speed ties)
+    run in a random but reproducible order.
+    """
+    __slots__ = ('rng', '_heap')
+
+    def __init__(self, rng, events=()):
+        self.rng = rng
+        random = rng.random
+        self._heap = [(-event.priority, random(), event) for event in events]
+        heapify(self._heap)
+
+    def push(self, event):
+        heappush(self._heap, (-event.priority, self.rng.random(), event))
+
+    def extend(self, events):
+        heap, random = self._heap, self.rng.random
+        for event in events:
+            heappush(heap, (-event.priority, random(), event))
+
+    def pop(self):
+        """ Remove and return the next event to run """
+        return heappop(self._heap)[2]
+
+    def peek(self):
+        """ Return the next event to run, without removing it """
+        return self._heap[0][2]
+
+    def remove_if(self, predicate):
+        """ Remove every event for which predicate(event) is true """
+        self._heap = [entry for entry in self._heap if not predicate(entry[2])]
+        heapify(self._heap)
+
+    def clear(self):
+        del self._heap[:]
+
+    def snapshot(self):
+        """ Return an opaque copy of the queue's contents, for restore() """
+        return self._heap[:]
+
+    def restore(self, snapshot):
+        self._heap[:] = snapshot
+
+    def clone(self, memo, rng):
+        """ Return a copy of this queue drawing from rng, with its events cloned with memo """
+        clone = EventQueue(rng)
+        clone.restore([(key, tiebreak, event.clone(memo)) for key, tiebreak, event in self._heap])
+        return clone
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __iter__(self):
+        """ Iterate over the events in no particular order """
+        return (entry[2] for entry in self._heap)
+
+    def __repr__(self):
+        return 'EventQueue(%r)' % [entry[2] for entry in sorted(self._heap)]
+
 @total_ordering
 class BaseEvent(object):
+    """
+    Subclasses declare __slots__ for the attributes they set, and should set all of them in
+    __init__; the class attributes here are defaults for events without e.g. a move.
+    """
+    __slots__ = ()
     priority = 0
     pokemon = None
     move = None
@@ -37,12 +120,19 @@ class BaseEvent(object):
     def run_event(self, battle, queue):
         raise NotImplementedError
 
+    def clone(self, memo):
+        """ Return a copy of this event, referring to the copies of any pokemon in memo """
+        clone = self.__class__.__new__(self.__class__)
+        set_slots(clone, [memo.get(id(value), value) for value in get_slots(self)])
+        return clone
+
 class MoveEvent(BaseEvent):
+    __slots__ = ('pokemon', 'priority', 'move')
     type = Decision.MOVE
 
     def __init__(self, pokemon, spe, priority, move):
         self.pokemon = pokemon
-        self.priority = (100 + priority, spe, random())
+        self.priority = priority_key(100 + priority, spe)
         self.move = move
 
     def run_event(self, battle, queue):
@@ -56,28 +146,33 @@ class MoveEvent(BaseEvent):
         return 'MoveEvent(pokemon=%s, move=%s)' % (self.pokemon, self.move)
 
 class SwitchEvent(BaseEvent):
+    __slots__ = ('pokemon', 'priority', 'incoming')
     type = Decision.SWITCH
     _priority = 300
 
     def __init__(self, pokemon, spe, incoming):
         self.pokemon = pokemon
-        self.priority = (self._priority, spe, random())
+        self.priority = priority_key(self._priority, spe)
         self.incoming = incoming
 
     def run_event(self, battle, queue):
         battle.run_switch(self.pokemon, self.incoming)
-        insort(queue, PostSwitchInEvent(self.incoming, battle.effective_spe(self.incoming)))
+        if self.incoming.is_active: # not if the outgoing pokemon was KOed by pursuit
+            queue.push(PostSwitchInEvent(self.incoming, battle.effective_spe(self.incoming)))
 
     def __repr__(self):
         return 'SwitchEvent(pokemon=%s, incoming=%s)' % (self.pokemon, self.incoming)
 
 class InstaSwitchEvent(SwitchEvent):
+    __slots__ = ()
     _priority = 400
 
 class PostSwitchInEvent(BaseEvent):
+    __slots__ = ('pokemon', 'priority')
+
     def __init__(self, pokemon, spe):
         self.pokemon = pokemon
-        self.priority = (350, spe, random())
+        self.priority = priority_key(350, spe)
 
     def run_event(self, battle, queue):
         battle.post_switch_in(self.pokemon)
@@ -86,11 +181,12 @@ class PostSwitchInEvent(BaseEvent):
         return 'PostSwitchInEvent(pokemon=%s)' % self.pokemon
 
 class MegaEvoEvent(BaseEvent):
+    __slots__ = ('pokemon', 'priority')
     type = Decision.MEGAEVO
 
     def __init__(self, pokemon, spe):
         self.pokemon = pokemon
-        self.priority = (200, spe, random())
+        self.priority = priority_key(200, spe)
 
     def run_event(self, battle, queue):
         self.pokemon.mega_evolve(battle)
@@ -99,8 +195,8 @@ class MegaEvoEvent(BaseEvent):
         return 'MegaEvoEvent(pokemon=%s)' % self.pokemon
 
 class ResidualEvent(BaseEvent):
-    def __init__(self):
-        self.priority = (-1, 0, 0)
+    __slots__ = ()
+    priority = priority_key(0, 0)
 
     def run_event(self, battle, queue):
         battle.run_residual()
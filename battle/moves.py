@@ -3,7 +3,6 @@ All moves are implemented here, and gathered in to the `movedex` dictionary.
 Moves are named with lowercasenospaces to allow direct comparison with Showdown's moves
 """
 import inspect
-import random
 
 if __debug__: from _logging import log
 from misc.functions import clamp_int
@@ -57,7 +56,7 @@ class Move(object):
     ignore_substitute = False   # will bypass foe's substitute
     targets_user = False        # will ignore foe's substitute and can be used against an empty foe
     targets_field = False       # same as targets_user, but is affected by Pressure
-    multihit = None    # tuple of number of hits that can be random.choice()'d
+    multihit = None    # tuple of number of hits that can be battle.rng.choice()'d
     secondary_effects = ()
     always_crit = False
     never_crit = False
@@ -97,6 +96,10 @@ class Move(object):
         """
         return self
 
+    def __reduce__(self):
+        """ Likewise, pickle a move as a reference to the movedex's instance """
+        return _get_move, (self.name,)
+
     def __eq__(self, other):
         return isinstance(other, Move) and self.name == other.name
 
@@ -1793,7 +1796,7 @@ class kingsshield(Move):
         if target is None or not target.will_move_this_turn:
             return FAIL
         if user.has_effect(Volatile.STALL):
-            return user.get_effect(Volatile.STALL).check_stall_success()
+            return user.get_effect(Volatile.STALL).check_stall_success(battle)
 
     def on_success(self, user, _, battle):
         user.set_effect(effects.KingsShield())
@@ -2292,7 +2295,7 @@ class protect(Move):
         if target is None or not target.will_move_this_turn:
             return FAIL
         if user.has_effect(Volatile.STALL):
-            return user.get_effect(Volatile.STALL).check_stall_success()
+            return user.get_effect(Volatile.STALL).check_stall_success(battle)
 
     def on_success(self, user, _, battle):
         user.set_effect(effects.Protect())
@@ -2832,7 +2835,7 @@ class sleeptalk(Move):
         if __debug__: log.i('sleeptalk choosing randomly from %s', moves)
 
         if moves:
-            move = random.choice(moves)
+            move = battle.rng.choice(moves)
             battle.use_move(user, move, battle.get_foe(user))
             battle.battlefield.last_move_used = move
         else:
@@ -2936,7 +2939,7 @@ class spikyshield(Move):
         if target is None or not target.will_move_this_turn:
             return FAIL
         if user.has_effect(Volatile.STALL):
-            return user.get_effect(Volatile.STALL).check_stall_success()
+            return user.get_effect(Volatile.STALL).check_stall_success(battle)
 
     def on_success(self, user, target, battle):
         user.set_effect(effects.SpikyShield())
@@ -3365,7 +3368,7 @@ class triattack(Move):
     STATUS = [Status.BRN, Status.PAR, Status.FRZ]
 
     def secondary(self, target, user, battle):
-        roll = random.randrange(3)
+        roll = battle.rng.randrange(3)
         battle.apply_secondary_effect(target, SecondaryEffect(100, status=self.STATUS[roll]),
                                       user)
 
@@ -3595,6 +3598,9 @@ class zenheadbutt(Move):
         self.base_power = 80
         self.secondary_effects = SecondaryEffect(20, volatile=Volatile.FLINCH),
 
+def _get_move(name):
+    return movedex[name]
+
 movedex = {name.rstrip('_'): obj() for name, obj in vars().items()
            if not name.startswith('_') and
            inspect.isclass(obj) and
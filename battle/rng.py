@@ -0,0 +1,30 @@
+"""
+Each Battle draws all of its randomness (accuracy, crits, damage rolls, secondary effects, speed
+ties, rollout policy choices, ...) from its own BattleRNG, at battle.rng. A battle run from the
+same state with the same seed is therefore reproducible, independently of anything else drawing
+from the global random module (e.g. other battles being run in the same process).
+
+Clones of a battle get a fork of its stream by default; a clone can instead be given its own rng,
+e.g. BattleRNG(seed) with the same seed for the clones of each candidate action, so that they are
+compared under common random numbers.
+"""
+import random
+
+
+class BattleRNG(random.Random):
+    """
+    A random.Random with fork(). If seed is None, it is seeded with a draw from the global random
+    module, so that seeding the global module still reproduces battles made after it.
+    """
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        super(BattleRNG, self).__init__(seed)
+
+    def fork(self):
+        """ Return an independent child stream, seeded with a draw from this one """
+        return BattleRNG(self.getrandbits(64))
+
+    def spawn(self, n):
+        """ Return n independent child streams, e.g. one for each of n parallel workers """
+        return [self.fork() for _ in xrange(n)]
@@ -1,41 +1,67 @@
-import random
-
 class BaseRolloutPolicy(object):
+    """
+    Makes the decisions for one side of a Battle. Any randomness should be drawn from rng, the
+    battle's BattleRNG, so that the battle is reproducible from its seed.
+    """
     def __init__(self, side):
         self.index = side
 
-    def make_move_decision(self, moves, switches, battlefield):
+    def make_move_decision(self, moves, switches, battlefield, rng):
         raise NotImplementedError
 
-    def make_switch_decision(self, choices, battlefield):
+    def make_switch_decision(self, choices, battlefield, rng):
         raise NotImplementedError
 
-    def make_mega_evo_decision(self, battlefield):
+    def make_mega_evo_decision(self, battlefield, rng):
         raise NotImplementedError
 
 class RandomRolloutPolicy(BaseRolloutPolicy):
-    def make_move_decision(self, moves, switches, battlefield):
-        return random.choice(moves), True
+    def make_move_decision(self, moves, switches, battlefield, rng):
+        return rng.choice(moves), True
 
-    def make_switch_decision(self, choices, battlefield):
-        return random.choice(choices)
+    def make_switch_decision(self, choices, battlefield, rng):
+        return rng.choice(choices)
 
-    def make_mega_evo_decision(self, battlefield):
-        return random.choice((True, False))
+    def make_mega_evo_decision(self, battlefield, rng):
+        return rng.choice((True, False))
 
 class RandomRolloutPolicyWithSwitches(RandomRolloutPolicy):
-    def make_move_decision(self, moves, switches, battlefield):
-        if switches and random.randrange(10) == 0:
-            return random.choice(switches), False
-        return random.choice(moves), True
+    def make_move_decision(self, moves, switches, battlefield, rng):
+        if switches and rng.randrange(10) == 0:
+            return rng.choice(switches), False
+        return rng.choice(moves), True
 
 class AutoRolloutPolicy(BaseRolloutPolicy):
     """ Always return the first choice """
-    def make_move_decision(self, moves, switches, battlefield):
+    def make_move_decision(self, moves, switches, battlefield, rng):
         return moves[0], True
 
-    def make_switch_decision(self, choices, battlefield):
+    def make_switch_decision(self, choices, battlefield, rng):
         return choices[0]
 
-    def make_mega_evo_decision(self, battlefield):
+    def make_mega_evo_decision(self, battlefield, rng):
         return True
+
+class GreedyRolloutPolicy(RandomRolloutPolicy):
+    """
+    Mostly uses the move with the highest expected damage against the foe's active pokemon, looked
+    up in damage_table (a battle.damagetable.DamageTable, which can be shared by all of the
+    policies in a process). With probability explore, or if no move does damage, it decides at
+    random like RandomRolloutPolicy.
+    """
+    explore = 0.1
+
+    def __init__(self, side, damage_table):
+        super(GreedyRolloutPolicy, self).__init__(side)
+        self.damage_table = damage_table
+
+    def make_move_decision(self, moves, switches, battlefield, rng):
+        if rng.random() >= self.explore:
+            user = battlefield.sides[self.index].active_pokemon
+            foe = battlefield.sides[not self.index].active_pokemon
+            if foe is not None and not foe.is_fainted():
+                damage = self.damage_table.expected_damage(user, foe, battlefield)
+                best = max(moves, key=lambda move: damage.get(move, 0))
+                if damage.get(best):
+                    return best, True
+        return rng.choice(moves), True
@@ -0,0 +1,99 @@
+"""
+Throughput statistics for rollouts and searches, so that rollout budgets can be tuned from data.
+
+A RolloutStats is filled in by whatever runs the battles (see BattleRoller and MinimaxAgent, which
+keep one per decision if they are created with collect_stats=True):
+
+- battles and turns: rollouts run and turns simulated, counted by BattleRoller.rollout_one_battle
+- events: events run by Battle.run_queued_events, for any Battle whose stats attribute is set
+- dispatches: handler calls per handler name, counted (in this process) between start() and stop()
+  for the dispatches through EffectHandlerMixin's activate_effect/accumulate_effect methods (the
+  engine's own loops over e.g. on_residual handlers aren't counted)
+- clone_time, simulate_time: seconds spent cloning battlefields for rollouts, and running them
+- wall_time: seconds between start() and stop(), i.e. spent on the decision as a whole; what's left
+  after cloning and simulating is bookkeeping (setting up policies, merging results, waiting on
+  workers, ...)
+
+With a worker pool, each worker collects its own stats, which are merged with update(), so the
+clone and simulate times are summed over the workers and can add up to more than the wall time.
+Nothing is counted or timed unless a RolloutStats is in use, and only one at a time should be
+started in a process.
+"""
+import time
+from collections import Counter
+
+from battle.effecthandler import count_dispatches, stop_counting_dispatches
+
+
+class RolloutStats(object):
+    def __init__(self):
+        self.wall_time = 0.0
+        self._started = None
+        self.reset()
+
+    def reset(self):
+        self.battles = 0
+        self.turns = 0
+        self.events = 0
+        self.dispatches = Counter()
+        self.clone_time = 0.0
+        self.simulate_time = 0.0
+        self.wall_time = 0.0
+        self._started = None
+
+    def start(self):
+        """ Reset, and start the clock and counting handler dispatches """
+        self.reset()
+        self._started = time.time()
+        count_dispatches(self.dispatches)
+
+    def stop(self):
+        if self._started is not None:
+            stop_counting_dispatches()
+            self.wall_time = time.time() - self._started
+            self._started = None
+
+    def update(self, other):
+        """ Add other's counts and clone/simulate times (e.g. from a worker process) to these """
+        self.battles += other.battles
+        self.turns += other.turns
+        self.events += other.events
+        self.dispatches.update(other.dispatches)
+        self.clone_time += other.clone_time
+        self.simulate_time += other.simulate_time
+
+    @property
+    def bookkeeping_time(self):
+        return max(0.0, self.wall_time - self.clone_time - self.simulate_time)
+
+    @property
+    def turns_per_battle(self):
+        return float(self.turns) / self.battles if self.battles else 0.0
+
+    def per_second(self, count):
+        return count / self.wall_time if self.wall_time else 0.0
+
+    @property
+    def battles_per_second(self):
+        return self.per_second(self.battles)
+
+    @property
+    def turns_per_second(self):
+        return self.per_second(self.turns)
+
+    @property
+    def events_per_second(self):
+        return self.per_second(self.events)
+
+    def __repr__(self):
+        return ('<RolloutStats: %d battles (%.1f/s), %d turns (%.1f/s, %.1f per battle), '
+                '%d events (%.1f/s), %d handler calls; %.3fs wall: %.3fs clone, %.3fs simulate, '
+                '%.3fs bookkeeping>' %
+                (self.battles, self.battles_per_second, self.turns, self.turns_per_second,
+                 self.turns_per_battle, self.events, self.events_per_second,
+                 sum(self.dispatches.values()), self.wall_time, self.clone_time,
+                 self.simulate_time, self.bookkeeping_time))
+
+    def most_dispatched(self, n=5):
+        """ Return the n handler names with the most calls, as (name, calls) pairs """
+        return self.dispatches.most_common(n)
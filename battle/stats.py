@@ -1,4 +1,5 @@
 from battle.enums import FAIL
+from battle.zobrist import zobrist_key
 from misc.functions import clamp_int
 
 if __debug__: from _logging import log
@@ -14,6 +15,10 @@ class PokemonStats(dict):
     def __deepcopy__(self, memo):
         return self.from_dict(self)
 
+    def __reduce__(self):
+        return PokemonStats, tuple(self[stat] for stat in ('max_hp', 'atk', 'def', 'spa', 'spd',
+                                                           'spe'))
+
     @classmethod
     def from_dict(cls, dct):
         self = cls(*(None,)*6)
@@ -22,9 +27,26 @@ class PokemonStats(dict):
         return self
 
 class Boosts(dict):
+    """
+    A pokemon's stat boosts. self.zobrist is kept up to date with the boosts' part of the battle's
+    zobrist hash (see battle.zobrist); it is 0 when there are no boosts.
+    """
+    __slots__ = ('zobrist',)
+
     def __init__(self, atk=0, def_=0, spa=0, spd=0, spe=0, acc=0, evn=0):
         super(Boosts, self).__init__(
             **{'atk': atk, 'def': def_, 'spa': spa, 'spd': spd, 'spe': spe, 'acc': acc, 'evn': evn})
+        self.zobrist = self.compute_zobrist()
+
+    def __setitem__(self, stat, value):
+        self.zobrist ^= _boost_key(stat, self[stat]) ^ _boost_key(stat, value)
+        dict.__setitem__(self, stat, value)
+
+    def compute_zobrist(self):
+        zobrist = 0
+        for stat, value in self.iteritems():
+            zobrist ^= _boost_key(stat, value)
+        return zobrist
 
     def update(self, other, name='<pokemon>'):
         prev = dict(self)
@@ -43,9 +65,23 @@ class Boosts(dict):
         if prev == self:
             return FAIL
 
+    def copy(self):
+        clone = Boosts.__new__(Boosts)
+        dict.update(clone, self)
+        clone.zobrist = self.zobrist
+        return clone
+
+    def __reduce__(self):
+        # rebuild via __setitem__ (for copy and pickle), so that self.zobrist stays consistent
+        return Boosts, (), None, None, self.iteritems()
+
     def __repr__(self):
         return (', '.join('%s=%s' % (stat, val) for stat, val in self.items() if val)
                 .join(['Boosts(', ')']))
 
     def __nonzero__(self):
         return any(val for val in self.values())
+
+
+def _boost_key(stat, value):
+    return zobrist_key('boost', stat, value) if value else 0
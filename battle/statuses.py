@@ -1,7 +1,6 @@
 """
 The major status ailments are implemented here as Effects.
 """
-import random
 
 from misc.functions import priority
 from battle.baseeffect import BaseEffect
@@ -23,7 +22,7 @@ class Paralyze(BaseStatusEffect):
 
     @priority(1)
     def on_before_move(self, user, move, battle):
-        if random.randrange(4) == 0:
+        if battle.rng.randrange(4) == 0:
             if __debug__: log.i("%s is paralyzed; it can't move!", user)
             return FAIL
 
@@ -33,7 +32,7 @@ class Freeze(BaseStatusEffect):
     @priority(10)
     def on_before_move(self, user, move, battle):
         assert user.status is Status.FRZ
-        if random.randrange(5) == 0 or move.thaw_user:
+        if battle.rng.randrange(5) == 0 or move.thaw_user:
             user.cure_status()
         else:
             if __debug__: log.i("%s is frozen!", user)
@@ -63,8 +62,8 @@ class Sleep(BaseStatusEffect):
         turns_slept = user.turns_slept
         if ((self.rest and turns_slept >= 2) or
             (not self.rest and (turns_slept >= 3 or
-                                (turns_slept == 2 and random.randrange(2) == 0) or
-                                (turns_slept == 1 and random.randrange(3) == 0)))):
+                                (turns_slept == 2 and battle.rng.randrange(2) == 0) or
+                                (turns_slept == 1 and battle.rng.randrange(3) == 0)))):
             user.cure_status()
             if __debug__: log.i('%s woke up!', user)
             return
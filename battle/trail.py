@@ -0,0 +1,249 @@
+"""
+Trail (make/unmake) mode for the Battle.
+
+A search that explores many continuations of the same battle can either clone the battle for
+each continuation, or run each continuation on the same battle and then undo it. While a Battle
+is trailing, every change to the state reachable from its battlefield (attributes of the field,
+sides, pokemon and effects; pp, boosts, _effect_index and effect_handlers) is recorded on an undo
+log, and Battle.rollback(mark) restores the state as of Battle.mark(), including the queues and the
+state of battle.rng (so that each continuation draws the same random numbers, whatever was run
+before it):
+
+    mark = battle.mark()
+    for action in actions:
+        run(battle, action)
+        ... # evaluate
+        battle.rollback(mark)
+
+Recording is done by swapping the class of each object for a trailed subclass that snapshots the
+object (or container) the first time it is changed after each mark. Objects that are not trailing
+run at full speed, so a Battle that never calls mark() is unaffected.
+"""
+from battle.baseeffect import BaseEffect
+from battle.battlefield import BattleField, BattleSide
+from battle.battlepokemon import BattlePokemon
+from battle.stats import Boosts
+from misc.slots import get_slots, set_slots
+
+
+class TrailMark(object):
+    """ An opaque position on the undo log. May be rolled back to any number of times. """
+    def __init__(self, position, event_queue, faint_queue, rng_state):
+        self.position = position
+        self.event_queue = event_queue
+        self.faint_queue = faint_queue
+        self.rng_state = rng_state
+
+
+class Trail(object):
+    def __init__(self):
+        self._log = []          # (object, snapshot) pairs, in the order they were first touched
+        self._touched = set()   # ids of objects already snapshotted since the latest mark
+        self._classes = {}      # original class -> trailed subclass
+
+    def mark(self, battle):
+        self._touched.clear()
+        return TrailMark(len(self._log), battle.event_queue.snapshot(), battle.faint_queue[:],
+                         battle.rng.getstate())
+
+    def rollback(self, battle, mark):
+        log = self._log
+        assert mark.position <= len(log), 'Rolled back past this mark already'
+        while len(log) > mark.position:
+            obj, snapshot = log.pop()
+            _restore(obj, snapshot)
+        self._touched.clear()
+        battle.event_queue.restore(mark.event_queue)
+        battle.faint_queue[:] = mark.faint_queue
+        battle.rng.setstate(mark.rng_state)
+
+    def touch(self, obj):
+        """ Snapshot obj, if it hasn't been snapshotted since the latest mark """
+        if id(obj) not in self._touched:
+            self._touched.add(id(obj))
+            self._log.append((obj, _snapshot(obj)))
+
+    def copy_on_write(self, owner, name):
+        """
+        Replace the container owner.<name> with a copy the first time it is changed after each
+        mark, leaving the original (and its iteration order) intact for rollback.
+        """
+        container = getattr(owner, name)
+        if id(container) not in self._touched:
+            container = container.copy()
+            self._touched.add(id(container))
+            setattr(owner, name, container)
+        return container
+
+    def adopt(self, obj):
+        """ Start recording changes to obj """
+        cls = obj.__class__
+        if cls.__dict__.get('_trail') is self:
+            return
+        trailed = self._classes.get(cls)
+        if trailed is None:
+            trailed = self._classes[cls] = self._make_trailed_class(cls)
+        obj.__class__ = trailed
+
+    def adopt_battlefield(self, battlefield):
+        for obj in _trailed_objects(battlefield):
+            self.adopt(obj)
+
+    def release_battlefield(self, battlefield):
+        """ Stop recording changes to battlefield; it runs untrailed from now on """
+        for obj in _trailed_objects(battlefield):
+            if obj.__class__.__dict__.get('_trail') is self:
+                obj.__class__ = obj.__class__.__bases__[0]
+
+    def _make_trailed_class(self, cls):
+        if issubclass(cls, BaseEffect):
+            methods = _trailed_effect_methods(cls, self)
+        elif issubclass(cls, Boosts):
+            methods = _trailed_boosts_methods(cls, self)
+        else:
+            assert issubclass(cls, (BattleField, BattleSide, BattlePokemon)), cls
+            methods = _trailed_effector_methods(cls, self)
+            if issubclass(cls, BattlePokemon):
+                methods.update(_trailed_pokemon_methods(cls, self))
+        methods['_trail'] = self
+        methods['__slots__'] = () # keeps the layout of cls, so that obj.__class__ can be swapped
+        return type(cls)(cls.__name__, (cls,), methods)
+
+
+def _trailed_objects(battlefield):
+    yield battlefield
+    for effect in battlefield.effects:
+        yield effect
+    for side in battlefield.sides:
+        yield side
+        for effect in side.effects:
+            yield effect
+        for pokemon in side.team:
+            yield pokemon
+            if hasattr(pokemon, '_effect_index'): # i.e. not an UnrevealedPokemon
+                yield pokemon.boosts
+                for effect in pokemon.effects:
+                    yield effect
+
+def _snapshot(obj):
+    if isinstance(obj, list):
+        return obj[:]
+    if isinstance(obj, Boosts):
+        return dict(obj), obj.zobrist
+    if isinstance(obj, dict):
+        return dict(obj)
+    dct = getattr(obj, '__dict__', None)
+    return get_slots(obj), (dct.copy() if dct is not None else None)
+
+def _restore(obj, snapshot):
+    """ Restore obj in place, so that anything referring to it sees the restored state """
+    if isinstance(obj, list):
+        obj[:] = snapshot
+    elif isinstance(obj, Boosts):
+        _restore_dict(obj, snapshot[0])
+        obj.zobrist = snapshot[1]
+    elif isinstance(obj, dict):
+        _restore_dict(obj, snapshot)
+    else:
+        slots, dct = snapshot
+        set_slots(obj, slots)
+        if dct is not None:
+            obj.__dict__.clear()
+            obj.__dict__.update(dct)
+
+def _restore_dict(obj, snapshot):
+    # Reassigning the values one by one keeps the dict's layout (dict.update may resize it), so
+    # that its iteration order (e.g. the order of a pokemon's moves) is as before the mark.
+    if len(obj) != len(snapshot) or any(key not in snapshot for key in obj):
+        dict.clear(obj)
+    for key, value in snapshot.iteritems():
+        dict.__setitem__(obj, key, value)
+
+
+def _trailed_effect_methods(cls, trail):
+    touch = trail.touch
+    base_setattr = cls.__setattr__
+
+    def __setattr__(self, name, value):
+        touch(self)
+        base_setattr(self, name, value)
+
+    return {'__setattr__': __setattr__}
+
+def _trailed_boosts_methods(cls, trail):
+    touch = trail.touch
+    base_setitem = cls.__setitem__
+
+    def __setitem__(self, key, value):
+        touch(self)
+        base_setitem(self, key, value)
+
+    return {'__setitem__': __setitem__}
+
+def _trailed_effector_methods(cls, trail):
+    """ Methods for BattleField, BattleSide and BattlePokemon """
+    touch, adopt, copy_on_write = trail.touch, trail.adopt, trail.copy_on_write
+    base_setattr = cls.__setattr__
+    base_set_effect = cls.set_effect
+    base_remove_effect = cls.remove_effect
+    # the handler bookkeeping is private to EffectHandlerMixin, but must copy on write too
+    base_set_handlers = cls._set_handlers #pylint: disable=protected-access
+    base_remove_handlers = cls._remove_handlers #pylint: disable=protected-access
+
+    def __setattr__(self, name, value):
+        touch(self)
+        base_setattr(self, name, value)
+
+    def set_effect(self, effect, *args, **kwargs):
+        copy_on_write(self, '_effect_index')
+        adopt(effect)
+        return base_set_effect(self, effect, *args, **kwargs)
+
+    def remove_effect(self, source, *args, **kwargs):
+        copy_on_write(self, '_effect_index')
+        return base_remove_effect(self, source, *args, **kwargs)
+
+    # the handler lists themselves are never modified in place (see EffectHandlers)
+    def _set_handlers(self, effect):
+        touch(self.effect_handlers)
+        base_set_handlers(self, effect)
+
+    def _remove_handlers(self, effect):
+        touch(self.effect_handlers)
+        base_remove_handlers(self, effect)
+
+    return {'__setattr__': __setattr__,
+            'set_effect': set_effect,
+            'remove_effect': remove_effect,
+            '_set_handlers': _set_handlers,
+            '_remove_handlers': _remove_handlers}
+
+def _trailed_pokemon_methods(cls, trail):
+    touch, adopt, copy_on_write = trail.touch, trail.adopt, trail.copy_on_write
+    base_setattr = cls.__setattr__
+    base_clear_effects = cls.clear_effects
+    base_deduct_pp = cls.deduct_pp
+    base_transform_into = cls.transform_into
+
+    def __setattr__(self, name, value):
+        touch(self)
+        if name == 'boosts':
+            adopt(value)
+        base_setattr(self, name, value)
+
+    def clear_effects(self, battle):
+        copy_on_write(self, '_effect_index')
+        return base_clear_effects(self, battle)
+
+    def deduct_pp(self, move, target):
+        touch(self.moves)
+        return base_deduct_pp(self, move, target)
+
+    def transform_into(self, other, battle, client=False):
+        touch(self.base_data)
+        return base_transform_into(self, other, battle, client)
+
+    return {'__setattr__': __setattr__,
+            'clear_effects': clear_effects,
+            'deduct_pp': deduct_pp,
+            'transform_into': transform_into}
@@ -0,0 +1,42 @@
+"""
+Zobrist hashing of battle states.
+
+Each feature of the state (e.g. side 0's vaporeon having 220 hp, or side 1 having stealthrock) has
+a random 64-bit key, and the hash of a state is the XOR of the keys of all of its features. When a
+feature changes, the hash is updated by XORing out the old feature's key and XORing in the new one,
+so keeping it up to date costs O(1) per change.
+
+The BattleField, each BattleSide, each BattlePokemon and each Boosts keep their own part of the
+hash up to date (see EffectHandlerMixin._toggle_zobrist), and BattleField.zobrist combines them.
+BattleField.compute_zobrist recomputes it from scratch, for verification. The state that changes in
+place or every turn (effects' durations and counters, turns_out, ...) isn't kept up to date: it is
+hashed each time the hash is read (see EffectHandlerMixin.state_zobrist), which costs O(effects).
+
+Keys are derived from the feature's names (not from id() or hash()), so hashes are consistent
+between processes and runs.
+"""
+from hashlib import md5
+from struct import unpack
+
+MASK = (1 << 64) - 1
+
+_keys = {}
+
+def zobrist_key(*feature):
+    """
+    Return the 64-bit key for feature, a tuple of names and values, e.g. (0, 'vaporeon', 'hp', 220).
+    Moves, items and abilities are keyed by name.
+    """
+    try:
+        return _keys[feature]
+    except KeyError:
+        tokens = tuple(getattr(value, 'name', value) for value in feature)
+        key = _keys[feature] = unpack('<Q', md5(repr(tokens)).digest()[:8])[0]
+        return key
+
+def salt(zobrist, multiplier):
+    """
+    Combine a part of the hash that doesn't depend on its owner (e.g. a pokemon's Boosts) with the
+    owner's multiplier (an odd key), so that identical parts with different owners don't cancel out.
+    """
+    return (zobrist * multiplier) & MASK
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the battle engine and the AI's search.
+Usage: ./BillsPC.py benchmark [name ...]    (run via `python -O` for representative numbers)
+
+Each benchmark simulates battles between two fixed teams, so results are comparable between runs
+and machines without needing rbstats.pkl.
+"""
+import gc
+import multiprocessing
+import random
+import sys
+import time
+import types
+from collections import OrderedDict
+from copy import deepcopy
+from functools import partial
+
+from AI.matrixtree import BreakpointBattle, Breakpoint, BreakNewTurn
+from AI.mctsagent import MCTSAgent, MCTSNode, SELECTORS
+from AI.minimaxagent import MinimaxAgent
+from AI.workerpool import WorkerPool
+from battle.abilities import abilitydex
+from battle.battleengine import Battle
+from battle.battlepokemon import BattlePokemon
+from battle.damagetable import DamageTable
+from battle.enums import MoveCategory
+from battle.events import EventQueue, ResidualEvent
+from battle.items import itemdex
+from battle.moves import movedex
+from battle.rolloutpolicy import RandomRolloutPolicy, GreedyRolloutPolicy
+from showdowndata import pokedex
+from _logging import silence_console
+
+TEAMS = (
+    (('vaporeon', 'waterabsorb', 'leftovers', ('icebeam', 'protect', 'scald', 'wish')),
+     ('leafeon', 'chlorophyll', 'lifeorb', ('knockoff', 'leafblade', 'swordsdance', 'xscissor')),
+     ('charizard', 'blaze', 'lifeorb', ('airslash', 'earthquake', 'fireblast', 'roost')),
+     ('blastoise', 'torrent', 'leftovers', ('icebeam', 'rapidspin', 'roar', 'scald')),
+     ('venusaur', 'overgrow', 'blacksludge', ('earthquake', 'gigadrain', 'sleeppowder',
+                                              'sludgebomb')),
+     ('jolteon', 'voltabsorb', 'lifeorb', ('hiddenpowerice', 'signalbeam', 'thunderbolt',
+                                           'voltswitch'))),
+    (('flareon', 'flashfire', 'toxicorb', ('facade', 'flamecharge', 'flareblitz', 'superpower')),
+     ('umbreon', 'synchronize', 'leftovers', ('foulplay', 'protect', 'toxic', 'wish')),
+     ('espeon', 'magicbounce', 'lifeorb', ('calmmind', 'morningsun', 'psyshock', 'shadowball')),
+     ('gengar', 'levitate', 'lifeorb', ('focusblast', 'painsplit', 'shadowball', 'sludgewave')),
+     ('garchomp', 'roughskin', 'choicescarf', ('earthquake', 'outrage', 'stoneedge',
+                                               'swordsdance')),
+     ('scizor', 'technician', 'choiceband', ('bulletpunch', 'knockoff', 'superpower', 'uturn'))),
+)
+
+BENCHMARKS = OrderedDict()
+
+def benchmark(func):
+    """ Decorator: register func as a benchmark, named after the function """
+    BENCHMARKS[func.__name__] = func
+    return func
+
+def make_team(sets):
+    return [BattlePokemon(pokedex[name], 80, [movedex[move] for move in moves],
+                          abilitydex[ability], itemdex[item])
+            for name, ability, item, moves in sets]
+
+def new_battle():
+    return Battle(make_team(TEAMS[0]), make_team(TEAMS[1]))
+
+def midgame_battles(n, max_turns=10, seed=0):
+    """
+    Return n battles that have been run forward a random number of turns (up to max_turns), so
+    that they have a realistic assortment of damage, effects, and fainted pokemon.
+    """
+    random.seed(seed)
+    battles = []
+    while len(battles) < n:
+        battle = new_battle()
+        battle.init_battle()
+        for _ in range(random.randint(1, max_turns)):
+            battle.run_turn()
+            if battle.battlefield.win is not None:
+                break
+        else:
+            battles.append(battle)
+    return battles
+
+def rate(func, args, duration):
+    """ Call func(arg) for each arg in args repeatedly for `duration` seconds; return calls/sec """
+    calls = 0
+    start = time.time()
+    while True:
+        for arg in args:
+            func(arg)
+        calls += len(args)
+        elapsed = time.time() - start
+        if elapsed >= duration:
+            return calls / elapsed
+
+def report(name, results, baseline=None):
+    """ Print a result line per (label, rate) in results, with the speedup over the baseline """
+    print name
+    for label, value in results:
+        line = '    %-12s %10.1f/sec' % (label, value)
+        if baseline is not None and label != baseline:
+            line += '   (%.1fx %s)' % (value / dict(results)[baseline], baseline)
+        print line
+
+@benchmark
+def clone(duration):
+    """ BattleField.clone vs copy.deepcopy on mid-game battlefields """
+    battlefields = [battle.battlefield for battle in midgame_battles(20)]
+    report('clone', [('deepcopy', rate(deepcopy, battlefields, duration)),
+                     ('clone', rate(lambda bf: bf.clone(), battlefields, duration))],
+           baseline='deepcopy')
+
+@benchmark
+def dispatch(duration):
+    """
+    Effect handler dispatch (activate_effect/accumulate_effect): a damage calculation, priority and
+    speed for each damaging move of the active pokemon in mid-game battles
+    """
+    cases = []
+    for battle in midgame_battles(20):
+        user, target = (side.active_pokemon for side in battle.battlefield.sides)
+        if user is None or target is None:
+            continue
+        for user, target in ((user, target), (target, user)):
+            cases.extend((battle, user, move, target) for move in user.moves
+                         if move.category is not MoveCategory.STATUS)
+
+    def calculate(case):
+        battle, user, move, target = case
+        battle.calculate_damage(user, move, target)
+        battle.modify_priority(user, move)
+        battle.effective_spe(user)
+
+    report('dispatch', [('calculations', rate(calculate, cases, duration))])
+
+@benchmark
+def events(duration):
+    """
+    EventQueue throughput: scheduling and popping a turn's events (both sides' decisions and the
+    residual) in mid-game battles
+    """
+    cases = []
+    for battle in midgame_battles(20):
+        if all(side.active_pokemon is not None for side in battle.battlefield.sides):
+            cases.append((battle.rng, battle.get_move_decisions() + [ResidualEvent()]))
+
+    def schedule(case):
+        rng, turn_events = case
+        queue = EventQueue(rng)
+        for event in turn_events:
+            queue.push(event)
+        while queue:
+            queue.pop()
+
+    per_case = float(sum(len(turn_events) for _, turn_events in cases)) / len(cases)
+    report('events', [('events', rate(schedule, cases, duration) * per_case)])
+
+@benchmark
+def policies(duration):
+    """
+    Rollout throughput of GreedyRolloutPolicy (with a shared DamageTable, and with a table that
+    caches nothing, i.e. a damage calculation per decision) vs RandomRolloutPolicy, from mid-game
+    battlefields
+    """
+    battlefields = [battle.battlefield for battle in midgame_battles(20)]
+    damage_table, uncached = DamageTable(), DamageTable()
+    uncached.max_size = 0
+    makers = (('random', RandomRolloutPolicy),
+              ('greedy', lambda i: GreedyRolloutPolicy(i, damage_table)),
+              ('uncached', lambda i: GreedyRolloutPolicy(i, uncached)))
+
+    def rollout(battlefield, make_policy, simulated):
+        clone = battlefield.clone()
+        Battle.from_battlefield(clone, make_policy(0), make_policy(1)).run_battle()
+        simulated[0] += clone.turns - battlefield.turns
+
+    rollouts, turns = [], []
+    for label, make_policy in makers:
+        simulated = [0]
+        random.seed(0)
+        start = time.time()
+        rollouts.append((label, rate(partial(rollout, make_policy=make_policy, simulated=simulated),
+                                     battlefields, duration)))
+        turns.append((label, simulated[0] / (time.time() - start)))
+
+    report('policies: rollouts', rollouts, baseline='random')
+    report('policies: turns', turns, baseline='random')
+
+def owned_size(obj, shared):
+    """
+    Return the total size in bytes of the objects reachable from obj, not counting those reachable
+    from shared (i.e. the size of a clone of shared, not counting the data they have in common).
+    Classes, modules and functions are not followed.
+    """
+    def reachable(root):
+        found = {}
+        stack = [root]
+        while stack:
+            item = stack.pop()
+            if id(item) not in found and not isinstance(item, (type, types.ClassType,
+                                                               types.ModuleType, types.FunctionType,
+                                                               types.BuiltinFunctionType)):
+                found[id(item)] = item
+                stack.extend(gc.get_referents(item))
+        return found
+
+    excluded = reachable(shared)
+    return sum(sys.getsizeof(item) for key, item in reachable(obj).iteritems()
+               if key not in excluded)
+
+@benchmark
+def memory(_):
+    """ Memory footprint of a clone of a mid-game battlefield (the duration is ignored) """
+    battlefields = [battle.battlefield for battle in midgame_battles(20)]
+    size = sum(owned_size(bf.clone(), bf) for bf in battlefields) / len(battlefields)
+    print 'memory'
+    print '    %-12s %10d bytes' % ('battlefield', size)
+
+def decisions(n):
+    """ Return n (battlefield, breakpoint) pairs: the decisions at new turns of mid-game battles """
+    cases = []
+    for battle in midgame_battles(2 * n):
+        battle = BreakpointBattle.from_battlefield(battle.battlefield.clone(), (), ())
+        try:
+            battle.run_turn()
+        except BreakNewTurn as breakpoint:
+            battle.battlefield.reset_zobrist()
+            cases.append((battle.battlefield, breakpoint))
+        except Breakpoint: # a switch decision
+            continue
+        if len(cases) == n:
+            break
+    return cases
+
+@benchmark
+def parallel(duration):
+    """
+    Scaling of the parallel search drivers (see AI.parallelsearch) with the number of workers, up
+    to the number of cores: decisions/sec at mid-game new turns, with the speedup over one worker
+    and the efficiency (speedup per worker). Each decision does the same work whatever the number
+    of workers: root-parallel MCTS runs a tree of 50 iterations per core, root-parallel minimax
+    searches a copy of the battlefield 1 turn deep per core, and leaf-parallel MCTS runs 50
+    iterations (of 4 playouts each).
+    """
+    cores = multiprocessing.cpu_count()
+    worker_counts = sorted({2 ** k for k in range(cores.bit_length()) if 2 ** k < cores} | {cores})
+    cases = decisions(4)
+    mcts, minimax = MCTSAgent(), MinimaxAgent()
+    mcts.set_my_player(0)
+    mcts.root_trees = cores
+    minimax.set_my_player(0)
+
+    def mcts_root((battlefield, breakpoint)):
+        mcts.iterations = 50 * cores
+        mcts.search_root_parallel([battlefield], breakpoint, pool)
+
+    def minimax_root((battlefield, breakpoint)):
+        minimax.search_root_parallel([battlefield] * cores, breakpoint, pool)
+
+    def mcts_leaf((battlefield, breakpoint)):
+        battle = BreakpointBattle.from_battlefield(battlefield.clone(), (), ())
+        root = MCTSNode.from_battle(battle, breakpoint, SELECTORS[mcts.selection])
+        mcts.arena.reroot(root)
+        mcts.search_leaf_parallel(root, battle, pool, iterations=50)
+
+    drivers = (('mcts root', mcts_root), ('minimax root', minimax_root),
+               ('mcts leaf', mcts_leaf))
+    results = {label: [] for label, _ in drivers}
+    for workers in worker_counts:
+        pool = WorkerPool(workers)
+        try:
+            for label, decide in drivers:
+                results[label].append(rate(decide, cases, duration))
+        finally:
+            pool.close()
+
+    for label, _ in drivers:
+        print 'parallel: %s' % label
+        for workers, value in zip(worker_counts, results[label]):
+            speedup = value / results[label][0]
+            print '    %-12s %10.2f/sec   (%.1fx, %3.0f%% efficiency)' % (
+                'workers=%d' % workers, value, speedup, 100 * speedup / workers)
+
+def main(args):
+    if __debug__:
+        print 'Warning: logging is enabled; run with `python -O` for representative results\n'
+    silence_console()
+    names = args.names or BENCHMARKS.keys()
+    for name in names:
+        if name not in BENCHMARKS:
+            print 'Unknown benchmark %s: choose from %s' % (name, ', '.join(BENCHMARKS))
+            return
+    for name in names:
+        BENCHMARKS[name](args.duration)
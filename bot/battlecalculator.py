@@ -116,8 +116,7 @@ class BattleCalculator(Battle):
         self.damage_randomizer = lambda: 100 # max damage
         maxdamage = self.calculate_damage(attacker, move, defender)
 
-        self.get_critical_hit = Battle.get_critical_hit
-        self.damage_randomizer = Battle.damage_randomizer
+        del self.get_critical_hit, self.damage_randomizer # restore the Battle methods
         if attacker.has_effect(Volatile.SHEERFORCE):
             attacker.remove_effect(Volatile.SHEERFORCE)
 
@@ -137,8 +136,7 @@ class BattleCalculator(Battle):
         self.damage_randomizer = lambda: 93 # average damage
         damage = self.calculate_damage(attacker, move, defender)
 
-        self.get_critical_hit = Battle.get_critical_hit
-        self.damage_randomizer = Battle.damage_randomizer
+        del self.get_critical_hit, self.damage_randomizer # restore the Battle methods
         attacker.remove_effect(Volatile.SHEERFORCE)
 
         return damage
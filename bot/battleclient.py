@@ -1,5 +1,7 @@
 from __future__ import absolute_import
+import re
 import string
+import time
 import traceback
 
 import AI
@@ -33,11 +35,19 @@ class BattleClient(object):
     Purposefully unimplemented message types (because they don't occur in randbats):
     {-swapboost, -copyboost, -invertboost, -ohko, -mustrecharge}
     """
-    def __init__(self, name, room, send, show_calcs=False, ai_strategy=None):
+    TIMER_FRACTION = 0.5 # of the time left on the battle timer that one decision may use
+    TIMER_MARGIN = 5     # seconds left on the timer that are never used (for latency)
+
+    def __init__(self, name, room, send, show_calcs=False, ai_strategy=None, worker_pool=None,
+                 collect_stats=False, time_budget=None):
         """
         name: (str) client's username
         room: (str) the showdown room that battle messages should be sent to
         send: a callable that takes a str param, and sends messages to the showdown server
+        worker_pool: (WorkerPool) processes for the AI to use; it outlives this battle
+        collect_stats: (bool) log the AI's rollout/search stats for each decision
+        time_budget: (float) the most seconds the AI may spend on a decision, or None for no limit
+                     (apart from the battle timer, if it's on)
         """
         self.name = name        # str
         self.room = room        # str
@@ -54,10 +64,14 @@ class BattleClient(object):
         self.previous_msg = ['']
         self.switch_choice = None
         self.bench_order = None
+        self.time_budget = time_budget
+        self.time_left = None    # seconds left on the battle timer, if it's on
+        self.time_left_at = None # time.time() when time_left was received
 
         self.show_calcs = show_calcs
         self.battle = BattleCalculator.from_battlefield(None)
-        self.AI = AI.Agent(ai_strategy) if ai_strategy else None
+        self.AI = (AI.Agent(ai_strategy, pool=worker_pool, collect_stats=collect_stats)
+                   if ai_strategy else None)
 
         def _send(msg):
             self.last_sent = msg
@@ -356,10 +370,51 @@ class BattleClient(object):
         pokemon.ivs = HPivs[hp_type]
         pokemon.stats = pokemon.calculate_initial_stats(pokemon.evs, pokemon.ivs)
 
+    def decision_time_budget(self):
+        """
+        Return the seconds that the AI may spend on the decision at hand: self.time_budget, capped
+        by TIMER_FRACTION of the time left on the battle timer (less TIMER_MARGIN) if it's on. None
+        means no limit.
+        """
+        budget = self.time_budget
+        if self.time_left is not None:
+            time_left = self.time_left - (time.time() - self.time_left_at)
+            timer_budget = max(0.0, time_left * self.TIMER_FRACTION - self.TIMER_MARGIN)
+            budget = timer_budget if budget is None else min(budget, timer_budget)
+        return budget
+
+    TIME_LEFT = (re.compile(r'Time left: (\d+) sec this turn \| (\d+) sec total'),
+                 re.compile(r'(.+) has (\d+) seconds left'))
+
     def handle_inactive(self, msg):
+        """
+        |inactive|Time left: 150 sec this turn | 230 sec total
+        |inactive|test-BillsPC has 120 seconds left.
+
+        Sent while the battle timer is on: record the time left for my decisions.
+        """
+        text = '|'.join(msg[1:]) # the first form is split by the '|' in it
+        per_turn = self.TIME_LEFT[0].search(text)
+        if per_turn:
+            self.set_time_left(min(int(seconds) for seconds in per_turn.groups()))
+        else:
+            player = self.TIME_LEFT[1].search(text)
+            if player and player.group(1) == self.name:
+                self.set_time_left(int(player.group(2)))
+
         if self.last_sent is not None:
             self.send(self.last_sent)
 
+    def set_time_left(self, seconds):
+        self.time_left = seconds
+        self.time_left_at = time.time()
+
+    def handle_inactiveoff(self, msg):
+        """
+        |inactiveoff|Battle timer is now OFF.
+        """
+        self.time_left = self.time_left_at = None
+
     def handle_turn(self, msg):
         """
         |turn|1
@@ -545,9 +600,13 @@ class BattleClient(object):
 
     def make_move(self, request, switch_rejected=False):
         moves, switches, can_mega = self.get_action_choices(request, switch_rejected)
-        action, mega = self.AI.select_action(self.battlefield, moves, switches, can_mega)
+        action, mega = self.AI.select_action(self.battlefield, moves, switches, can_mega,
+                                             self.decision_time_budget())
 
         log.i('Selected action: %s%s', action, ' + mega' if mega else '')
+        if self.AI.stats is not None:
+            log.i('Decision stats: %s; most dispatched: %s', self.AI.stats,
+                  self.AI.stats.most_dispatched())
         if mega and action.action_type == Decision.SWITCH:
             log.w("%s chose to switch and mega-evolve on the same turn; removing 'mega'", self.AI)
             mega = False
@@ -1049,8 +1108,7 @@ class BattleClient(object):
             if outgoing.ability == abilitydex['regenerator'] and not outgoing.is_fainted():
                 outgoing.hp = min(outgoing.max_hp, outgoing.hp + outgoing.max_hp / 3)
             outgoing.is_active = False
-            outgoing._effect_index.clear()
-            outgoing.effect_handlers = {key: list() for key in outgoing.effect_handlers}
+            outgoing.discard_effects()
             outgoing.boosts = Boosts()
             outgoing.types = list(outgoing.pokedex_entry.types) # protean etc. may have changed type
             outgoing.ability = outgoing.base_ability
@@ -1185,7 +1243,8 @@ class BattleClient(object):
         foe_zoroark._effect_index = decoy._effect_index
         decoy._effect_index = {}
         foe_zoroark.effect_handlers = decoy.effect_handlers
-        decoy.effect_handlers = {key: list() for key in decoy.effect_handlers}
+        foe_zoroark.handler_mask = decoy.handler_mask
+        decoy.discard_effects()
         foe_zoroark.status = decoy.status
         foe_zoroark.turns_slept = decoy.turns_slept
         foe_zoroark.boosts = decoy.boosts
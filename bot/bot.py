@@ -6,6 +6,7 @@ import getpass
 import requests
 from ws4py.client.threadedclient import WebSocketClient
 
+from AI.workerpool import WorkerPool
 from bot.battleclient import BattleClient
 from misc.bashcolors import sent, received
 from _logging import log
@@ -22,13 +23,16 @@ class Bot(WebSocketClient):
     - Triage messages from the server and delegate to the appropriate room handler or ignore them
     - Create and delete rooms/handlers as needed
     - Handle 'challstr' messages to complete the login process
+    - Own the AI's worker pool (if workers > 1), so that its processes are started once and
+      reused for every battle
 
     TODO: allow simultaneous rooms? for chatbotting this is necessary, however the AI for battling
     is very CPU intensive; even one battle will pin resources so simultaneous battles is low
     priority.
     """
     def __init__(self, username=None, password=None, accept_challenges=False, show_calcs=False,
-                 ai_strategy=None, *args, **kwargs):
+                 ai_strategy=None, workers=1, collect_stats=False, time_budget=None, *args,
+                 **kwargs):
         super(Bot, self).__init__(*args, **kwargs)
         self.username = ((username or raw_input('Showdown username: '))
                          .decode('utf-8').encode('ascii', 'ignore'))
@@ -37,6 +41,10 @@ class Bot(WebSocketClient):
         self.accept_challenges = accept_challenges
         self.ai_strategy = ai_strategy
         self.show_calcs = show_calcs
+        self.collect_stats = collect_stats
+        self.time_budget = time_budget
+        # start the workers now, before the websocket client starts any threads
+        self.worker_pool = WorkerPool(workers) if workers > 1 else None
         self.latest_request = None
         self.battleclient = None
         self.battleroom = None
@@ -77,7 +85,9 @@ class Bot(WebSocketClient):
                 if msg_block[1] == '|init|battle':
                     self.battleroom = msg_block[0][1:]
                     self.battleclient = BattleClient(self.username, self.battleroom, self.send,
-                                                     self.show_calcs, self.ai_strategy)
+                                                     self.show_calcs, self.ai_strategy,
+                                                     self.worker_pool, self.collect_stats,
+                                                     self.time_budget)
                     self.latest_request = None
                     self.challenging = None
                 else:
@@ -140,13 +150,14 @@ class Bot(WebSocketClient):
         'callback', '-singleturn', '-singlemove', '-sidestart', '-sideend', '-fieldstart',
         '-fieldend', '-formechange', 'detailschange', '-mega', '-supereffective', '-resisted',
         '-miss', '-immune', '-fail', '-crit', 'win', 'tie', 'prematureend', 'replace', 'choice',
+        'inactiveoff',
     }
 
     IGNORE_MSGS = {
         'updateuser', 'queryresponse', 'formats', 'updatesearch', 'title', 'join', 'gen', 'tier',
         'rated', 'rule', 'start', 'init', 'gametype', 'variation', '-hint', '-center', '-message',
         '-notarget', '-hitcount', '-nothing', '-waiting', '-combine', 'chat', 'c', 'chatmsg',
-        'chatmsg-raw', 'raw', 'html', 'pm', 'askreg', 'inactiveoff', 'join', 'j', 'leave', 'l', 'L',
+        'chatmsg-raw', 'raw', 'html', 'pm', 'askreg', 'join', 'j', 'leave', 'l', 'L',
         'spectator', 'spectatorleave', 'clearpoke', 'poke', 'teampreview', 'swap', 'done', '',
         'error', 'warning', 'gen', 'debug', 'unlink', 'users', ':', 'c:', 'expire', 'seed',
         '-endability', '-fieldactivate', '-primal', 'n'
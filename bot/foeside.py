@@ -4,6 +4,7 @@ from battle.battlepokemon import BattlePokemon
 from battle.enums import Type
 from battle.abilities import abilitydex
 from battle.items import itemdex
+from misc.slots import get_slots, set_slots
 from _logging import log
 
 
@@ -21,7 +22,7 @@ class UnrevealedPokemon(BattlePokemon):
     def not_implemented(self, *args, **kwargs):
         raise AssertionError('This pokemon has not been revealed yet')
 
-    set_effect = has_effect = get_effect = remove_effect = clear_effects = \
+    set_effect = has_effect = get_effect = remove_effect = clear_effects = discard_effects = \
     suppress_ability = unsuppress_ability = \
     calculate_stat = calculate_initial_stats = _calc_hp = calculate_evs_ivs = \
     is_immune_to_move = is_immune_to = take_item = set_item = use_item = not_implemented
@@ -29,6 +30,24 @@ class UnrevealedPokemon(BattlePokemon):
     def _debug_sanity_check(self, battle):
         pass
 
+    def clone_with_memo(self, memo):
+        clone = self.__class__.__new__(self.__class__)
+        set_slots(clone, get_slots(self)) # most slots are unset
+        clone.__dict__ = self.__dict__.copy() #pylint: disable=attribute-defined-outside-init
+        side = getattr(self, 'side', None)
+        if side is not None:
+            clone.side = memo.get(id(side), side)
+        memo[id(self)] = clone
+        return clone
+
+    def clone_effects(self, clone, memo):
+        pass
+
+    def compute_own_zobrist(self):
+        return 0
+
+    own_zobrist = state_zobrist = compute_own_zobrist
+
     def cure_status(self):
         pass
 
@@ -51,6 +70,11 @@ class FoeBattleSide(BattleSide):
             self.active_pokemon = None
         self.active_illusion = False
 
+    def clone_with_memo(self, memo):
+        clone = super(FoeBattleSide, self).clone_with_memo(memo)
+        clone.__dict__ = self.__dict__.copy()
+        return clone
+
     @property
     def num_unrevealed(self):
         return len([pokemon for pokemon in self.team if pokemon.name == UNREVEALED])
@@ -151,6 +151,33 @@ class TestBattleClient(BaseTestBattleClient):
         self.assertEqual(self.foe_name, 'other-player')
 
 
+    def test_handle_inactive_time_left(self):
+        self.assertIsNone(self.bc.decision_time_budget())
+
+        self.handle('|inactive|Battle timer is ON: inactive players will automatically lose when '
+                    'time\'s up.')
+        self.assertIsNone(self.bc.time_left)
+        self.handle('|inactive|other-player has 30 seconds left.')
+        self.assertIsNone(self.bc.time_left)
+        self.handle('|inactive|test-BillsPC has 120 seconds left.')
+        self.assertEqual(self.bc.time_left, 120)
+        self.handle('|inactive|Time left: 150 sec this turn | 90 sec total')
+        self.assertEqual(self.bc.time_left, 90)
+
+        budget = self.bc.decision_time_budget()
+        self.assertTrue(0 < budget <= 90 * self.bc.TIMER_FRACTION - self.bc.TIMER_MARGIN)
+        self.bc.time_budget = 10
+        self.assertEqual(self.bc.decision_time_budget(), 10)
+
+        self.handle('|inactiveoff|Battle timer is now OFF.')
+        self.assertIsNone(self.bc.time_left)
+        self.assertEqual(self.bc.decision_time_budget(), 10)
+
+    def test_time_budget_is_never_negative(self):
+        self.handle('|inactive|Time left: 3 sec this turn | 3 sec total')
+        self.assertEqual(self.bc.decision_time_budget(), 0)
+
+
 class TestBattleClientPostTurn0(BaseTestBattleClient):
     def setUp(self):
         self.bc = BattleClient('test-BillsPC', 'battle-randombattle-1', lambda *_: None,
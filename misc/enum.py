@@ -1,9 +1,12 @@
+ENUM_VALUES = {} # every enum's values, each mapped to itself (see misc.pickling)
+
 class EnumMeta(type):
     """ Enum metaclass. Creates a values dictionary with the attribute name as its own value """
     def __new__(mcs, name, bases, dct):
         for val in dct:
             dct[val] = val
         dct['values'] = {k: v for k, v in dct.items() if not k.startswith('__')}
+        ENUM_VALUES.update(dct['values'])
         return type.__new__(mcs, name, bases, dct)
 
 class NoCopy(object):
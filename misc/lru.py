@@ -0,0 +1,43 @@
+"""
+A bounded map that evicts its least recently used entries, for the search's tables and caches
+(e.g. AI.transposition.TranspositionTable and AI.rollout.FilledTeamCache).
+"""
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A map of key -> value that holds at most max_entries entries. Getting or putting a key makes it
+    the most recently used; putting a new key when the cache is full evicts the least recently used
+    entry. None can't be stored, since get returns it for a missing key.
+    """
+    def __init__(self, max_entries):
+        assert max_entries > 0, max_entries
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # in order of least to most recently used
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """ Return the value for key (which is now the most recently used), or None """
+        entries = self._entries
+        value = entries.pop(key, None)
+        if value is not None:
+            entries[key] = value
+        return value
+
+    def put(self, key, value):
+        entries = self._entries
+        if entries.pop(key, None) is None and len(entries) >= self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = value
+
+    def clear(self):
+        self._entries.clear()
+        self.evictions = 0
@@ -0,0 +1,42 @@
+"""
+Pickling of battle state, e.g. to ship a battlefield to worker processes for rollouts.
+
+Plain pickling of a battlefield doesn't work, or doesn't give back an equivalent battlefield:
+- Effect handler lists hold bound methods, which python 2 can't pickle. These are pickled as a
+  lookup of the method's name on its (pickled) instance.
+- Enum values (see misc.enum) are strings that are compared by identity, but unpickled strings are
+  new objects. These are pickled by reference, and unpickle to the enum's own values.
+Singletons (moves, FAIL, ABILITY, ...) take care of themselves with __reduce__.
+"""
+import copy_reg
+import cPickle
+import types
+from cStringIO import StringIO
+
+from misc.enum import ENUM_VALUES
+
+def _reduce_method(method):
+    return getattr, (method.__self__, method.__func__.__name__)
+
+copy_reg.pickle(types.MethodType, _reduce_method)
+
+def _persistent_id(obj):
+    if type(obj) is str and obj in ENUM_VALUES:
+        return 'enum:' + obj # not an enum value itself, so it is pickled as a plain string
+
+def _persistent_load(pid):
+    return ENUM_VALUES[pid[5:]]
+
+def dumps(obj):
+    """ Return obj pickled as a string """
+    out = StringIO()
+    pickler = cPickle.Pickler(out, cPickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = _persistent_id
+    pickler.dump(obj)
+    return out.getvalue()
+
+def loads(data):
+    """ Return the object pickled by dumps """
+    unpickler = cPickle.Unpickler(StringIO(data))
+    unpickler.persistent_load = _persistent_load
+    return unpickler.load()
@@ -0,0 +1,88 @@
+"""
+Copying and snapshotting of objects with a __slots__ layout.
+
+Such objects have no __dict__ to copy wholesale, and looping over their slot names with
+getattr/setattr is several times slower than copying a dict. Instead, a function that reads (or
+copies) every slot of a class with plain attribute access is generated once per class.
+"""
+from itertools import izip
+
+MISSING = object() # stands in for the value of a slot that has not been set
+
+_slot_names = {}
+_getters = {}
+_copiers = {}
+_descriptors = {}
+
+def slot_names(cls):
+    """ Return the names of the slots of cls and its bases, excluding __dict__ and __weakref__ """
+    try:
+        return _slot_names[cls]
+    except KeyError:
+        names = []
+        for base in reversed(cls.__mro__):
+            slots = base.__dict__.get('__slots__', ())
+            if isinstance(slots, basestring):
+                slots = (slots,)
+            for name in slots:
+                if name not in ('__dict__', '__weakref__') and name not in names:
+                    names.append(name)
+        names = _slot_names[cls] = tuple(names)
+        return names
+
+def _compile(name, source):
+    # source is generated from a class's slot names (identifiers), never from outside input
+    namespace = {}
+    exec source in namespace #pylint: disable=exec-used
+    return namespace[name]
+
+def get_slots(obj):
+    """ Return a tuple of the values of obj's slots, with MISSING for any that are not set """
+    cls = obj.__class__
+    getter = _getters.get(cls)
+    if getter is None:
+        getter = _getters[cls] = _compile('getter', 'def getter(obj):\n    return (%s)\n' %
+                                          ''.join('obj.%s, ' % name for name in slot_names(cls)))
+    try:
+        return getter(obj)
+    except AttributeError:
+        return tuple(getattr(obj, name, MISSING) for name in slot_names(cls))
+
+def set_slots(obj, values):
+    """
+    Set obj's slots to values (as returned by get_slots), bypassing any __setattr__ override.
+    Slots whose value is MISSING are unset.
+    """
+    cls = obj.__class__
+    descriptors = _descriptors.get(cls)
+    if descriptors is None:
+        descriptors = _descriptors[cls] = tuple(_slot_descriptor(cls, name)
+                                                for name in slot_names(cls))
+    for descriptor, value in izip(descriptors, values):
+        if value is MISSING:
+            try:
+                descriptor.__delete__(obj)
+            except AttributeError: # already unset
+                pass
+        else:
+            descriptor.__set__(obj, value)
+
+def _slot_descriptor(cls, name):
+    for base in cls.__mro__:
+        slots = base.__dict__.get('__slots__', ())
+        if name == slots or name in slots:
+            return base.__dict__[name]
+    raise AttributeError(name)
+
+def copy_slots(obj, clone):
+    """
+    Copy the value of each of obj's slots onto clone, an instance of the same class; i.e. the
+    __slots__ equivalent of `clone.__dict__ = obj.__dict__.copy()`. Every slot of obj must be set.
+    """
+    cls = obj.__class__
+    copier = _copiers.get(cls)
+    if copier is None:
+        copier = _copiers[cls] = _compile('copier', 'def copier(obj, clone):\n    pass\n%s' %
+                                          ''.join('    clone.%s = obj.%s\n' % (name, name)
+                                                  for name in slot_names(cls)))
+    copier(obj, clone)
@@ -1,3 +1,4 @@
+import random
 from unittest import TestCase
 
 from battle.enums import Status, ABILITY, ITEM
@@ -6,6 +7,19 @@ from battle.items import itemdex
 from battle.moves import movedex
 
 
+class GlobalRNG(object):
+    """
+    A stand-in for a battle's BattleRNG that draws from the global random module, looking up each
+    function when it is called, so that tests can fix rolls with e.g.
+    @patch('random.randrange', lambda _: 0)
+    """
+    def __getattr__(self, name):
+        return getattr(random, name)
+
+    def fork(self):
+        return self
+
+
 class TestCaseCommon(TestCase):
     """
     Test case base class providing helper methods for testing
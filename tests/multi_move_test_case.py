@@ -11,7 +11,7 @@ from showdowndata import pokedex
 from battle.abilities import abilitydex
 from battle.items import itemdex
 from battle.moves import movedex
-from tests.common import TestCaseCommon
+from tests.common import TestCaseCommon, GlobalRNG
 
 
 class AnyMovePPDict(dict):
@@ -52,6 +52,7 @@ class TestingBattle(Battle):
     turns.
     """
     def __init__(self, *args, **kwargs):
+        kwargs.setdefault('rng', GlobalRNG())
         super(TestingBattle, self).__init__(*args, **kwargs)
         self.testing_decisions = []
         self.faint_queue = LoggingFaintQueue()
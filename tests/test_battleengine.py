@@ -10,6 +10,7 @@ from battle.abilities import abilitydex
 from battle.items import itemdex
 from battle.enums import FAIL, Status, Volatile, Type, Weather
 from battle.stats import Boosts
+from tests.common import GlobalRNG
 from tests.multi_move_test_case import MultiMoveTestCase
 
 
@@ -24,7 +25,8 @@ class BattleEngineMovesTestCase(TestCase):
         self.palkia = BattlePokemon(pokedex['palkia'], evs=(0,)*6, ivs=(31,)*6,  ability=_none_)
         self.sylveon = BattlePokemon(pokedex['sylveon'], evs=(0,)*6, ivs=(31,)*6,  ability=_none_)
         self.battle = Battle([self.vaporeon], [self.flareon, self.sylveon, self.leafeon,
-                                               self.golem, self.espeon, self.palkia])
+                                               self.golem, self.espeon, self.palkia],
+                             rng=GlobalRNG())
         self.battle.init_battle()
         # make it deterministic
         self.battle.get_critical_hit = lambda crit: False
@@ -121,7 +123,7 @@ class TestBattleEngineCalculateDamage(BattleEngineMovesTestCase):
         self.assertEqual(damage, 168)
 
     def test_crit_ratio_3_always_crits(self):
-        self.battle.get_critical_hit = Battle.get_critical_hit
+        del self.battle.get_critical_hit # use the real crit roll
         dragonclaw = movedex['dragonclaw']
         with patch.object(dragonclaw, 'crit_ratio', 3):
             damage = self.battle.calculate_damage(self.leafeon, dragonclaw, self.vaporeon)
@@ -130,7 +132,7 @@ class TestBattleEngineCalculateDamage(BattleEngineMovesTestCase):
     def test_damage_calculation_with_different_levels(self):
         self.vaporeon = BattlePokemon(pokedex['vaporeon'], level=80, evs=(0,)*6, ivs=(31,)*6)
         self.flareon = BattlePokemon(pokedex['flareon'], level=70, evs=(0,)*6, ivs=(31,)*6)
-        self.battle = Battle([self.vaporeon], [self.flareon])
+        self.battle = Battle([self.vaporeon], [self.flareon], rng=GlobalRNG())
         self.battle.init_battle()
         self.battle.get_critical_hit = lambda crit: False
         self.battle.damage_randomizer = lambda: 100
@@ -299,7 +301,7 @@ class TestBattleEngineRunMove(TestCase):
                                             movedex['facade'],
                                             movedex['protect']),
                                      ability=abilitydex['_none_'])
-        self.battle = Battle([self.vaporeon], [self.flareon])
+        self.battle = Battle([self.vaporeon], [self.flareon], rng=GlobalRNG())
         # make it deterministic
         self.battle.get_critical_hit = lambda crit: False
         self.battle.damage_randomizer = lambda: 100 # max damage
@@ -1,7 +1,7 @@
 from copy import deepcopy
 
 from battle import effects
-from battle.enums import Weather, SideCondition, Volatile, ABILITY, ITEM
+from battle.enums import Weather, SideCondition, Hazard, Volatile, ABILITY, ITEM
 from battle.moves import movedex
 from tests.multi_move_test_case import MultiMoveTestCaseWithoutSetup
 
@@ -78,3 +78,85 @@ class TestDeepcopyBattlefield(MultiMoveTestCaseWithoutSetup):
         self.run_turn()
         self.assertEqual(orig.turns, 2)
         self.assertEqual(clone.turns, 1)
+
+
+class TestCloneBattlefield(MultiMoveTestCaseWithoutSetup):
+    def setUp(self):
+        self.new_battle(p0_moves=('thunderwave', 'wish', 'substitute', 'disable'),
+                        p0_item='choiceband',
+                        p1_moves=('pursuit', 'phantomforce', 'spikes', 'knockoff'),
+                        p1_ability='drizzle',
+                        p1_item='leftovers')
+        self.choose_move(self.vaporeon, 'wish')
+        self.choose_move(self.leafeon, 'spikes')
+        self.run_turn()
+        self.vaporeon.set_effect(effects.Attract(self.leafeon))
+
+    def test_clone_battlefield(self):
+        orig = self.battlefield
+        clone = orig.clone()
+        self.assertIsNot(clone, orig)
+        clone_vaporeon = clone.sides[0].team[0]
+        clone_leafeon = clone.sides[1].active_pokemon
+        self.assertIsNot(clone_vaporeon, self.vaporeon)
+        self.assertIs(clone_vaporeon.side, clone.sides[0])
+        self.assertIs(clone_leafeon.side, clone.sides[1])
+        self.assertIs(clone.sides[0].active_pokemon, clone_vaporeon)
+
+        self.assertIs(clone_vaporeon.pokedex_entry, self.vaporeon.pokedex_entry)
+        self.assertIs(clone_vaporeon.stats, self.vaporeon.stats)
+        self.assertIs(clone_vaporeon.item, self.vaporeon.item)
+        self.assertIs(clone_leafeon.ability, self.leafeon.ability)
+        self.assertIsNot(clone_vaporeon.moves, self.vaporeon.moves)
+        self.assertDictEqual(clone_vaporeon.moves, self.vaporeon.moves)
+        self.assertIsNot(clone_vaporeon.types, self.vaporeon.types)
+        self.assertIsNot(clone_vaporeon.boosts, self.vaporeon.boosts)
+
+        self.assertIsNot(clone.get_effect(Weather.RAINDANCE),
+                         orig.get_effect(Weather.RAINDANCE))
+        self.assertIsNot(clone.sides[0].get_effect(SideCondition.WISH),
+                         orig.sides[0].get_effect(SideCondition.WISH))
+        self.assertIsNot(clone.sides[0].get_effect(Hazard.SPIKES),
+                         orig.sides[0].get_effect(Hazard.SPIKES))
+
+        clone_attract = clone_vaporeon.get_effect(Volatile.ATTRACT)
+        self.assertIsNot(clone_attract, self.vaporeon.get_effect(Volatile.ATTRACT))
+        self.assertIs(clone_attract.mate, clone_leafeon)
+
+    def test_clone_rebinds_effect_handlers(self):
+        clone = self.battlefield.clone()
+        effectors = (clone, clone.sides[0], clone.sides[1]) + tuple(clone.sides[0].team +
+                                                                     clone.sides[1].team)
+        for effector in effectors:
+            effects_ = effector.effects
+            for name, handlers in effector.effect_handlers.items():
+                for handler in handlers:
+                    if hasattr(handler, '__self__'):
+                        self.assertTrue(any(handler.__self__ is effect for effect in effects_))
+
+        orig_names = {name: [handler.__name__ for handler in handlers] for name, handlers
+                      in self.vaporeon.effect_handlers.items()}
+        clone_names = {name: [handler.__name__ for handler in handlers] for name, handlers
+                       in clone.sides[0].team[0].effect_handlers.items()}
+        self.assertDictEqual(orig_names, clone_names)
+
+    def test_clone_is_independent(self):
+        clone = self.battle.clone()
+        clone_vaporeon = clone.battlefield.sides[0].active_pokemon
+        clone_leafeon = clone.battlefield.sides[1].active_pokemon
+        clone_vaporeon.remove_effect(Volatile.ATTRACT)
+        clone_leafeon.has_moved_this_turn = False
+        clone_leafeon.will_move_this_turn = True
+        clone.run_move(clone_leafeon, movedex['knockoff'], clone_vaporeon)
+
+        self.assertTrue(self.vaporeon.has_effect(Volatile.ATTRACT))
+        self.assertEqual(self.vaporeon.hp, self.vaporeon.max_hp)
+        self.assertIsNotNone(self.vaporeon.item)
+        self.assertEqual(self.leafeon.pp[movedex['knockoff']], movedex['knockoff'].max_pp)
+        self.assertLess(clone_vaporeon.hp, clone_vaporeon.max_hp)
+        self.assertIsNone(clone_vaporeon.item)
+        self.assertIsNone(clone_vaporeon.get_effect(ITEM))
+
+        self.run_turn()
+        self.assertEqual(self.battlefield.turns, 2)
+        self.assertEqual(clone.battlefield.turns, 1)
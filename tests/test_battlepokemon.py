@@ -1,7 +1,10 @@
 from unittest import TestCase
 
+from battle.baseeffect import BaseEffect
 from battle.battlepokemon import BattlePokemon
+from battle.effecthandler import hook_bit, handler_mask
 from battle.abilities import abilitydex
+from battle.enums import Volatile
 from battle.moves import movedex
 from battle.items import itemdex
 from showdowndata import pokedex
@@ -132,3 +135,60 @@ class TestAbilityChange(MultiMoveTestCase):
         self.run_turn()
 
         self.assertDamageTaken(self.vaporeon, 278)
+
+
+class TestEffectHandlers(MultiMoveTestCase):
+    def test_handler_lists_are_only_allocated_for_registered_hooks(self):
+        self.new_battle(p0_item='leftovers')
+        self.assertDictEqual(self.leafeon.effect_handlers, {})
+        self.assertIn('on_residual', self.vaporeon.effect_handlers)
+
+        self.assertListEqual(self.leafeon.effect_handlers['on_residual'], [])
+        self.assertNotIn('on_residual', self.leafeon.effect_handlers)
+
+    def test_handler_list_is_dropped_with_its_last_handler(self):
+        self.new_battle()
+        self.leafeon.confuse()
+        self.assertIn('on_before_move', self.leafeon.effect_handlers)
+
+        self.leafeon.remove_effect(Volatile.CONFUSE)
+        self.assertDictEqual(self.leafeon.effect_handlers, {})
+        self.assertEqual(self.leafeon.accumulate_effect('on_modify_spe', self.leafeon, None, 5), 5)
+
+    def test_handler_mask(self):
+        self.new_battle(p0_item='leftovers')
+        self.assertEqual(self.leafeon.handler_mask, 0)
+        self.assertTrue(self.vaporeon.handler_mask & hook_bit('on_residual'))
+        self.assertEqual(self.vaporeon.handler_mask, handler_mask(self.vaporeon.effect_handlers))
+
+        self.leafeon.confuse()
+        self.assertEqual(self.leafeon.handler_mask, hook_bit('on_before_move'))
+        self.leafeon.remove_effect(Volatile.CONFUSE)
+        self.assertEqual(self.leafeon.handler_mask, 0)
+
+    def test_dispatch_calls_the_handlers_registered_when_it_started(self):
+        calls = []
+
+        class Remover(BaseEffect):
+            source = 'remover'
+            def on_modify_spe(self, pokemon, battle, spe):
+                calls.append(self.source)
+                pokemon.remove_effect('removed')
+                pokemon.set_effect(Added())
+                return spe * 2
+
+        class Removed(Remover):
+            source = 'removed'
+
+        class Added(Remover):
+            source = 'added'
+
+        self.new_battle()
+        self.leafeon.set_effect(Remover())
+        self.leafeon.set_effect(Removed())
+        spe = self.leafeon.accumulate_effect('on_modify_spe', self.leafeon, self.battle, 1)
+
+        self.assertEqual(spe, 4)
+        self.assertListEqual(calls, ['remover', 'removed'])
+        self.assertListEqual([handler.__self__.source for handler in
+                              self.leafeon.effect_handlers['on_modify_spe']], ['remover', 'added'])
@@ -0,0 +1,78 @@
+from battle.damagetable import DamageTable
+from battle.enums import Weather
+from battle.rng import BattleRNG
+from battle.rolloutpolicy import GreedyRolloutPolicy
+from battle.moves import movedex
+from tests.multi_move_test_case import MultiMoveTestCaseWithoutSetup
+
+
+class DamageTableTestCase(MultiMoveTestCaseWithoutSetup):
+    def setUp(self):
+        self.new_battle('vaporeon', 'charizard', any_move=False, tearDown=False,
+                        p0_moves=('surf', 'icebeam', 'toxic', 'seismictoss'),
+                        p1_moves=('flamethrower', 'roost', 'earthquake', 'fireblast'))
+        self.table = DamageTable()
+
+    def expected_damage(self, attacker, defender):
+        return self.table.expected_damage(attacker, defender, self.battlefield)
+
+
+class TestDamageTable(DamageTableTestCase):
+    def test_expected_damage(self):
+        damage = self.expected_damage(self.vaporeon, self.charizard)
+        self.assertEqual(set(damage), {movedex['surf'], movedex['icebeam'],
+                                       movedex['seismictoss']})
+        self.assertGreater(damage[movedex['surf']], damage[movedex['icebeam']])
+        self.assertEqual(damage[movedex['seismictoss']], 100)
+
+        damage = self.expected_damage(self.charizard, self.vaporeon)
+        self.assertEqual(set(damage), {movedex['flamethrower'], movedex['earthquake'],
+                                       movedex['fireblast']})
+        entry = {move: damage for move, damage, _ in
+                 self.table.lookup(self.charizard, self.vaporeon, self.battlefield)}
+        self.assertAlmostEqual(damage[movedex['fireblast']], entry[movedex['fireblast']] * 0.85)
+        self.assertEqual(damage[movedex['earthquake']], entry[movedex['earthquake']])
+
+    def test_capped_at_hp(self):
+        self.charizard.hp = 10
+        damage = self.expected_damage(self.vaporeon, self.charizard)
+        self.assertEqual(damage[movedex['surf']], 10)
+        self.assertEqual(damage[movedex['seismictoss']], 10)
+
+    def test_cached_per_matchup(self):
+        self.expected_damage(self.vaporeon, self.charizard)
+        self.expected_damage(self.vaporeon, self.charizard)
+        self.charizard.hp -= 50
+        self.expected_damage(self.vaporeon, self.charizard)
+        self.assertEqual((len(self.table), self.table.misses, self.table.hits), (1, 1, 2))
+
+        self.vaporeon.apply_boosts({'spa': 1})
+        boosted = self.expected_damage(self.vaporeon, self.charizard)
+        self.battlefield.set_weather(Weather.SUNNYDAY)
+        sunny = self.expected_damage(self.vaporeon, self.charizard)
+        self.assertEqual(len(self.table), 3)
+        self.assertLess(sunny[movedex['surf']], boosted[movedex['surf']])
+
+    def test_max_size(self):
+        self.table.max_size = 1
+        self.expected_damage(self.vaporeon, self.charizard)
+        self.expected_damage(self.charizard, self.vaporeon)
+        self.assertEqual(len(self.table), 1)
+
+
+class TestGreedyRolloutPolicy(DamageTableTestCase):
+    def test_uses_highest_damage_move(self):
+        policy = GreedyRolloutPolicy(0, self.table)
+        policy.explore = 0
+        moves = self.vaporeon.get_move_choices()
+        for _ in range(10):
+            self.assertEqual(policy.make_move_decision(moves, [], self.battlefield, BattleRNG()),
+                             (movedex['surf'], True))
+
+    def test_explore(self):
+        policy = GreedyRolloutPolicy(0, self.table)
+        policy.explore = 1
+        moves = self.vaporeon.get_move_choices()
+        choices = {policy.make_move_decision(moves, [], self.battlefield, BattleRNG(seed))[0]
+                   for seed in range(50)}
+        self.assertEqual(choices, set(moves))
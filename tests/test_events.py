@@ -0,0 +1,73 @@
+from random import Random
+from unittest import TestCase
+
+from battle.events import EventQueue, MoveEvent, SwitchEvent, ResidualEvent, priority_key
+
+
+class TestEventQueue(TestCase):
+    def new_queue(self, events=(), seed=0):
+        return EventQueue(Random(seed), events)
+
+    def pop_all(self, queue):
+        events = []
+        while queue:
+            events.append(queue.pop())
+        return events
+
+    def test_priority_key_order(self):
+        self.assertGreater(priority_key(101, 0), priority_key(100, 999))
+        self.assertGreater(priority_key(100.1, 50), priority_key(100, 200))
+        self.assertGreater(priority_key(100, 25.25), priority_key(100, 25))
+        self.assertGreater(priority_key(100, -50), priority_key(100, -100))
+        self.assertGreater(priority_key(100, -200), priority_key(-1, 0))
+
+    def test_pops_highest_priority_first(self):
+        residual = ResidualEvent()
+        slow = MoveEvent(None, 50, 0, None)
+        fast = MoveEvent(None, 100, 0, None)
+        quick = MoveEvent(None, 10, 1, None)
+        switch = SwitchEvent(None, 0, None)
+        queue = self.new_queue([residual, slow, fast])
+        queue.extend([quick, switch])
+
+        self.assertEqual(len(queue), 5)
+        self.assertIs(queue.peek(), switch)
+        self.assertEqual(self.pop_all(queue), [switch, quick, fast, slow, residual])
+        self.assertFalse(queue)
+
+    def test_speed_ties_are_broken_by_the_rng(self):
+        orders = set()
+        for seed in range(20):
+            events = [MoveEvent(name, 100, 0, None) for name in 'ab']
+            order = [event.pokemon for event in self.pop_all(self.new_queue(events, seed))]
+            same = [event.pokemon for event in self.pop_all(self.new_queue(events, seed))]
+            self.assertEqual(order, same)
+            orders.add(tuple(order))
+
+        self.assertEqual(orders, {('a', 'b'), ('b', 'a')})
+
+    def test_remove_if(self):
+        events = [MoveEvent(name, spe, 0, None) for name, spe in zip('abcd', (4, 3, 2, 1))]
+        queue = self.new_queue(events)
+        queue.remove_if(lambda event: event.pokemon in 'bc')
+
+        self.assertEqual(sorted(event.pokemon for event in queue), ['a', 'd'])
+        self.assertEqual(self.pop_all(queue), [events[0], events[3]])
+
+    def test_snapshot_and_restore(self):
+        events = [MoveEvent(name, spe, 0, None) for name, spe in zip('abc', (3, 2, 1))]
+        queue = self.new_queue(events)
+        snapshot = queue.snapshot()
+        queue.pop()
+        queue.push(ResidualEvent())
+        queue.restore(snapshot)
+
+        self.assertEqual(self.pop_all(queue), events)
+
+    def test_clone_keeps_tiebreaks(self):
+        events = [MoveEvent(name, 100, 0, None) for name in 'abcdef']
+        queue = self.new_queue(events)
+        clone = queue.clone({}, Random(1))
+
+        self.assertEqual([event.pokemon for event in self.pop_all(clone)],
+                         [event.pokemon for event in self.pop_all(queue)])
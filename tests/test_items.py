@@ -826,7 +826,7 @@ class TestItems(MultiMoveTestCaseWithoutSetup):
         crit = [None]
         def get_critical_hit(crit_ratio):
             crit[0] = crit_ratio
-            return Battle.get_critical_hit(crit_ratio)
+            return Battle.get_critical_hit(self.battle, crit_ratio)
 
         self.new_battle(p0_item='scopelens', p0_ability='superluck',
                         p1_ability='angerpoint')
@@ -915,7 +915,7 @@ class TestItems(MultiMoveTestCaseWithoutSetup):
         crit = [None]
         def get_critical_hit(crit_ratio):
             crit[0] = crit_ratio
-            return Battle.get_critical_hit(crit_ratio)
+            return Battle.get_critical_hit(self.battle, crit_ratio)
 
         self.new_battle('vaporeon', 'farfetchd', p0_item='stick', p1_item='stick')
         self.battle.get_critical_hit = get_critical_hit
@@ -0,0 +1,37 @@
+from battle.enums import Status, Weather, Hazard, FAIL
+from battle.moves import movedex
+from misc import pickling
+from tests.multi_move_test_case import MultiMoveTestCaseWithoutSetup
+
+
+class TestPickling(MultiMoveTestCaseWithoutSetup):
+    def test_battlefield_round_trip(self):
+        self.new_battle(p0_ability='drizzle', p1_item='leftovers', any_move=False,
+                        p0_moves=('toxic', 'spikes'), p1_moves=('substitute', 'leafblade'))
+        self.add_pokemon('flareon', 1)
+        self.choose_move(self.vaporeon, 'toxic')
+        self.choose_move(self.leafeon, 'leafblade')
+        self.run_turn()
+        self.choose_move(self.vaporeon, 'spikes')
+        self.choose_move(self.leafeon, 'substitute')
+        self.run_turn()
+
+        battlefield = pickling.loads(pickling.dumps(self.battlefield))
+        vaporeon, leafeon = (side.active_pokemon for side in battlefield.sides)
+
+        self.assertIs(leafeon.status, Status.TOX)
+        self.assertIs(battlefield.weather, Weather.RAINDANCE)
+        self.assertTrue(battlefield.sides[1].has_effect(Hazard.SPIKES))
+        self.assertEqual(leafeon.hp, self.leafeon.hp)
+        self.assertIs(vaporeon.moves.keys()[0], movedex[vaporeon.moves.keys()[0].name])
+        self.assertEqual(battlefield.zobrist, self.battlefield.zobrist)
+        self.assertEqual(battlefield.zobrist, battlefield.compute_zobrist())
+
+        for effector in (leafeon, leafeon.side, battlefield):
+            for handlers in effector.effect_handlers.values():
+                for handler in handlers:
+                    self.assertIn(handler.__self__, effector.effects)
+
+    def test_singletons(self):
+        self.assertIs(pickling.loads(pickling.dumps(FAIL)), FAIL)
+        self.assertIs(pickling.loads(pickling.dumps(movedex['scald'])), movedex['scald'])
@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+from misc.slots import slot_names, get_slots, set_slots, copy_slots, MISSING
+
+
+class Base(object):
+    __slots__ = ('a', 'b')
+
+class Derived(Base):
+    __slots__ = ('__dict__', 'c')
+
+class Guarded(Base):
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AssertionError('__setattr__ should be bypassed')
+
+
+class TestSlots(TestCase):
+    def test_slot_names(self):
+        self.assertEqual(slot_names(Base), ('a', 'b'))
+        self.assertEqual(slot_names(Derived), ('a', 'b', 'c'))
+        self.assertEqual(slot_names(Guarded), ('a', 'b'))
+
+    def test_get_slots(self):
+        obj = Derived()
+        obj.a, obj.b, obj.c = 1, 2, 3
+        obj.d = 4
+        self.assertEqual(get_slots(obj), (1, 2, 3))
+        del obj.b
+        self.assertEqual(get_slots(obj), (1, MISSING, 3))
+
+    def test_set_slots(self):
+        obj = Guarded.__new__(Guarded)
+        set_slots(obj, (1, 2))
+        self.assertEqual((obj.a, obj.b), (1, 2))
+        set_slots(obj, (MISSING, 3))
+        self.assertFalse(hasattr(obj, 'a'))
+        self.assertEqual(obj.b, 3)
+        set_slots(obj, (MISSING, 3))
+        self.assertFalse(hasattr(obj, 'a'))
+
+    def test_copy_slots(self):
+        obj = Derived()
+        obj.a, obj.b, obj.c = [1], 2, 3
+        obj.d = 4
+        clone = Derived.__new__(Derived)
+        copy_slots(obj, clone)
+        self.assertEqual(get_slots(clone), ([1], 2, 3))
+        self.assertIs(clone.a, obj.a)
+        self.assertFalse(hasattr(clone, 'd'))
@@ -1783,6 +1783,15 @@ class TestMoves(MultiMoveTestCase):
 
         self.assertDamageTaken(self.umbreon, 11)
 
+    def test_pursuit_vs_switch_still_runs_post_switch_in(self):
+        self.add_pokemon('umbreon', 1, ability='intimidate')
+        self.choose_switch(self.leafeon, self.umbreon)
+        self.choose_move(self.vaporeon, 'pursuit')
+        self.run_turn()
+
+        self.assertActive(self.umbreon)
+        self.assertBoosts(self.vaporeon, {'atk': -1})
+
     def test_pursuit_KO_switching_pokemon(self):
         self.add_pokemon('flareon', 1)
         self.add_pokemon('jolteon', 1)
@@ -2533,7 +2542,7 @@ class TestMoves(MultiMoveTestCase):
         self.assertFainted(self.vaporeon)
 
     def test_stormthrow_always_crit(self):
-        self.battle.get_critical_hit = Battle.get_critical_hit
+        del self.battle.get_critical_hit # use the real crit roll
         self.choose_move(self.vaporeon, 'stormthrow')
         self.choose_move(self.leafeon, 'stormthrow')
         self.run_turn()
@@ -0,0 +1,71 @@
+from unittest import TestCase
+
+from battle.abilities import abilitydex
+from battle.battleengine import Battle
+from battle.battlepokemon import BattlePokemon
+from battle.items import itemdex
+from battle.moves import movedex
+from battle.rng import BattleRNG
+from showdowndata import pokedex
+
+SETS = (
+    (('vaporeon', 'waterabsorb', 'leftovers', ('icebeam', 'protect', 'scald', 'toxic')),
+     ('jolteon', 'voltabsorb', 'lifeorb', ('hiddenpowerice', 'thunderbolt', 'voltswitch')),
+     ('venusaur', 'overgrow', 'blacksludge', ('gigadrain', 'sleeppowder', 'sludgebomb'))),
+    (('flareon', 'flashfire', 'toxicorb', ('facade', 'flareblitz', 'superpower')),
+     ('umbreon', 'synchronize', 'leftovers', ('foulplay', 'protect', 'toxic', 'wish')),
+     ('gengar', 'levitate', 'lifeorb', ('focusblast', 'shadowball', 'sludgewave'))),
+)
+
+def make_team(sets):
+    return [BattlePokemon(pokedex[name], 80, [movedex[move] for move in moves],
+                          abilitydex[ability], itemdex[item])
+            for name, ability, item, moves in sets]
+
+def new_battle(rng):
+    return Battle(make_team(SETS[0]), make_team(SETS[1]), rng=rng)
+
+def outcome(battle):
+    return (battle.battlefield.win, battle.battlefield.turns,
+            [[pokemon.hp for pokemon in side.team] for side in battle.battlefield.sides])
+
+
+class TestBattleRNG(TestCase):
+    def test_seeded_battles_are_reproducible(self):
+        results = []
+        for _ in range(2):
+            battle = new_battle(BattleRNG(7))
+            battle.run_new_battle()
+            results.append(outcome(battle))
+
+        self.assertEqual(results[0], results[1])
+
+    def test_forks_are_independent(self):
+        rng = BattleRNG(7)
+        forks = rng.spawn(3) + [rng.fork()]
+        draws = [tuple(fork.random() for _ in range(3)) for fork in forks]
+        self.assertEqual(len(set(draws)), 4)
+
+        same = BattleRNG(7).spawn(3)
+        self.assertEqual([fork.random() for fork in same], [draw[0] for draw in draws[:3]])
+
+    def test_running_a_clone_does_not_draw_from_the_original(self):
+        battle = new_battle(BattleRNG(3))
+        battle.init_battle()
+        clone = battle.clone()
+        state = battle.rng.getstate()
+        clone.run_battle()
+
+        self.assertIsNot(clone.rng, battle.rng)
+        self.assertEqual(battle.rng.getstate(), state)
+
+    def test_clones_with_the_same_seed_share_random_numbers(self):
+        battle = new_battle(BattleRNG(3))
+        battle.init_battle()
+        results = []
+        for _ in range(2):
+            clone = battle.clone(rng=BattleRNG(9))
+            clone.run_battle()
+            results.append(outcome(clone))
+
+        self.assertEqual(results[0], results[1])
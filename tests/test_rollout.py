@@ -1,12 +1,18 @@
 from copy import deepcopy
+from unittest import TestCase
 
-from AI.rollout import BattleRoller
+from AI.actions import MoveAction, SwitchAction
+from AI.evaluator import MaterialEvaluator
+from AI.rollout import BattleRoller, FilledTeamCache, win_rate_interval, DAMAGE_TABLE
+from AI.workerpool import WorkerPool
 from bot.tests.test_battleclient import BaseTestBattleClient
 from battle.battlepokemon import BattlePokemon
 from battle.items import itemdex
 from battle.abilities import abilitydex
 from battle.moves import movedex
 from battle.enums import ITEM, ABILITY
+from battle.rng import BattleRNG
+from tests.multi_move_test_case import MultiMoveTestCaseWithoutSetup
 
 class TestRollout(BaseTestBattleClient):
     def setUp(self):
@@ -41,6 +47,17 @@ class TestRollout(BaseTestBattleClient):
         self.assertIn(len([pokemon for pokemon in team if
                            pokemon.item and pokemon.item.is_mega_stone]), [0, 1])
 
+    def test_fill_in_knocked_off_foe(self):
+        self.handle('|-enditem|p2a: Goodra|Leftovers|[from] move: Knock Off|[of] p1a: Hitmonchan')
+        self.handle('|turn|2')
+        for _ in range(2): # the second fill-in uses the cached team
+            clone = deepcopy(self.battlefield)
+            self.roller.fill_in_unrevealed(clone)
+            goodra = clone.sides[1].active_pokemon
+            self.assertIsNone(goodra.item)
+            self.assertEqual(len(goodra.moves), 4)
+        self.assertEqual(self.roller.filled_teams.hits, 1)
+
     def test_fill_in_foe_team_caching(self):
         turn1 = deepcopy(self.battlefield)
         self.roller.fill_in_unrevealed(turn1)
@@ -69,3 +86,155 @@ class TestRollout(BaseTestBattleClient):
 
         # don't use the cached foe team now that the real one has changed
         self.assertFalse(all(team2[i].name == team3[i].name for i in range(1, 6)))
+
+    def test_filled_teams_are_keyed_by_revealed_info(self):
+        before = deepcopy(self.battlefield)
+        self.roller.fill_in_unrevealed(deepcopy(before))
+        goodra = self.battlefield.sides[1].active_pokemon
+        goodra.moves[movedex['dracometeor']] = movedex['dracometeor'].max_pp
+        self.roller.fill_in_unrevealed(deepcopy(self.battlefield))
+
+        cache = self.roller.filled_teams
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 2, 2))
+        # a team that matches again (e.g. after an illusion is corrected) is still cached
+        self.roller.fill_in_unrevealed(deepcopy(before))
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 2, 2))
+
+    def test_rollout_battles(self):
+        wins = self.roller.rollout_battles(self.battlefield, 4, turn_initialized=False)
+        self.assertEqual(sum(wins.values()), 4)
+
+    def test_parallel_rollout_battles(self):
+        with WorkerPool(2) as pool:
+            roller = BattleRoller(self.my_side.index, chunk_size=3, pool=pool)
+            for _ in range(2): # the second turn reuses the same workers
+                wins = roller.rollout_battles(self.battlefield, 7, turn_initialized=False)
+                self.assertEqual(sum(wins.values()), 7)
+                self.assertLessEqual(set(wins), {0, 1})
+            self.assertEqual(pool.restarts, 0)
+
+    def test_rollout_battles_with_determinizations(self):
+        roller = BattleRoller(self.my_side.index, determinizations=3)
+        battlefields = roller.prepare_for_rollouts(self.battlefield, turn_initialized=False)
+        self.assertEqual(len(battlefields), 3)
+        for battlefield in battlefields:
+            self.assertEqual(battlefield.sides[1].num_unrevealed, 0)
+        self.assertEqual(self.battlefield.sides[1].num_unrevealed, 5)
+
+        wins = roller.rollout_battles(self.battlefield, 6, turn_initialized=False)
+        self.assertEqual(sum(wins.values()), 6)
+
+    def test_rollout_until_confident(self):
+        self.roller.batch_size = 5
+        self.roller.target_half_width = 0.5 # any interval is narrow enough
+        wins = self.roller.rollout_until_confident(self.battlefield, 100, turn_initialized=False)
+        self.assertEqual(sum(wins.values()), 5)
+
+        self.roller.target_half_width = 0
+        self.roller.is_decided = lambda num_wins, num_rollouts: False
+        wins = self.roller.rollout_until_confident(self.battlefield, 12, turn_initialized=False)
+        self.assertEqual(sum(wins.values()), 12)
+
+    def test_race_actions(self):
+        pangoro = self.my_side.active_pokemon
+        actions = [MoveAction(move.name, i + 1) for i, move in enumerate(pangoro.moves)]
+        actions.append(SwitchAction('zoroark', 2))
+        self.roller.batch_size = 4
+        wins, racing = self.roller.race_actions(self.battlefield, actions, 8,
+                                                turn_initialized=False)
+        self.assertEqual(set(wins), set(actions))
+        self.assertTrue(racing)
+        self.assertLessEqual(set(racing), set(actions))
+        used = {action: sum(wins[action].values()) for action in actions}
+        self.assertLessEqual(set(used.values()), {4, 8})
+        for action in racing:
+            self.assertEqual(used[action], max(used.values()))
+
+
+class TestFilledTeamCache(TestCase):
+    def setUp(self):
+        self.cache = FilledTeamCache(max_entries=2)
+
+    def test_get_and_store(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.put('a', ['team a'])
+        self.assertEqual(self.cache.get('a'), ['team a'])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put('a', ['team a'])
+        self.cache.put('b', ['team b'])
+        self.cache.get('a')
+        self.cache.put('c', ['team c'])
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), ['team a'])
+        self.assertEqual(self.cache.get('c'), ['team c'])
+
+
+class TestWinRateInterval(TestCase):
+    def test_win_rate_interval(self):
+        self.assertEqual(win_rate_interval(0, 0, 1.96), (0.0, 1.0))
+        low, high = win_rate_interval(50, 100, 1.96)
+        self.assertAlmostEqual((low + high) / 2, 0.5)
+        self.assertAlmostEqual(high - low, 0.192, places=3)
+        low, high = win_rate_interval(10, 10, 1.96)
+        self.assertGreater(low, 0.5)
+        self.assertAlmostEqual(high, 1.0)
+        low, high = win_rate_interval(500, 1000, 1.96)
+        self.assertLess(high - low, 0.192 / 3)
+
+
+class TestTruncatedRollout(MultiMoveTestCaseWithoutSetup):
+    def setUp(self):
+        self.new_battle(p0_moves=('surf', 'toxic'), p1_moves=('leafblade', 'swordsdance'),
+                        any_move=False, tearDown=False)
+
+    def test_cut_off_at_max_turns(self):
+        evaluator = MaterialEvaluator()
+        value, turns = BattleRoller.rollout_one_battle(self.battlefield, False, BattleRNG(1),
+                                                       max_turns=1, evaluator=evaluator)
+        self.assertEqual(turns, 1)
+        self.assertIsNone(self.battlefield.win)
+        self.assertTrue(0 <= value <= 1)
+
+    def test_battle_over_before_max_turns(self):
+        value, turns = BattleRoller.rollout_one_battle(self.battlefield, False, BattleRNG(1),
+                                                       max_turns=1000,
+                                                       evaluator=MaterialEvaluator())
+        self.assertIn(value, (0, 1))
+        self.assertLess(turns, 1000)
+        self.assertEqual((value, turns),
+                         BattleRoller.rollout_one_battle(self.battlefield, False, BattleRNG(1)))
+
+    def test_rollouts_report_turns_simulated(self):
+        roller = BattleRoller(0, max_turns=2)
+        wins, = roller.run_rollouts([self.battlefield], [(None, 5)], False)
+        self.assertAlmostEqual(sum(wins.values()), 5)
+        self.assertTrue(5 <= roller.turns_simulated <= 10)
+
+    def test_greedy_rollouts(self):
+        roller = BattleRoller(0, greedy=True)
+        wins, = roller.run_rollouts([self.battlefield], [(None, 3)], False)
+        self.assertEqual(sum(wins.values()), 3)
+        self.assertGreater(len(DAMAGE_TABLE), 0)
+
+    def test_rollout_stats(self):
+        roller = BattleRoller(0, max_turns=2, collect_stats=True)
+        roller.stats.start()
+        roller.run_rollouts([self.battlefield], [(None, 5)], False)
+        roller.log_stats()
+        self.assertEqual(roller.stats.battles, 5)
+        self.assertEqual(roller.stats.turns, roller.turns_simulated)
+        self.assertGreaterEqual(roller.stats.events, roller.stats.turns)
+        self.assertGreater(roller.stats.wall_time, 0)
+
+    def test_parallel_rollout_stats(self):
+        with WorkerPool(2) as pool:
+            roller = BattleRoller(0, max_turns=2, pool=pool, chunk_size=2, collect_stats=True)
+            roller.stats.start()
+            roller.run_rollouts([self.battlefield], [(None, 5)], False)
+            roller.log_stats()
+        self.assertEqual(roller.stats.battles, 5)
+        self.assertEqual(roller.stats.turns, roller.turns_simulated)
+        self.assertGreater(roller.stats.simulate_time, 0)
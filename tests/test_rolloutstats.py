@@ -0,0 +1,58 @@
+from battle.effecthandler import EffectHandlerMixin
+from battle.rolloutstats import RolloutStats
+from tests.multi_move_test_case import MultiMoveTestCaseWithoutSetup
+
+
+class TestRolloutStats(MultiMoveTestCaseWithoutSetup):
+    def setUp(self):
+        self.new_battle(p0_item='leftovers', p1_item='lifeorb', tearDown=False)
+        self.stats = RolloutStats()
+
+    def tearDown(self):
+        self.stats.stop()
+
+    def test_counts_events_and_dispatches(self):
+        self.stats.start()
+        self.battle.stats = self.stats
+        self.choose_move(self.vaporeon, 'surf')
+        self.choose_move(self.leafeon, 'leafblade')
+        self.run_turn()
+
+        self.assertEqual(self.stats.events, 3) # two moves and the residual event
+        self.assertEqual(self.stats.dispatches['on_modify_damage'], 1)        # lifeorb
+        self.assertEqual(self.stats.dispatches['on_after_move_secondary'], 1) # lifeorb
+
+    def test_stop(self):
+        dispatch = EffectHandlerMixin.activate_effect
+        self.stats.start()
+        self.assertNotEqual(EffectHandlerMixin.activate_effect, dispatch)
+        self.stats.stop()
+        self.assertEqual(EffectHandlerMixin.activate_effect, dispatch)
+        self.assertGreaterEqual(self.stats.wall_time, 0)
+
+        self.choose_move(self.vaporeon, 'surf')
+        self.run_turn()
+        self.assertEqual(sum(self.stats.dispatches.values()), 0)
+
+    def test_update(self):
+        other = RolloutStats()
+        other.battles, other.turns, other.events = 2, 30, 100
+        other.dispatches['on_residual'] = 5
+        other.clone_time = other.simulate_time = other.wall_time = 1.0
+        self.stats.update(other)
+        self.stats.update(other)
+
+        self.assertEqual((self.stats.battles, self.stats.turns, self.stats.events), (4, 60, 200))
+        self.assertEqual(self.stats.dispatches['on_residual'], 10)
+        self.assertEqual((self.stats.clone_time, self.stats.simulate_time), (2.0, 2.0))
+        self.assertEqual(self.stats.wall_time, 0)
+        self.assertEqual(self.stats.turns_per_battle, 15)
+
+    def test_rates(self):
+        self.assertEqual(self.stats.battles_per_second, 0)
+        self.stats.battles, self.stats.turns = 4, 100
+        self.stats.wall_time, self.stats.clone_time, self.stats.simulate_time = 2.0, 0.5, 1.0
+        self.assertEqual(self.stats.battles_per_second, 2)
+        self.assertEqual(self.stats.turns_per_second, 50)
+        self.assertEqual(self.stats.bookkeeping_time, 0.5)
+        self.assertIn('4 battles', repr(self.stats))
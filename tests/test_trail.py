@@ -0,0 +1,176 @@
+from battle.battlefield import BattleField, BattleSide
+from battle.battlepokemon import BattlePokemon
+from battle.enums import Status, Volatile, Weather, Hazard, SideCondition, ITEM
+from tests.multi_move_test_case import MultiMoveTestCaseWithoutSetup
+
+
+class TestTrail(MultiMoveTestCaseWithoutSetup):
+    def handler_names(self, effector):
+        return {name: [handler.__name__ for handler in handlers]
+                for name, handlers in effector.effect_handlers.items()}
+
+    def test_rollback_damage_status_boosts_and_pp(self):
+        self.new_battle(p0_moves=('toxic', 'scald'), p1_moves=('swordsdance', 'leafblade'),
+                        any_move=False)
+        mark = self.battle.mark()
+        self.choose_move(self.vaporeon, 'toxic')
+        self.choose_move(self.leafeon, 'swordsdance')
+        self.run_turn()
+        self.choose_move(self.vaporeon, 'scald')
+        self.choose_move(self.leafeon, 'leafblade')
+        self.run_turn()
+
+        self.assertStatus(self.leafeon, Status.TOX)
+        self.assertBoosts(self.leafeon, {'atk': 2})
+        self.assertDamageTaken(self.vaporeon)
+        self.assertPpUsed(self.leafeon, 'leafblade', 1)
+        self.assertEqual(self.battlefield.turns, 2)
+
+        self.battle.rollback(mark)
+
+        self.assertStatus(self.leafeon, None)
+        self.assertBoosts(self.leafeon, {'atk': 0})
+        self.assertDamageTaken(self.vaporeon, 0)
+        self.assertDamageTaken(self.leafeon, 0)
+        self.assertPpUsed(self.leafeon, 'leafblade', 0)
+        self.assertPpUsed(self.vaporeon, 'toxic', 0)
+        self.assertEqual(self.battlefield.turns, 0)
+
+    def test_rollback_effects_and_handlers(self):
+        self.new_battle(p0_ability='drizzle', p1_item='leftovers')
+        field_handlers = self.handler_names(self.battlefield)
+        leafeon_handlers = self.handler_names(self.leafeon)
+        rain = self.battlefield.get_effect(Weather.RAINDANCE)
+        mark = self.battle.mark()
+        self.choose_move(self.vaporeon, 'knockoff')
+        self.choose_move(self.leafeon, 'spikes')
+        self.run_turn()
+        self.choose_move(self.vaporeon, 'sunnyday')
+        self.choose_move(self.leafeon, 'substitute')
+        self.run_turn()
+
+        self.assertTrue(self.battlefield.has_effect(Weather.SUNNYDAY))
+        self.assertTrue(self.battlefield.sides[0].has_effect(Hazard.SPIKES))
+        self.assertTrue(self.leafeon.has_effect(Volatile.SUBSTITUTE))
+        self.assertItem(self.leafeon, None)
+
+        self.battle.rollback(mark)
+
+        self.assertTrue(self.battlefield.has_effect(Weather.RAINDANCE))
+        self.assertFalse(self.battlefield.has_effect(Weather.SUNNYDAY))
+        self.assertFalse(self.battlefield.sides[0].has_effect(Hazard.SPIKES))
+        self.assertFalse(self.leafeon.has_effect(Volatile.SUBSTITUTE))
+        self.assertItem(self.leafeon, 'leftovers')
+        self.assertIs(self.battlefield.get_effect(Weather.RAINDANCE), rain)
+        self.assertDictEqual(self.handler_names(self.battlefield), field_handlers)
+        self.assertDictEqual(self.handler_names(self.leafeon), leafeon_handlers)
+
+    def test_rollback_effect_state(self):
+        self.new_battle()
+        self.choose_move(self.vaporeon, 'reflect')
+        self.choose_move(self.leafeon, 'substitute')
+        self.run_turn()
+        reflect = self.battlefield.sides[0].get_effect(SideCondition.REFLECT)
+        substitute = self.leafeon.get_effect(Volatile.SUBSTITUTE)
+        duration, sub_hp = reflect.duration, substitute.hp
+
+        mark = self.battle.mark()
+        self.choose_move(self.vaporeon, 'surf')
+        self.choose_move(self.leafeon, 'splash')
+        self.run_turn()
+        self.assertEqual(reflect.duration, duration - 1)
+        self.assertLess(substitute.hp, sub_hp)
+
+        self.battle.rollback(mark)
+        self.assertIs(self.battlefield.sides[0].get_effect(SideCondition.REFLECT), reflect)
+        self.assertIs(self.leafeon.get_effect(Volatile.SUBSTITUTE), substitute)
+        self.assertEqual(reflect.duration, duration)
+        self.assertEqual(substitute.hp, sub_hp)
+
+    def test_rollback_faint_and_win(self):
+        self.new_battle()
+        self.leafeon.hp = 1
+        mark = self.battle.mark()
+        self.choose_move(self.vaporeon, 'surf')
+        self.choose_move(self.leafeon, 'splash')
+        self.run_turn()
+        self.assertFainted(self.leafeon)
+        self.assertEqual(self.battlefield.win, 0)
+
+        self.battle.rollback(mark)
+        self.assertEqual(self.leafeon.hp, 1)
+        self.assertStatus(self.leafeon, None)
+        self.assertIs(self.battlefield.sides[1].active_pokemon, self.leafeon)
+        self.assertTrue(self.leafeon.is_active)
+        self.assertIsNone(self.battlefield.win)
+
+    def test_rollback_to_the_same_mark_repeatedly(self):
+        self.new_battle()
+        mark = self.battle.mark()
+        for move in ('surf', 'icebeam', 'thunderbolt'):
+            self.choose_move(self.vaporeon, move)
+            self.choose_move(self.leafeon, 'splash')
+            self.run_turn()
+            self.assertDamageTaken(self.leafeon)
+            self.assertEqual(self.battlefield.turns, 1)
+            self.battle.rollback(mark)
+            self.assertDamageTaken(self.leafeon, 0)
+
+    def test_rollback_restores_rng(self):
+        self.new_battle()
+        mark = self.battle.mark()
+        draws = [self.battle.rng.random() for _ in range(3)]
+        self.battle.rollback(mark)
+        self.assertEqual([self.battle.rng.random() for _ in range(3)], draws)
+
+    def test_nested_marks(self):
+        self.new_battle()
+        outer = self.battle.mark()
+        self.choose_move(self.vaporeon, 'surf')
+        self.choose_move(self.leafeon, 'splash')
+        self.run_turn()
+        hp = self.leafeon.hp
+
+        inner = self.battle.mark()
+        self.choose_move(self.vaporeon, 'surf')
+        self.choose_move(self.leafeon, 'splash')
+        self.run_turn()
+        self.assertLess(self.leafeon.hp, hp)
+
+        self.battle.rollback(inner)
+        self.assertEqual(self.leafeon.hp, hp)
+        self.assertEqual(self.battlefield.turns, 1)
+
+        self.battle.rollback(outer)
+        self.assertDamageTaken(self.leafeon, 0)
+        self.assertEqual(self.battlefield.turns, 0)
+
+    def test_stop_trail(self):
+        self.new_battle(p0_item='leftovers')
+        mark = self.battle.mark()
+        self.battle.rollback(mark)
+        self.battle.stop_trail()
+
+        self.assertIsNone(self.battle.trail)
+        self.assertIs(type(self.battlefield), BattleField)
+        self.assertIs(type(self.battlefield.sides[0]), BattleSide)
+        self.assertIs(type(self.leafeon), type(self.vaporeon))
+        self.assertTrue(issubclass(type(self.vaporeon), BattlePokemon))
+        self.assertNotIn('_trail', type(self.vaporeon).__dict__)
+        self.assertNotIn('_trail', type(self.vaporeon.get_effect(ITEM)).__dict__)
+
+    def test_clone_of_trailing_battle_is_not_trailed(self):
+        self.new_battle()
+        mark = self.battle.mark()
+        clone = self.battle.clone()
+        self.assertIsNone(clone.trail)
+        clone_leafeon = clone.battlefield.sides[1].active_pokemon
+        self.assertNotIn('_trail', type(clone_leafeon).__dict__)
+        clone_leafeon.hp = 1
+
+        self.choose_move(self.vaporeon, 'surf')
+        self.choose_move(self.leafeon, 'splash')
+        self.run_turn()
+        self.battle.rollback(mark)
+        self.assertEqual(clone_leafeon.hp, 1)
+        self.assertDamageTaken(self.leafeon, 0)
@@ -0,0 +1,169 @@
+from battle import effects
+from battle.enums import Status, Weather, Hazard, Volatile
+from battle.moves import movedex
+from battle.stats import Boosts
+from battle.zobrist import zobrist_key
+from tests.multi_move_test_case import MultiMoveTestCaseWithoutSetup
+
+
+class TestZobrist(MultiMoveTestCaseWithoutSetup):
+    def new_battle(self, *args, **kwargs):
+        kwargs.setdefault('any_move', False)
+        kwargs.setdefault('p0_moves', ('surf', 'toxic', 'swordsdance', 'spikes'))
+        kwargs.setdefault('p1_moves', ('leafblade', 'substitute', 'sunnyday', 'roar'))
+        super(TestZobrist, self).new_battle(*args, **kwargs)
+
+    def assertZobristConsistent(self):
+        self.assertEqual(self.battlefield.zobrist, self.battlefield.compute_zobrist())
+
+    def test_zobrist_is_consistent_with_recomputed_hash(self):
+        self.new_battle(p0_ability='drizzle', p1_item='leftovers')
+        self.assertZobristConsistent()
+        for p0_move, p1_move in (('toxic', 'substitute'), ('swordsdance', 'sunnyday'),
+                                 ('spikes', 'leafblade'), ('surf', 'roar')):
+            self.choose_move(self.vaporeon, p0_move)
+            self.choose_move(self.leafeon, p1_move)
+            self.run_turn()
+            self.assertZobristConsistent()
+
+    def test_zobrist_changes_with_state(self):
+        self.new_battle()
+        seen = {self.battlefield.zobrist}
+
+        self.leafeon.hp -= 10
+        self.assertNotIn(self.battlefield.zobrist, seen)
+        seen.add(self.battlefield.zobrist)
+
+        self.leafeon.boosts['atk'] += 1
+        self.assertNotIn(self.battlefield.zobrist, seen)
+        seen.add(self.battlefield.zobrist)
+
+        self.battlefield.sides[0].set_effect(effects.Spikes())
+        self.assertNotIn(self.battlefield.zobrist, seen)
+        seen.add(self.battlefield.zobrist)
+
+        self.leafeon.confuse()
+        self.assertNotIn(self.battlefield.zobrist, seen)
+        seen.add(self.battlefield.zobrist)
+
+        self.leafeon.deduct_pp(movedex['leafblade'], self.vaporeon)
+        self.assertNotIn(self.battlefield.zobrist, seen)
+        self.assertZobristConsistent()
+
+    def test_zobrist_changes_with_effect_state(self):
+        self.new_battle()
+        self.battle.set_status(self.leafeon, Status.TOX, None)
+        self.choose_move(self.vaporeon, 'spikes')
+        self.choose_move(self.leafeon, 'sunnyday')
+        self.run_turn()
+        self.choose_move(self.vaporeon, 'spikes')
+        self.choose_move(self.leafeon, 'substitute')
+        self.run_turn()
+        zobrist = self.battlefield.zobrist
+        substitute = self.leafeon.get_effect(Volatile.SUBSTITUTE)
+        toxic = self.leafeon.get_effect(Status.TOX)
+        weather = self.battlefield.get_effect(Weather.SUNNYDAY)
+        side = self.battlefield.sides[0]
+
+        for obj, attr, change in ((substitute, 'hp', -1), (toxic, 'stage', 1),
+                                  (weather, 'duration', -1), (self.vaporeon, 'turns_out', 1)):
+            setattr(obj, attr, getattr(obj, attr) + change)
+            self.assertNotEqual(self.battlefield.zobrist, zobrist, attr)
+            self.assertZobristConsistent()
+            setattr(obj, attr, getattr(obj, attr) - change)
+            self.assertEqual(self.battlefield.zobrist, zobrist, attr)
+
+        side.has_mega_evolved = True
+        self.assertNotEqual(self.battlefield.zobrist, zobrist)
+        side.has_mega_evolved = False
+        self.assertEqual(self.battlefield.zobrist, zobrist)
+
+    def test_zobrist_is_restored_when_state_is(self):
+        self.new_battle()
+        zobrist = self.battlefield.zobrist
+
+        self.leafeon.hp -= 10
+        self.leafeon.status = Status.PAR
+        self.vaporeon.boosts['spe'] = -2
+        self.battlefield.set_weather(Weather.RAINDANCE)
+        self.assertNotEqual(self.battlefield.zobrist, zobrist)
+
+        self.leafeon.hp += 10
+        self.leafeon.status = None
+        self.vaporeon.boosts = Boosts()
+        self.battlefield.clear_weather()
+        self.assertEqual(self.battlefield.zobrist, zobrist)
+
+    def test_zobrist_is_restored_by_rollback(self):
+        self.new_battle()
+        zobrist = self.battlefield.zobrist
+        mark = self.battle.mark()
+        self.choose_move(self.vaporeon, 'toxic')
+        self.choose_move(self.leafeon, 'sunnyday')
+        self.run_turn()
+        self.choose_move(self.vaporeon, 'swordsdance')
+        self.choose_move(self.leafeon, 'substitute')
+        self.run_turn()
+        self.assertNotEqual(self.battlefield.zobrist, zobrist)
+        self.assertZobristConsistent()
+
+        self.battle.rollback(mark)
+        self.assertEqual(self.battlefield.zobrist, zobrist)
+        self.assertZobristConsistent()
+
+    def test_equal_states_have_equal_zobrist(self):
+        self.new_battle()
+        self.choose_move(self.vaporeon, 'spikes')
+        self.choose_move(self.leafeon, 'leafblade')
+        self.run_turn()
+        zobrist = self.battlefield.zobrist
+        hp = self.vaporeon.hp
+
+        self.new_battle()
+        self.assertNotEqual(self.battlefield.zobrist, zobrist)
+        self.choose_move(self.vaporeon, 'spikes')
+        self.choose_move(self.leafeon, 'leafblade')
+        self.run_turn()
+        self.assertEqual(self.vaporeon.hp, hp)
+        self.assertEqual(self.battlefield.zobrist, zobrist)
+
+    def test_zobrist_distinguishes_owners(self):
+        self.new_battle()
+        self.vaporeon.boosts['atk'] = 2
+        zobrist = self.battlefield.zobrist
+        self.vaporeon.boosts['atk'] = 0
+        self.leafeon.boosts['atk'] = 2
+        self.assertNotEqual(self.battlefield.zobrist, zobrist)
+
+        self.leafeon.boosts['atk'] = 0
+        self.battlefield.sides[0].set_effect(effects.Spikes())
+        zobrist = self.battlefield.zobrist
+        self.battlefield.sides[0].remove_effect(Hazard.SPIKES)
+        self.battlefield.sides[1].set_effect(effects.Spikes())
+        self.assertNotEqual(self.battlefield.zobrist, zobrist)
+
+    def test_clone_keeps_zobrist(self):
+        self.new_battle()
+        self.choose_move(self.vaporeon, 'toxic')
+        self.choose_move(self.leafeon, 'substitute')
+        self.run_turn()
+        zobrist = self.battlefield.zobrist
+
+        clone = self.battlefield.clone()
+        self.assertEqual(clone.zobrist, zobrist)
+        clone.sides[1].active_pokemon.hp -= 1
+        self.assertNotEqual(clone.zobrist, zobrist)
+        self.assertEqual(self.battlefield.zobrist, zobrist)
+
+    def test_reset_zobrist(self):
+        self.new_battle()
+        zobrist = self.battlefield.zobrist
+        self.leafeon.moves[self.leafeon.moves.keys()[0]] -= 1
+        self.assertEqual(self.battlefield.zobrist, zobrist)
+
+        self.battlefield.reset_zobrist()
+        self.assertNotEqual(self.battlefield.zobrist, zobrist)
+        self.assertZobristConsistent()
+
+    def test_zobrist_key_is_deterministic(self):
+        self.assertEqual(zobrist_key(0, 'vaporeon', 'hp', 100), 0x79ac928f68eb37af)